@@ -0,0 +1,118 @@
+"""Almacenes de datos de la app: dónde vive la base de datos de cada liga.
+
+Las funciones de datos de datos.py solo piden conexiones al almacén activo,
+así que cambiar de almacén no toca la lógica de puntuación ni de
+estadísticas. Hay dos:
+
+    AlmacenSQLite   cada liga en su archivo SQLite en disco (modo WAL)
+    AlmacenMemoria  cada liga en una base SQLite en memoria compartida por
+                    todas las conexiones del proceso; sin E/S de disco, para
+                    pruebas y benchmarks
+
+Para añadir otro basta con implementar los métodos abstractos de Almacen y elegirlo
+en obtener_almacen() de datos.py.
+"""
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+
+class Almacen(ABC):
+    """Interfaz común de los almacenes"""
+
+    # Si los datos sobreviven al proceso (y por tanto tiene sentido hacer copias)
+    persistente = False
+
+    @abstractmethod
+    def uri(self, liga, solo_lectura=False):
+        """URI SQLite de la base de datos de la liga, válida para connect(uri=True) y ATTACH"""
+
+    @abstractmethod
+    def ligas(self):
+        """Nombres de las ligas que ya existen en el almacén"""
+
+    def conectar(self, liga, busy_timeout_ms, **opciones):
+        """Conexión nueva a la liga con el busy_timeout indicado; opciones se pasan a sqlite3.connect"""
+        conn = sqlite3.connect(self.uri(liga), uri=True, timeout=busy_timeout_ms / 1000, **opciones)
+        conn.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+        return conn
+
+
+class AlmacenSQLite(Almacen):
+    """Cada liga en su propio archivo; la liga por defecto en ruta_principal"""
+
+    persistente = True
+
+    def __init__(self, ruta_principal, directorio, liga_por_defecto):
+        self.ruta_principal = ruta_principal
+        self.directorio = directorio
+        self.liga_por_defecto = liga_por_defecto
+
+    def ruta(self, liga):
+        """Archivo SQLite de la liga indicada"""
+        if liga == self.liga_por_defecto:
+            return self.ruta_principal
+        return os.path.join(self.directorio, f"{liga}.db")
+
+    def uri(self, liga, solo_lectura=False):
+        ruta = os.path.abspath(self.ruta(liga))
+        return f"file:{ruta}?mode=ro" if solo_lectura else f"file:{ruta}"
+
+    def ligas(self):
+        ligas = [self.liga_por_defecto]
+        if os.path.isdir(self.directorio):
+            for archivo in sorted(os.listdir(self.directorio)):
+                if archivo.endswith('.db') and archivo[:-3] != self.liga_por_defecto:
+                    ligas.append(archivo[:-3])
+        return ligas
+
+    def conectar(self, liga, busy_timeout_ms, **opciones):
+        directorio = os.path.dirname(self.ruta(liga))
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        conn = super().conectar(liga, busy_timeout_ms, **opciones)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+
+class AlmacenMemoria(Almacen):
+    """Cada liga en una base en memoria (VFS memdb de SQLite) compartida dentro del proceso.
+
+    A diferencia de ':memory:', todas las conexiones a la misma liga ven los
+    mismos datos y se bloquean entre sí igual que con un archivo, así que
+    los reintentos y las transacciones se comportan como en disco. Se
+    mantiene abierta una conexión por liga para que la base no desaparezca
+    cuando se cierran las demás. al_vaciar, si se indica, se llama después
+    de vaciar() para que quien guarde estado por liga lo olvide.
+    """
+
+    def __init__(self, nombre='padel', al_vaciar=None):
+        self.nombre = nombre
+        self.al_vaciar = al_vaciar
+        self._anclas = {}
+        self._lock = threading.Lock()
+
+    def uri(self, liga, solo_lectura=False):
+        uri = f"file:/{self.nombre}-{liga}?vfs=memdb"
+        return uri + "&mode=ro" if solo_lectura else uri
+
+    def ligas(self):
+        with self._lock:
+            return sorted(self._anclas)
+
+    def conectar(self, liga, busy_timeout_ms, **opciones):
+        with self._lock:
+            if liga not in self._anclas:
+                self._anclas[liga] = sqlite3.connect(self.uri(liga), uri=True, check_same_thread=False)
+        return super().conectar(liga, busy_timeout_ms, **opciones)
+
+    def vaciar(self):
+        """Borra todas las ligas (cierra las conexiones ancla)"""
+        with self._lock:
+            for conn in self._anclas.values():
+                conn.close()
+            self._anclas.clear()
+        if self.al_vaciar is not None:
+            self.al_vaciar()
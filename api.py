@@ -0,0 +1,146 @@
+"""API HTTP en JSON sobre la capa de datos, para integraciones sin pasar por la interfaz.
+
+Arrancar con:
+    uvicorn api:app --port 8502
+
+Endpoints (liga = nombre de la liga, p. ej. principal):
+    GET  /ligas
+    GET  /ligas/{liga}/jugadores
+    GET  /ligas/{liga}/partidos                  partidos activos (?offset=0&limit=20)
+    GET  /ligas/{liga}/partidos/{id}
+    POST /ligas/{liga}/partidos/{id}/punto       {"ganador": 1 | 2}
+    GET  /ligas/{liga}/clasificacion             (?temporada=id para una temporada)
+
+Las respuestas GET llevan ETag: un cliente que sondea y manda If-None-Match
+con el último ETag recibe 304 sin cuerpo mientras nada cambie.
+"""
+import hashlib
+import json
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.routing import Route
+
+import datos
+
+
+def _en_liga(liga, funcion, *args):
+    """Ejecuta funcion en el hilo actual apuntando a la liga indicada"""
+    datos.usar_liga(liga)
+    datos.preparar_liga()
+    return funcion(*args)
+
+
+async def consultar(liga, funcion, *args):
+    """Llama a una función de datos en el pool de hilos para no bloquear el bucle de eventos"""
+    return await run_in_threadpool(_en_liga, liga, funcion, *args)
+
+
+def respuesta_json(request, datos_respuesta, status_code=200):
+    """JSON con ETag; si el cliente ya tiene esa versión, 304 sin cuerpo"""
+    cuerpo = json.dumps(datos_respuesta, ensure_ascii=False, default=str).encode('utf-8')
+    etag = '"' + hashlib.sha1(cuerpo).hexdigest()[:20] + '"'
+    cabeceras = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+    if request.method == 'GET' and status_code == 200:
+        recibidos = request.headers.get('if-none-match', '')
+        if etag in [e.strip().removeprefix('W/') for e in recibidos.split(',')]:
+            return Response(status_code=304, headers=cabeceras)
+    return Response(cuerpo, status_code=status_code, media_type='application/json', headers=cabeceras)
+
+
+def error_json(mensaje, status_code):
+    return Response(json.dumps({'error': mensaje}, ensure_ascii=False), status_code=status_code,
+                    media_type='application/json')
+
+
+async def liga_de_peticion(request):
+    """Liga de la URL si es válida y ya existe (la API no crea ligas nuevas)"""
+    liga = request.path_params['liga']
+    # listar_ligas recorre el directorio de ligas: también va al pool de hilos
+    if not datos.nombre_liga_valido(liga) or liga not in await run_in_threadpool(datos.listar_ligas):
+        return None
+    return liga
+
+
+def entero(valor, defecto=None):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return defecto
+
+
+async def ligas(request):
+    return respuesta_json(request, {'ligas': await run_in_threadpool(datos.listar_ligas)})
+
+
+async def jugadores(request):
+    liga = await liga_de_peticion(request)
+    if liga is None:
+        return error_json("liga no encontrada", 404)
+    return respuesta_json(request, {'jugadores': await consultar(liga, datos.cargar_jugadores)})
+
+
+async def partidos_activos(request):
+    liga = await liga_de_peticion(request)
+    if liga is None:
+        return error_json("liga no encontrada", 404)
+    offset = max(0, entero(request.query_params.get('offset'), 0))
+    limit = min(100, max(1, entero(request.query_params.get('limit'), 20)))
+    partidos, total = await consultar(liga, datos.cargar_partidos_activos_paginado, offset, limit)
+    return respuesta_json(request, {'partidos': partidos, 'total': total, 'offset': offset, 'limit': limit})
+
+
+async def partido(request):
+    liga = await liga_de_peticion(request)
+    if liga is None:
+        return error_json("liga no encontrada", 404)
+    encontrado = await consultar(liga, datos.cargar_partido, request.path_params['partido_id'])
+    if encontrado is None:
+        return error_json("partido no encontrado", 404)
+    return respuesta_json(request, encontrado)
+
+
+async def anotar_punto(request):
+    liga = await liga_de_peticion(request)
+    if liga is None:
+        return error_json("liga no encontrada", 404)
+    try:
+        cuerpo = await request.json()
+    except ValueError:
+        return error_json("el cuerpo debe ser JSON", 400)
+    ganador = cuerpo.get('ganador') if isinstance(cuerpo, dict) else None
+    if ganador not in (1, 2):
+        return error_json("ganador debe ser 1 o 2", 400)
+
+    partido_id = request.path_params['partido_id']
+    ganador_juego = await consultar(liga, datos.anotar_punto, partido_id, ganador)
+    actualizado = await consultar(liga, datos.cargar_partido, partido_id)
+    if actualizado is None:
+        return error_json("partido no encontrado", 404)
+    if ganador_juego is None:
+        return error_json("partido finalizado o en conflicto; vuelve a leerlo", 409)
+    return respuesta_json(request, {'juego_ganado_por': ganador_juego or None, 'partido': actualizado})
+
+
+async def clasificacion(request):
+    liga = await liga_de_peticion(request)
+    if liga is None:
+        return error_json("liga no encontrada", 404)
+    temporada = entero(request.query_params.get('temporada'))
+    if temporada is None:
+        filas = await consultar(liga, datos.cargar_jugadores)
+    else:
+        filas = await consultar(liga, datos.cargar_clasificacion_temporada, temporada)
+    return respuesta_json(request, {'temporada': temporada, 'clasificacion': filas})
+
+
+app = Starlette(routes=[
+    Route('/ligas', ligas),
+    Route('/ligas/{liga}/jugadores', jugadores),
+    Route('/ligas/{liga}/partidos', partidos_activos),
+    Route('/ligas/{liga}/partidos/{partido_id:int}', partido),
+    Route('/ligas/{liga}/partidos/{partido_id:int}/punto', anotar_punto, methods=['POST']),
+    Route('/ligas/{liga}/clasificacion', clasificacion),
+])
@@ -1,9 +1,22 @@
 import streamlit as st
-import pandas as pd
-import sqlite3
-from datetime import datetime
 import re
-import time
+from datetime import datetime, timedelta
+
+import copias
+from datos import (
+    COPIAS_CADA_HORAS, LIGA_POR_DEFECTO, NIVELES, ORDENES_JUGADORES, TAREAS, USAR_ESCRITOR_AGRUPADO,
+    actualizar_puntos_partido, anotar_punto, calcular_racha, cargar_actividad_por_nivel,
+    cargar_clasificacion_temporada_df, cargar_companeros, cargar_enfrentamientos, cargar_historial_paginado,
+    cargar_jugadores, cargar_jugadores_df, cargar_jugadores_paginado, cargar_mejores_parejas, cargar_partido,
+    cargar_partidos_activos_paginado, cargar_partidos_jugador, cargar_partidos_por_periodo,
+    cargar_puntos_jugador_mes, cargar_tareas, cargar_temporadas, cargar_todos_partidos_paginado,
+    cerrar_juego, clasificacion_entre_ligas, convertir_puntos_tenis, crear_liga, crear_partido,
+    elegir_modo_muerte, eliminar_jugador, eliminar_partido, encolar_tarea, finalizar_partido,
+    guardar_jugador, iniciar_ejecucion, iniciar_temporada, liga_actual, listar_ligas, nombre_liga_valido,
+    obtener_almacen, obtener_ejecutor_tareas, obtener_escritor, obtener_estadisticas_globales,
+    obtener_metricas_bloqueo, obtener_programador_copias, preparar_liga, reparar_estadisticas,
+    restaurar_copia_liga, resumen_ejecucion, usar_liga, verificar_estadisticas,
+)
 
 # Configuración de la página
 st.set_page_config(
@@ -13,554 +26,28 @@ st.set_page_config(
 )
 
 # ============================================
-# CONEXIÓN A BASE DE DATOS
-# ============================================
-
-DB_PATH = 'padel.db'
-
-def get_db_connection():
-    """Obtiene una conexión a la base de datos SQLite con timeout"""
-    try:
-        conn = sqlite3.connect(DB_PATH, timeout=10)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA synchronous=NORMAL")
-        return conn
-    except Exception as e:
-        st.error(f"Error de conexión a BD: {e}")
-        return None
-
-def init_database():
-    """Inicializa la base de datos creando las tablas si no existen"""
-    conn = get_db_connection()
-    if conn is None:
-        return False
-    
-    try:
-        cursor = conn.cursor()
-        
-        # Tabla de jugadores
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS jugadores (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nombre TEXT UNIQUE NOT NULL,
-                nivel TEXT NOT NULL,
-                partidos INTEGER DEFAULT 0,
-                puntos_favor INTEGER DEFAULT 0,
-                puntos_contra INTEGER DEFAULT 0,
-                victorias INTEGER DEFAULT 0,
-                derrotas INTEGER DEFAULT 0,
-                diferencia INTEGER DEFAULT 0,
-                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabla de partidos
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS partidos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                j1 TEXT NOT NULL,
-                j2 TEXT NOT NULL,
-                j3 TEXT NOT NULL,
-                j4 TEXT NOT NULL,
-                pareja1 TEXT NOT NULL,
-                pareja2 TEXT NOT NULL,
-                activo BOOLEAN DEFAULT 1,
-                puntos_pareja1 INTEGER DEFAULT 0,
-                puntos_pareja2 INTEGER DEFAULT 0,
-                puntos_set1 INTEGER DEFAULT 0,
-                puntos_set2 INTEGER DEFAULT 0,
-                modo_muerte BOOLEAN DEFAULT 0,
-                ganadores TEXT,
-                resultado TEXT
-            )
-        ''')
-        
-        # Verificar y agregar columnas faltantes
-        cursor.execute("PRAGMA table_info(partidos)")
-        columnas = [columna[1] for columna in cursor.fetchall()]
-        
-        if 'puntos_set1' not in columnas:
-            cursor.execute("ALTER TABLE partidos ADD COLUMN puntos_set1 INTEGER DEFAULT 0")
-        
-        if 'puntos_set2' not in columnas:
-            cursor.execute("ALTER TABLE partidos ADD COLUMN puntos_set2 INTEGER DEFAULT 0")
-        
-        if 'modo_muerte' not in columnas:
-            cursor.execute("ALTER TABLE partidos ADD COLUMN modo_muerte BOOLEAN DEFAULT 0")
-        
-        # Tabla de historial
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS historial (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                partido_id INTEGER,
-                fecha TEXT,
-                pareja1 TEXT,
-                pareja2 TEXT,
-                resultado TEXT,
-                ganadores TEXT
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        return True
-    except Exception as e:
-        st.error(f"Error inicializando BD: {e}")
-        if conn:
-            conn.close()
-        return False
-
-init_database()
-
-# ============================================
-# FUNCIONES DE BASE DE DATOS
+# LIGA DE LA SESIÓN
 # ============================================
 
-def ejecutar_con_retry(func, *args, max_retries=3, **kwargs):
-    """Ejecuta una función con reintentos en caso de bloqueo"""
-    for intento in range(max_retries):
-        try:
-            return func(*args, **kwargs)
-        except sqlite3.OperationalError as e:
-            if "database is locked" in str(e) and intento < max_retries - 1:
-                time.sleep(0.5)
-                continue
-            else:
-                raise e
-    return None
-
-def recalcular_estadisticas():
-    """Recalcula todas las estadísticas de los jugadores desde cero"""
-    def _recalcular():
-        conn = get_db_connection()
-        if conn is None:
-            return False
-        try:
-            cursor = conn.cursor()
-            
-            # Resetear estadísticas
-            cursor.execute('''
-                UPDATE jugadores 
-                SET partidos = 0, puntos_favor = 0, puntos_contra = 0, 
-                    victorias = 0, derrotas = 0, diferencia = 0
-            ''')
-            
-            # Obtener todos los partidos finalizados
-            cursor.execute('''
-                SELECT j1, j2, j3, j4, puntos_pareja1, puntos_pareja2, ganadores
-                FROM partidos 
-                WHERE activo = 0
-            ''')
-            
-            partidos = cursor.fetchall()
-            
-            for partido in partidos:
-                puntos1 = partido['puntos_pareja1'] or 0
-                puntos2 = partido['puntos_pareja2'] or 0
-                
-                if puntos1 > puntos2:
-                    ganadores = [partido['j1'], partido['j2']]
-                    perdedores = [partido['j3'], partido['j4']]
-                    puntos_ganadores = puntos1
-                    puntos_perdedores = puntos2
-                else:
-                    ganadores = [partido['j3'], partido['j4']]
-                    perdedores = [partido['j1'], partido['j2']]
-                    puntos_ganadores = puntos2
-                    puntos_perdedores = puntos1
-                
-                for nombre in ganadores:
-                    cursor.execute('''
-                        UPDATE jugadores 
-                        SET partidos = partidos + 1,
-                            victorias = victorias + 1,
-                            puntos_favor = puntos_favor + ?,
-                            puntos_contra = puntos_contra + ?,
-                            diferencia = (puntos_favor + ?) - (puntos_contra + ?)
-                        WHERE nombre = ?
-                    ''', (puntos_ganadores, puntos_perdedores, puntos_ganadores, puntos_perdedores, nombre))
-                
-                for nombre in perdedores:
-                    cursor.execute('''
-                        UPDATE jugadores 
-                        SET partidos = partidos + 1,
-                            derrotas = derrotas + 1,
-                            puntos_favor = puntos_favor + ?,
-                            puntos_contra = puntos_contra + ?,
-                            diferencia = (puntos_favor + ?) - (puntos_contra + ?)
-                        WHERE nombre = ?
-                    ''', (puntos_perdedores, puntos_ganadores, puntos_perdedores, puntos_ganadores, nombre))
-            
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            st.error(f"Error recalculando estadísticas: {e}")
-            if conn:
-                conn.close()
-            return False
-    
-    return ejecutar_con_retry(_recalcular)
-
-def cargar_jugadores():
-    def _cargar():
-        conn = get_db_connection()
-        if conn is None:
-            return []
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, nombre, nivel, partidos, puntos_favor, puntos_contra, 
-                       victorias, derrotas, diferencia 
-                FROM jugadores 
-                ORDER BY puntos_favor DESC
-            ''')
-            jugadores = [dict(row) for row in cursor.fetchall()]
-            conn.close()
-            return jugadores
-        except Exception as e:
-            st.error(f"Error cargando jugadores: {e}")
-            conn.close()
-            return []
-    
-    return ejecutar_con_retry(_cargar)
-
-def guardar_jugador(nombre, nivel):
-    def _guardar():
-        conn = get_db_connection()
-        if conn is None:
-            return False
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO jugadores (nombre, nivel, partidos, puntos_favor, puntos_contra, 
-                                      victorias, derrotas, diferencia)
-                VALUES (?, ?, 0, 0, 0, 0, 0, 0)
-            ''', (nombre, nivel))
-            conn.commit()
-            conn.close()
-            return True
-        except sqlite3.IntegrityError:
-            conn.close()
-            return False
-        except Exception as e:
-            st.error(f"Error guardando jugador: {e}")
-            conn.close()
-            return False
-    
-    return ejecutar_con_retry(_guardar)
-
-def eliminar_jugador(nombre):
-    def _eliminar():
-        conn = get_db_connection()
-        if conn is None:
-            return False
-        try:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM jugadores WHERE nombre = ?", (nombre,))
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            st.error(f"Error eliminando jugador: {e}")
-            conn.close()
-            return False
-    
-    return ejecutar_con_retry(_eliminar)
-
-def crear_partido(j1, j2, j3, j4, pareja1, pareja2):
-    def _crear():
-        conn = get_db_connection()
-        if conn is None:
-            return None
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO partidos (j1, j2, j3, j4, pareja1, pareja2, activo, puntos_set1, puntos_set2, modo_muerte)
-                VALUES (?, ?, ?, ?, ?, ?, 1, 0, 0, 0)
-            ''', (j1, j2, j3, j4, pareja1, pareja2))
-            partido_id = cursor.lastrowid
-            conn.commit()
-            conn.close()
-            return partido_id
-        except Exception as e:
-            st.error(f"Error creando partido: {e}")
-            conn.close()
-            return None
-    
-    return ejecutar_con_retry(_crear)
-
-def cargar_partido(partido_id):
-    def _cargar():
-        conn = get_db_connection()
-        if conn is None:
-            return None
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, fecha, j1, j2, j3, j4, pareja1, pareja2, activo,
-                       puntos_pareja1, puntos_pareja2, puntos_set1, puntos_set2, 
-                       modo_muerte, ganadores, resultado
-                FROM partidos 
-                WHERE id = ?
-            ''', (partido_id,))
-            partido = cursor.fetchone()
-            conn.close()
-            if partido:
-                return dict(partido)
-            return None
-        except Exception as e:
-            st.error(f"Error cargando partido: {e}")
-            conn.close()
-            return None
-    
-    return ejecutar_con_retry(_cargar)
-
-def cargar_partidos_activos_paginado(offset=0, limit=20):
-    """Carga partidos activos con paginación"""
-    def _cargar():
-        conn = get_db_connection()
-        if conn is None:
-            return [], 0
-        try:
-            cursor = conn.cursor()
-            
-            # Obtener total
-            cursor.execute('SELECT COUNT(*) as total FROM partidos WHERE activo = 1')
-            total = cursor.fetchone()['total']
-            
-            # Obtener página
-            cursor.execute('''
-                SELECT id, fecha, j1, j2, j3, j4, pareja1, pareja2, activo,
-                       puntos_pareja1, puntos_pareja2, puntos_set1, puntos_set2, modo_muerte
-                FROM partidos 
-                WHERE activo = 1
-                ORDER BY fecha DESC
-                LIMIT ? OFFSET ?
-            ''', (limit, offset))
-            partidos = [dict(row) for row in cursor.fetchall()]
-            conn.close()
-            return partidos, total
-        except Exception as e:
-            st.error(f"Error cargando partidos activos: {e}")
-            conn.close()
-            return [], 0
-    
-    return ejecutar_con_retry(_cargar)
-
-def cargar_todos_partidos_paginado(offset=0, limit=20, filtro=""):
-    """Carga todos los partidos con paginación y filtro"""
-    def _cargar():
-        conn = get_db_connection()
-        if conn is None:
-            return [], 0
-        try:
-            cursor = conn.cursor()
-            
-            # Construir query base
-            query_base = "FROM partidos"
-            params = []
-            
-            if filtro:
-                query_base += " WHERE id LIKE ? OR pareja1 LIKE ? OR pareja2 LIKE ?"
-                filtro_param = f'%{filtro}%'
-                params = [filtro_param, filtro_param, filtro_param]
-            
-            # Obtener total
-            cursor.execute(f"SELECT COUNT(*) as total {query_base}", params)
-            total = cursor.fetchone()['total']
-            
-            # Obtener página
-            query = f'''
-                SELECT id, fecha, j1, j2, j3, j4, pareja1, pareja2, activo,
-                       puntos_pareja1, puntos_pareja2, resultado, ganadores
-                {query_base}
-                ORDER BY fecha DESC
-                LIMIT ? OFFSET ?
-            '''
-            params.extend([limit, offset])
-            
-            cursor.execute(query, params)
-            partidos = [dict(row) for row in cursor.fetchall()]
-            conn.close()
-            return partidos, total
-        except Exception as e:
-            st.error(f"Error cargando partidos: {e}")
-            conn.close()
-            return [], 0
-    
-    return ejecutar_con_retry(_cargar)
-
-def eliminar_partido(partido_id):
-    """Elimina un partido y recalcula estadísticas"""
-    def _eliminar():
-        conn = get_db_connection()
-        if conn is None:
-            return False
-        try:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM historial WHERE partido_id = ?", (partido_id,))
-            cursor.execute("DELETE FROM partidos WHERE id = ?", (partido_id,))
-            conn.commit()
-            conn.close()
-            recalcular_estadisticas()
-            return True
-        except Exception as e:
-            st.error(f"Error eliminando partido: {e}")
-            if conn:
-                conn.close()
-            return False
-    
-    return ejecutar_con_retry(_eliminar)
-
-def actualizar_puntos_set(partido_id, puntos_set1, puntos_set2):
-    def _actualizar():
-        conn = get_db_connection()
-        if conn is None:
-            return False
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE partidos 
-                SET puntos_set1 = ?, puntos_set2 = ?
-                WHERE id = ?
-            ''', (puntos_set1, puntos_set2, partido_id))
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            st.error(f"Error actualizando puntos: {e}")
-            conn.close()
-            return False
-    
-    return ejecutar_con_retry(_actualizar)
-
-def actualizar_modo_muerte(partido_id, modo_muerte):
-    def _actualizar():
-        conn = get_db_connection()
-        if conn is None:
-            return False
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE partidos 
-                SET modo_muerte = ?
-                WHERE id = ?
-            ''', (modo_muerte, partido_id))
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            st.error(f"Error actualizando modo muerte: {e}")
-            conn.close()
-            return False
-    
-    return ejecutar_con_retry(_actualizar)
-
-def actualizar_puntos_partido(partido_id, puntos_pareja1, puntos_pareja2):
-    def _actualizar():
-        conn = get_db_connection()
-        if conn is None:
-            return False
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE partidos 
-                SET puntos_pareja1 = ?, puntos_pareja2 = ?
-                WHERE id = ?
-            ''', (puntos_pareja1, puntos_pareja2, partido_id))
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            st.error(f"Error actualizando puntos: {e}")
-            conn.close()
-            return False
-    
-    return ejecutar_con_retry(_actualizar)
-
-def finalizar_partido(partido_id, puntos_pareja1, puntos_pareja2, ganadores):
-    def _finalizar():
-        conn = get_db_connection()
-        if conn is None:
-            return False
-        try:
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT * FROM partidos WHERE id = ?', (partido_id,))
-            partido = dict(cursor.fetchone())
-            
-            resultado = f"{puntos_pareja1} - {puntos_pareja2}"
-            cursor.execute('''
-                UPDATE partidos 
-                SET activo = 0, puntos_pareja1 = ?, puntos_pareja2 = ?, 
-                    ganadores = ?, resultado = ?
-                WHERE id = ?
-            ''', (puntos_pareja1, puntos_pareja2, ganadores, resultado, partido_id))
-            
-            cursor.execute('''
-                INSERT INTO historial (partido_id, fecha, pareja1, pareja2, resultado, ganadores)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (partido_id, partido['fecha'], partido['pareja1'], partido['pareja2'], resultado, ganadores))
-            
-            conn.commit()
-            conn.close()
-            recalcular_estadisticas()
-            return True
-        except Exception as e:
-            st.error(f"Error finalizando partido: {e}")
-            if conn:
-                conn.close()
-            return False
-    
-    return ejecutar_con_retry(_finalizar)
-
-def cargar_historial(limite=50):
-    def _cargar():
-        conn = get_db_connection()
-        if conn is None:
-            return []
-        try:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT fecha, pareja1, pareja2, resultado, ganadores
-                FROM historial 
-                ORDER BY id DESC 
-                LIMIT ?
-            ''', (limite,))
-            historial = [dict(row) for row in cursor.fetchall()]
-            conn.close()
-            return historial
-        except Exception as e:
-            st.error(f"Error cargando historial: {e}")
-            conn.close()
-            return []
-    
-    return ejecutar_con_retry(_cargar)
-
-def obtener_estadisticas_globales():
-    def _obtener():
-        conn = get_db_connection()
-        if conn is None:
-            return 0, 0, 0
-        try:
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) as total FROM partidos WHERE activo = 0')
-            total_partidos = cursor.fetchone()['total']
-            cursor.execute('SELECT SUM(puntos_favor) as total FROM jugadores')
-            total_puntos = cursor.fetchone()['total'] or 0
-            cursor.execute('SELECT MAX(puntos_favor) as max FROM jugadores')
-            max_puntos = cursor.fetchone()['max'] or 0
-            conn.close()
-            return total_partidos, total_puntos, max_puntos
-        except Exception as e:
-            st.error(f"Error obteniendo estadísticas: {e}")
-            conn.close()
-            return 0, 0, 0
-    
-    return ejecutar_con_retry(_obtener)
+def liga_de_sesion():
+    """Liga elegida en la URL (?liga=nombre); si no es válida o no existe se usa la liga por defecto.
+    
+    Abrir una liga no la crea: las ligas nuevas se crean desde "Nueva liga".
+    """
+    liga = st.query_params.get("liga", LIGA_POR_DEFECTO)
+    if not nombre_liga_valido(liga):
+        st.warning(f"⚠️ Liga '{liga}' no válida, se muestra la liga {LIGA_POR_DEFECTO}")
+        return LIGA_POR_DEFECTO
+    if liga not in listar_ligas():
+        st.warning(f"⚠️ La liga '{liga}' no existe, se muestra la liga {LIGA_POR_DEFECTO}")
+        return LIGA_POR_DEFECTO
+    return liga
+
+usar_liga(liga_de_sesion())
+iniciar_ejecucion()
+preparar_liga()
+obtener_programador_copias()
+obtener_ejecutor_tareas()
 
 # ============================================
 # FUNCIONES DE PAGINACIÓN (VERSIÓN SIMPLIFICADA)
@@ -579,6 +66,23 @@ def obtener_pagina(key_prefix, total_items, items_por_pagina):
     
     return st.session_state[f'{key_prefix}_pagina']
 
+def cargar_pagina(key_prefix, cargar, items_por_pagina, *args):
+    """Carga la página actual con cargar(offset, limit, *args), que devuelve (filas, total).
+    
+    El total llega con la propia página; solo si la página guardada ya no
+    existe (han desaparecido filas) se vuelve a pedir la última.
+    """
+    pagina_pedida = st.session_state.get(f'{key_prefix}_pagina', 1)
+    filas, total = cargar((pagina_pedida - 1) * items_por_pagina, items_por_pagina, *args)
+    pagina = obtener_pagina(key_prefix, total, items_por_pagina)
+    if pagina != pagina_pedida:
+        filas, total = cargar((pagina - 1) * items_por_pagina, items_por_pagina, *args)
+    return filas, total
+
+def volver_a_primera_pagina(key_prefix):
+    """Callback para filtros y órdenes: al cambiarlos se vuelve a la página 1"""
+    st.session_state[f'{key_prefix}_pagina'] = 1
+
 def mostrar_controles_paginacion(key_prefix, total_items, items_por_pagina):
     """Muestra los controles de paginación"""
     total_paginas = max(1, (total_items + items_por_pagina - 1) // items_por_pagina)
@@ -614,59 +118,63 @@ def mostrar_controles_paginacion(key_prefix, total_items, items_por_pagina):
             st.rerun()
 
 # ============================================
-# FUNCIONES PARA PUNTUACIÓN
+# MARCADOR EN MODO RÁPIDO
 # ============================================
 
-def convertir_puntos_tenis(puntos):
-    if puntos == 0:
-        return "0"
-    elif puntos == 1:
-        return "15"
-    elif puntos == 2:
-        return "30"
-    elif puntos == 3:
-        return "40"
-    else:
-        return "Ventaja"
-
-def procesar_punto(puntos1, puntos2, ganador, modo_muerte=False):
-    """Procesa un punto según las reglas del pádel"""
-    
-    if ganador == 1:
-        puntos1 += 1
-    else:
-        puntos2 += 1
-    
-    if modo_muerte and (puntos1 >= 3 or puntos2 >= 3):
-        if puntos1 > puntos2:
-            return 0, 0, True, 1
-        elif puntos2 > puntos1:
-            return 0, 0, True, 2
-    
-    if puntos1 >= 4 and puntos1 - puntos2 >= 2:
-        return 0, 0, True, 1
-    elif puntos2 >= 4 and puntos2 - puntos1 >= 2:
-        return 0, 0, True, 2
-    
-    if puntos1 >= 4 and puntos2 >= 4 and puntos1 == puntos2:
-        return 3, 3, False, 0
-    
-    return puntos1, puntos2, False, 0
+def guardar_puntos_rapido(liga, partido_id, version):
+    """Callback de "Guardar puntos": solo escribe si el partido sigue en la versión mostrada.
+    
+    La liga y la versión llegan en args al dibujar el botón. Los callbacks
+    corren antes que el script, así que aún no se ha elegido la liga de la
+    sesión; y la versión leída otra vez en el rerun del clic ya incluiría lo
+    que haya guardado otro anotador y el compare-and-swap nunca detectaría
+    el conflicto.
+    """
+    usar_liga(liga)
+    guardado = actualizar_puntos_partido(partido_id, st.session_state["directo1"], st.session_state["directo2"],
+                                         version=version)
+    if guardado:
+        st.session_state["aviso_puntos_rapido"] = (True, "✅ Puntos guardados!")
+    elif guardado is False:
+        st.session_state["aviso_puntos_rapido"] = (
+            False, "❌ Otro anotador modificó el marcador. Revisa los puntos y vuelve a guardar"
+        )
+        # Los campos vuelven a mostrar el marcador actual
+        for key in ("directo1", "directo2"):
+            st.session_state.pop(key, None)
 
 # ============================================
 # INTERFAZ DE USUARIO
 # ============================================
 
 st.title("🎾 Partidos de Señoras")
+if liga_actual() != LIGA_POR_DEFECTO:
+    st.caption(f"🏟️ Liga: {liga_actual()}")
 st.markdown("---")
 
 # Sidebar
 with st.sidebar:
+    ligas_disponibles = listar_ligas()
+    if len(ligas_disponibles) > 1:
+        liga_elegida = st.selectbox("🏟️ Liga", ligas_disponibles, index=ligas_disponibles.index(liga_actual()))
+        if liga_elegida != liga_actual():
+            st.query_params["liga"] = liga_elegida
+            st.rerun()
+    
+    with st.expander("🏟️ Nueva liga"):
+        with st.form("nueva_liga", clear_on_submit=True):
+            nombre_liga = st.text_input("Nombre de la liga", help="Minúsculas, números, '-' y '_'")
+            if st.form_submit_button("Crear liga"):
+                if crear_liga(nombre_liga.strip()):
+                    st.query_params["liga"] = nombre_liga.strip()
+                    st.rerun()
+    st.markdown("---")
+    
     st.header("📝 Nuevo Jugador")
     
     with st.form("alta_jugador", clear_on_submit=True):
         nombre = st.text_input("Nombre")
-        nivel = st.selectbox("Nivel", ["Panda", "Manco", "Muy Muy"])
+        nivel = st.selectbox("Nivel", NIVELES)
         
         if st.form_submit_button("Registrar"):
             if nombre:
@@ -677,487 +185,817 @@ with st.sidebar:
                     st.error("❌ El nombre ya existe")
     
     st.markdown("---")
-    st.caption("💾 Los datos se guardan automáticamente")
-
-# Pestañas
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-    "👥 Jugadores", "🎯 Partidos", "🏆 Puntuación", "📊 Clasificación", "📜 Historial", "🗑️ Borrar Partido"
-])
+    
+    with st.expander("📅 Temporadas"):
+        temporadas = cargar_temporadas()
+        if temporadas:
+            st.write(f"Temporada actual: **{temporadas[0]['nombre']}**")
+            st.caption(f"Desde {temporadas[0]['fecha_inicio'][:10]}")
+        with st.form("nueva_temporada", clear_on_submit=True):
+            nombre_temporada = st.text_input("Nombre de la nueva temporada")
+            if st.form_submit_button("Iniciar temporada"):
+                if nombre_temporada:
+                    archivados = iniciar_temporada(nombre_temporada)
+                    if archivados is not None:
+                        st.success(f"✅ Temporada {nombre_temporada} iniciada ({archivados} partidos archivados)")
+                        st.rerun()
+    
+    if obtener_almacen().persistente:
+        st.caption("💾 Los datos se guardan automáticamente")
+        
+        with st.expander("💾 Copias de seguridad"):
+            if st.button("Crear copia ahora"):
+                if encolar_tarea('copia'):
+                    st.success("✅ Copia en cola; se sigue en ⚙️ Tareas en segundo plano")
+        
+            copias_liga = copias.listar_copias(prefijo=liga_actual())
+            if copias_liga:
+                st.caption(f"{len(copias_liga)} copias (se guardan las últimas {copias.RETENCION_COPIAS})")
+                copia_elegida = st.selectbox(
+                    "Restaurar desde",
+                    copias_liga,
+                    format_func=lambda c: f"{c['fecha']:%d/%m/%Y %H:%M} · {c['tamano'] / 1024:.0f} KB",
+                )
+                confirmar = st.checkbox("Sí, sustituir los datos actuales por esta copia")
+                if st.button("Restaurar copia", disabled=not confirmar):
+                    restaurada = restaurar_copia_liga(copia_elegida['archivo'])
+                    if restaurada:
+                        # Todo lo dibujado hasta aquí es de la base anterior: se vuelve a dibujar
+                        st.session_state["aviso_restauracion"] = restaurada
+                        st.rerun()
+                if "aviso_restauracion" in st.session_state:
+                    restaurada = st.session_state.pop("aviso_restauracion")
+                    st.success(f"✅ Restaurada en {restaurada['duracion'] * 1000:.0f} ms")
+                    if restaurada['copia_previa']:
+                        st.caption(f"Estado anterior guardado en {restaurada['copia_previa']}")
+            else:
+                st.caption("Sin copias todavía")
+        
+            programador = obtener_programador_copias()
+            if programador is None:
+                st.caption("Copias automáticas desactivadas")
+            else:
+                st.caption(f"Copia automática cada {COPIAS_CADA_HORAS:g} h")
+                if liga_actual() in programador.errores:
+                    st.warning(f"Última copia automática fallida: {programador.errores[liga_actual()]}")
+    else:
+        st.caption("🧪 Almacén en memoria: los datos se pierden al reiniciar")
+    
+    if USAR_ESCRITOR_AGRUPADO:
+        stats_escritor = obtener_escritor(liga_actual()).estadisticas()
+        st.caption(
+            f"✍️ Escrituras en cola: {stats_escritor['en_cola']} · "
+            f"Lotes: {stats_escritor['lotes']} · "
+            f"Tamaño medio: {stats_escritor['lote_medio']} · "
+            f"Máximo: {stats_escritor['lote_maximo']}"
+        )
+    
+    bloqueos = st.expander("🔒 Bloqueos de BD", key="ver_bloqueos", on_change="rerun")
+    with bloqueos:
+        if bloqueos.open:
+            resumen_bloqueos = obtener_metricas_bloqueo(liga_actual()).resumen()
+            if resumen_bloqueos:
+                st.dataframe(resumen_bloqueos, hide_index=True)
+            else:
+                st.caption("Sin datos todavía")
+    
+    # Se rellena al final del script, cuando ya se han hecho todas las lecturas
+    hueco_lecturas = st.empty()
+
+    tareas_panel = st.expander("⚙️ Tareas en segundo plano", key="ver_tareas", on_change="rerun")
+    with tareas_panel:
+        if tareas_panel.open:
+            tipos_tarea = [t for t in TAREAS if t != 'copia' or obtener_almacen().persistente]
+            tipo_tarea = st.selectbox("Tarea", tipos_tarea, format_func=lambda t: TAREAS[t][0], key="tipo_tarea")
+            if st.button("Encolar", key="encolar_tarea"):
+                if encolar_tarea(tipo_tarea):
+                    st.success("✅ En cola: la app sigue disponible mientras se hace")
+            
+            tareas = cargar_tareas()
+            if tareas:
+                st.dataframe([{
+                    'Tarea': TAREAS[t['tipo']][0] if t['tipo'] in TAREAS else t['tipo'],
+                    'Estado': t['estado'],
+                    'Creada': t['creada'],
+                    'Terminada': t['terminada'] or '',
+                    'Resultado': t['error'] or t['resultado'] or '',
+                } for t in tareas], hide_index=True)
+                # Pulsarlo ya provoca el rerun que vuelve a leer la cola
+                st.button("🔄 Actualizar", key="actualizar_tareas")
+            else:
+                st.caption("Sin tareas todavía")
+    
+    with st.expander("🩺 Consistencia de estadísticas"):
+        st.caption("Compara las estadísticas de cada jugador con sus partidos")
+        col_verificar, col_reparar = st.columns(2)
+        with col_verificar:
+            if st.button("Verificar", key="verificar_estadisticas"):
+                desviaciones = verificar_estadisticas()
+                if desviaciones == []:
+                    st.success("✅ Todo cuadra")
+                elif desviaciones:
+                    st.warning(f"⚠️ {len(desviaciones)} jugadores desviados")
+                    st.dataframe(desviaciones, hide_index=True)
+        with col_reparar:
+            if st.button("Reparar", key="reparar_estadisticas"):
+                reparados = reparar_estadisticas()
+                if reparados is not None:
+                    st.success(f"✅ {len(reparados)} jugadores reparados")
+
+# Pestañas: solo se ejecuta la pestaña abierta (cambiar de pestaña hace un rerun)
+tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8, tab9 = st.tabs([
+    "👥 Jugadores", "🎯 Partidos", "🏆 Puntuación", "📊 Clasificación", "🤝 Parejas", "👤 Perfil", "📜 Historial",
+    "🗑️ Borrar Partido", "📈 Actividad"
+], key="pestana", on_change="rerun")
 
 # TAB 1: Jugadores
 with tab1:
-    jugadores = cargar_jugadores()
-    
-    if jugadores:
-        st.subheader(f"Jugadores ({len(jugadores)})")
-        
-        for j in jugadores:
-            col1, col2, col3, col4, col5, col6 = st.columns([3, 2, 1, 1, 1, 1])
-            with col1:
-                st.write(f"**{j['nombre']}**")
-            with col2:
-                st.write(f"Nivel: {j['nivel']}")
-            with col3:
-                st.write(f"🎾 {j['partidos']}")
-            with col4:
-                st.write(f"✅ {j['victorias']}")
-            with col5:
-                st.write(f"❌ {j['derrotas']}")
-            with col6:
-                st.write(f"⚡ {j['puntos_favor']}-{j['puntos_contra']}")
+    if tab1.open:
+        col_buscar, col_nivel, col_orden = st.columns([3, 2, 2])
+        with col_buscar:
+            filtro_jugador = st.text_input("🔍 Buscar jugador", key="filtro_jugadores",
+                                           on_change=volver_a_primera_pagina, args=("jugadores",))
+        with col_nivel:
+            nivel_jugador = st.selectbox("Nivel", ["Todos"] + NIVELES, key="nivel_jugadores",
+                                         on_change=volver_a_primera_pagina, args=("jugadores",))
+        with col_orden:
+            orden_jugador = st.selectbox("Ordenar por", list(ORDENES_JUGADORES), key="orden_jugadores",
+                                         on_change=volver_a_primera_pagina, args=("jugadores",))
+        nivel_filtro = None if nivel_jugador == "Todos" else nivel_jugador
+        
+        # Filtro, orden y página se resuelven en la BD: solo viaja al navegador una tabla con la página
+        items_por_pagina = 50
+        jugadores_pagina, total_jugadores = cargar_pagina(
+            "jugadores", cargar_jugadores_paginado, items_por_pagina, filtro_jugador, nivel_filtro, orden_jugador
+        )
         
-        with st.expander("Eliminar jugador"):
-            st.warning("⚠️ Al eliminar un jugador, también se borrarán todos sus partidos")
-            nombre = st.selectbox("Seleccionar", [j['nombre'] for j in jugadores])
-            if st.button("Eliminar Jugador"):
-                if eliminar_jugador(nombre):
-                    recalcular_estadisticas()
-                    st.success(f"✅ Jugador {nombre} eliminado")
-                    st.rerun()
-    else:
-        st.info("No hay jugadores. Agrega desde el menú lateral.")
+        if jugadores_pagina:
+            st.subheader(f"Jugadores ({total_jugadores})")
+            st.dataframe([{
+                'Jugador': j['nombre'],
+                'Nivel': j['nivel'],
+                '🎾 PJ': j['partidos'],
+                '✅ V': j['victorias'],
+                '❌ D': j['derrotas'],
+                '⚡ Puntos': f"{j['puntos_favor']}-{j['puntos_contra']}",
+                'Dif.': j['diferencia']
+            } for j in jugadores_pagina], use_container_width=True, hide_index=True)
+            mostrar_controles_paginacion("jugadores", total_jugadores, items_por_pagina)
+        elif filtro_jugador or nivel_filtro:
+            st.info("Ningún jugador coincide con la búsqueda")
+        else:
+            st.info("No hay jugadores. Agrega desde el menú lateral.")
+        
+        if total_jugadores or filtro_jugador or nivel_filtro:
+            eliminar = st.expander("Eliminar jugador", key="ver_eliminar_jugador", on_change="rerun")
+            with eliminar:
+                if eliminar.open:
+                    st.warning("⚠️ Al eliminar un jugador, también se borrarán todos sus partidos")
+                    nombre = st.selectbox("Seleccionar", [j['nombre'] for j in cargar_jugadores()])
+                    if st.button("Eliminar Jugador"):
+                        borrados = eliminar_jugador(nombre)
+                        if borrados is not None:
+                            st.success(f"✅ Jugador {nombre} eliminado ({borrados} partidos borrados)")
+                            st.rerun()
 
 # TAB 2: Partidos
 with tab2:
-    col1, col2 = st.columns(2)
-    jugadores = cargar_jugadores()
-    
-    with col1:
-        st.subheader("Nuevo Partido")
+    if tab2.open:
+        col1, col2 = st.columns(2)
+        jugadores = cargar_jugadores()
         
-        if len(jugadores) >= 4:
-            nombres = [j['nombre'] for j in jugadores]
-            
-            st.write("**Formar parejas:**")
-            
-            col_p1, col_p2 = st.columns(2)
-            
-            with col_p1:
-                st.markdown("**Pareja 1**")
-                jugador1_p1 = st.selectbox("Jugador 1", nombres, key="p1_j1")
-                opciones_j2 = [n for n in nombres if n != jugador1_p1]
-                jugador2_p1 = st.selectbox("Jugador 2", opciones_j2, key="p1_j2")
-            
-            with col_p2:
-                st.markdown("**Pareja 2**")
-                jugadores_usados = [jugador1_p1, jugador2_p1]
-                opciones_p2 = [n for n in nombres if n not in jugadores_usados]
-                jugador1_p2 = st.selectbox("Jugador 3", opciones_p2, key="p2_j1")
-                opciones_j4 = [n for n in opciones_p2 if n != jugador1_p2]
-                jugador2_p2 = st.selectbox("Jugador 4", opciones_j4, key="p2_j2")
+        with col1:
+            st.subheader("Nuevo Partido")
             
-            if st.button("Crear Partido", type="primary"):
-                pareja1 = f"{jugador1_p1} y {jugador2_p1}"
-                pareja2 = f"{jugador1_p2} y {jugador2_p2}"
-                partido_id = crear_partido(jugador1_p1, jugador2_p1, jugador1_p2, jugador2_p2, pareja1, pareja2)
-                if partido_id:
-                    st.success("✅ Partido creado correctamente!")
-                    st.rerun()
-        else:
-            st.warning(f"Necesitas 4 jugadores (tienes {len(jugadores)})")
-    
-    with col2:
-        st.subheader("Partidos Activos")
-        
-        items_por_pagina = 10
-        activos, total_activos = cargar_partidos_activos_paginado(0, 999)  # Cargar todos para mostrar
+            if len(jugadores) >= 4:
+                nombres = [j['nombre'] for j in jugadores]
+                
+                st.write("**Formar parejas:**")
+                
+                col_p1, col_p2 = st.columns(2)
+                
+                with col_p1:
+                    st.markdown("**Pareja 1**")
+                    jugador1_p1 = st.selectbox("Jugador 1", nombres, key="p1_j1")
+                    opciones_j2 = [n for n in nombres if n != jugador1_p1]
+                    jugador2_p1 = st.selectbox("Jugador 2", opciones_j2, key="p1_j2")
+                
+                with col_p2:
+                    st.markdown("**Pareja 2**")
+                    jugadores_usados = [jugador1_p1, jugador2_p1]
+                    opciones_p2 = [n for n in nombres if n not in jugadores_usados]
+                    jugador1_p2 = st.selectbox("Jugador 3", opciones_p2, key="p2_j1")
+                    opciones_j4 = [n for n in opciones_p2 if n != jugador1_p2]
+                    jugador2_p2 = st.selectbox("Jugador 4", opciones_j4, key="p2_j2")
+                
+                if st.button("Crear Partido", type="primary"):
+                    pareja1 = f"{jugador1_p1} y {jugador2_p1}"
+                    pareja2 = f"{jugador1_p2} y {jugador2_p2}"
+                    partido_id = crear_partido(jugador1_p1, jugador2_p1, jugador1_p2, jugador2_p2, pareja1, pareja2)
+                    if partido_id:
+                        st.success("✅ Partido creado correctamente!")
+                        st.rerun()
+            else:
+                st.warning(f"Necesitas 4 jugadores (tienes {len(jugadores)})")
         
-        if activos:
-            st.write(f"**Total partidos activos: {total_activos}**")
-            
-            # Paginación simplificada
-            pagina = obtener_pagina("activos", total_activos, items_por_pagina)
-            offset = (pagina - 1) * items_por_pagina
-            activos_pagina, _ = cargar_partidos_activos_paginado(offset, items_por_pagina)
+        with col2:
+            st.subheader("Partidos Activos")
             
-            for p in activos_pagina:
-                with st.container():
-                    st.write(f"**Partido #{p['id']}**")
-                    st.write(f"🏸 {p['pareja1']} vs {p['pareja2']}")
-                    if p.get('puntos_pareja1') is not None:
-                        st.write(f"📊 Marcador: {p.get('puntos_pareja1', 0)} - {p.get('puntos_pareja2', 0)}")
-                    st.divider()
+            items_por_pagina = 10
+            activos_pagina, total_activos = cargar_pagina("activos", cargar_partidos_activos_paginado, items_por_pagina)
             
-            mostrar_controles_paginacion("activos", total_activos, items_por_pagina)
-        else:
-            st.info("No hay partidos activos")
+            if activos_pagina:
+                st.write(f"**Total partidos activos: {total_activos}**")
+                
+                for p in activos_pagina:
+                    with st.container():
+                        st.write(f"**Partido #{p['id']}**")
+                        st.write(f"🏸 {p['pareja1']} vs {p['pareja2']}")
+                        if p.get('puntos_pareja1') is not None:
+                            st.write(f"📊 Marcador: {p.get('puntos_pareja1', 0)} - {p.get('puntos_pareja2', 0)}")
+                        st.divider()
+                
+                mostrar_controles_paginacion("activos", total_activos, items_por_pagina)
+            else:
+                st.info("No hay partidos activos")
 
 # TAB 3: Puntuación
 with tab3:
-    st.header("🏆 Puntuación de Partidos")
-    st.markdown("---")
-    
-    items_por_pagina = 15
-    partidos_activos, total_partidos = cargar_partidos_activos_paginado(0, 999)
-    
-    if partidos_activos:
-        st.write(f"**Total partidos activos: {total_partidos}**")
-        
-        # Paginación
-        pagina = obtener_pagina("puntuacion", total_partidos, items_por_pagina)
-        offset = (pagina - 1) * items_por_pagina
-        partidos_pagina, _ = cargar_partidos_activos_paginado(offset, items_por_pagina)
-        
-        opciones_partido = []
-        for p in partidos_pagina:
-            puntos_set1 = p.get('puntos_set1', 0) or 0
-            puntos_set2 = p.get('puntos_set2', 0) or 0
-            puntaje_tenis1 = convertir_puntos_tenis(puntos_set1)
-            puntaje_tenis2 = convertir_puntos_tenis(puntos_set2)
-            opciones_partido.append(f"#{p['id']} - {p['pareja1']} vs {p['pareja2']} [{puntaje_tenis1}-{puntaje_tenis2}]")
-        
-        partido_seleccionado = st.selectbox("Selecciona el partido", opciones_partido, key="puntaje_partido")
+    if tab3.open:
+        st.header("🏆 Puntuación de Partidos")
+        st.markdown("---")
         
-        mostrar_controles_paginacion("puntuacion", total_partidos, items_por_pagina)
+        items_por_pagina = 15
+        partidos_pagina, total_partidos = cargar_pagina("puntuacion", cargar_partidos_activos_paginado, items_por_pagina)
         
-        match = re.search(r'#(\d+)', partido_seleccionado)
-        if match:
-            partido_id = int(match.group(1))
-            partido = cargar_partido(partido_id)
+        if partidos_pagina:
+            st.write(f"**Total partidos activos: {total_partidos}**")
             
-            if partido:
-                puntos_set1 = partido.get('puntos_set1', 0) or 0
-                puntos_set2 = partido.get('puntos_set2', 0) or 0
-                puntos_partido1 = partido.get('puntos_pareja1', 0) or 0
-                puntos_partido2 = partido.get('puntos_pareja2', 0) or 0
-                modo_muerte = partido.get('modo_muerte', 0) or 0
-                
-                st.markdown("---")
-                
-                col1, col2, col3 = st.columns([2, 1, 2])
-                
-                with col1:
-                    st.markdown(f"""
-                    <div style="text-align: center; padding: 20px; background-color: #f0f2f6; border-radius: 10px;">
-                        <h3>🏸 {partido['pareja1']}</h3>
-                        <h1 style="font-size: 48px;">{puntos_partido1}</h1>
-                        <p style="font-size: 32px;">[{convertir_puntos_tenis(puntos_set1)}]</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                with col2:
-                    st.markdown("<h2 style='text-align: center; padding-top: 60px;'>VS</h2>", unsafe_allow_html=True)
-                
-                with col3:
-                    st.markdown(f"""
-                    <div style="text-align: center; padding: 20px; background-color: #f0f2f6; border-radius: 10px;">
-                        <h3>🏸 {partido['pareja2']}</h3>
-                        <h1 style="font-size: 48px;">{puntos_partido2}</h1>
-                        <p style="font-size: 32px;">[{convertir_puntos_tenis(puntos_set2)}]</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                
-                st.markdown("---")
+            opciones_partido = []
+            for p in partidos_pagina:
+                puntos_set1 = p.get('puntos_set1', 0) or 0
+                puntos_set2 = p.get('puntos_set2', 0) or 0
+                puntaje_tenis1 = convertir_puntos_tenis(puntos_set1)
+                puntaje_tenis2 = convertir_puntos_tenis(puntos_set2)
+                opciones_partido.append(f"#{p['id']} - {p['pareja1']} vs {p['pareja2']} [{puntaje_tenis1}-{puntaje_tenis2}]")
+            
+            partido_seleccionado = st.selectbox("Selecciona el partido", opciones_partido, key="puntaje_partido")
+            
+            mostrar_controles_paginacion("puntuacion", total_partidos, items_por_pagina)
+            
+            match = re.search(r'#(\d+)', partido_seleccionado)
+            if match:
+                partido_id = int(match.group(1))
+                partido = cargar_partido(partido_id)
                 
-                if puntos_set1 == 3 and puntos_set2 == 3 and modo_muerte == 0:
-                    st.warning("🏐 DEUCE (40-40) - Elige el modo de juego:")
+                if partido:
+                    puntos_set1 = partido.get('puntos_set1', 0) or 0
+                    puntos_set2 = partido.get('puntos_set2', 0) or 0
+                    puntos_partido1 = partido.get('puntos_pareja1', 0) or 0
+                    puntos_partido2 = partido.get('puntos_pareja2', 0) or 0
+                    modo_muerte = partido.get('modo_muerte', 0) or 0
                     
-                    col_deuce1, col_deuce2 = st.columns(2)
-                    with col_deuce1:
-                        if st.button("🏸 SUBE - Jugar a ventaja (2 puntos)", use_container_width=True, type="primary"):
-                            actualizar_modo_muerte(partido_id, 0)
-                            st.rerun()
-                    
-                    with col_deuce2:
-                        if st.button("💀 MUERE - Muerte súbita (1 punto)", use_container_width=True, type="primary"):
-                            actualizar_modo_muerte(partido_id, 1)
-                            st.rerun()
-                
-                elif puntos_set1 >= 4 or puntos_set2 >= 4:
-                    if puntos_set1 > puntos_set2:
-                        st.success(f"🎾 VENTAJA para {partido['pareja1']} - ¡Necesita otro punto para ganar!")
-                    else:
-                        st.success(f"🎾 VENTAJA para {partido['pareja2']} - ¡Necesita otro punto para ganar!")
+                    st.markdown("---")
                     
-                    if modo_muerte:
-                        st.info("💀 Modo MUERTE SÚBITA - El próximo punto gana el juego")
-                    else:
-                        st.info("🏸 Modo VENTAJA - Se necesita ventaja de 2 puntos")
-                
-                elif puntos_set1 == 3 and puntos_set2 == 3 and modo_muerte == 1:
-                    st.info("💀 Modo MUERTE SÚBITA activado - ¡El próximo punto gana el juego!")
-                
-                modo_rapido = st.checkbox("⚡ Modo rápido (ingresar puntos directamente)")
-                
-                if modo_rapido:
-                    st.subheader("Ingresar puntos del partido directamente")
-                    col_r1, col_r2 = st.columns(2)
+                    col1, col2, col3 = st.columns([2, 1, 2])
                     
-                    with col_r1:
-                        puntos_directos1 = st.number_input(f"Puntos {partido['pareja1']}", min_value=0, value=puntos_partido1, key="directo1")
-                    with col_r2:
-                        puntos_directos2 = st.number_input(f"Puntos {partido['pareja2']}", min_value=0, value=puntos_partido2, key="directo2")
+                    with col1:
+                        st.markdown(f"""
+                        <div style="text-align: center; padding: 20px; background-color: #f0f2f6; border-radius: 10px;">
+                            <h3>🏸 {partido['pareja1']}</h3>
+                            <h1 style="font-size: 48px;">{puntos_partido1}</h1>
+                            <p style="font-size: 32px;">[{convertir_puntos_tenis(puntos_set1)}]</p>
+                        </div>
+                        """, unsafe_allow_html=True)
                     
-                    if st.button("💾 Guardar puntos", type="primary"):
-                        if actualizar_puntos_partido(partido_id, puntos_directos1, puntos_directos2):
-                            st.success("✅ Puntos guardados!")
-                            st.rerun()
-                
-                else:
-                    st.subheader("Puntuación del juego actual (15-30-40)")
+                    with col2:
+                        st.markdown("<h2 style='text-align: center; padding-top: 60px;'>VS</h2>", unsafe_allow_html=True)
                     
-                    juego_terminado = False
-                    ganador_juego = None
+                    with col3:
+                        st.markdown(f"""
+                        <div style="text-align: center; padding: 20px; background-color: #f0f2f6; border-radius: 10px;">
+                            <h3>🏸 {partido['pareja2']}</h3>
+                            <h1 style="font-size: 48px;">{puntos_partido2}</h1>
+                            <p style="font-size: 32px;">[{convertir_puntos_tenis(puntos_set2)}]</p>
+                        </div>
+                        """, unsafe_allow_html=True)
                     
-                    if modo_muerte:
-                        if puntos_set1 == 4:
-                            juego_terminado = True
-                            ganador_juego = 1
-                        elif puntos_set2 == 4:
-                            juego_terminado = True
-                            ganador_juego = 2
-                    else:
-                        if puntos_set1 >= 4 and puntos_set1 - puntos_set2 >= 2:
-                            juego_terminado = True
-                            ganador_juego = 1
-                        elif puntos_set2 >= 4 and puntos_set2 - puntos_set1 >= 2:
-                            juego_terminado = True
-                            ganador_juego = 2
+                    st.markdown("---")
                     
-                    if juego_terminado:
-                        ganador_nombre = partido['pareja1'] if ganador_juego == 1 else partido['pareja2']
-                        st.success(f"🎉 ¡{ganador_nombre} ganó el juego!")
-                        col_g1, col_g2 = st.columns(2)
-                        with col_g1:
-                            if st.button("✅ Sumar punto al marcador", use_container_width=True, type="primary"):
-                                if ganador_juego == 1:
-                                    actualizar_puntos_partido(partido_id, puntos_partido1 + 1, puntos_partido2)
-                                else:
-                                    actualizar_puntos_partido(partido_id, puntos_partido1, puntos_partido2 + 1)
-                                actualizar_puntos_set(partido_id, 0, 0)
-                                actualizar_modo_muerte(partido_id, 0)
+                    if puntos_set1 == 3 and puntos_set2 == 3 and modo_muerte == 0:
+                        st.warning("🏐 DEUCE (40-40) - Elige el modo de juego:")
+                        
+                        col_deuce1, col_deuce2 = st.columns(2)
+                        with col_deuce1:
+                            if st.button("🏸 SUBE - Jugar a ventaja (2 puntos)", use_container_width=True, type="primary"):
+                                elegir_modo_muerte(partido_id, 0)
                                 st.rerun()
-                        with col_g2:
-                            if st.button("🔄 Continuar sin sumar", use_container_width=True):
-                                actualizar_puntos_set(partido_id, 0, 0)
-                                actualizar_modo_muerte(partido_id, 0)
+                        
+                        with col_deuce2:
+                            if st.button("💀 MUERE - Muerte súbita (1 punto)", use_container_width=True, type="primary"):
+                                elegir_modo_muerte(partido_id, 1)
                                 st.rerun()
+                    
+                    elif puntos_set1 >= 4 or puntos_set2 >= 4:
+                        if puntos_set1 > puntos_set2:
+                            st.success(f"🎾 VENTAJA para {partido['pareja1']} - ¡Necesita otro punto para ganar!")
+                        else:
+                            st.success(f"🎾 VENTAJA para {partido['pareja2']} - ¡Necesita otro punto para ganar!")
+                        
+                        if modo_muerte:
+                            st.info("💀 Modo MUERTE SÚBITA - El próximo punto gana el juego")
+                        else:
+                            st.info("🏸 Modo VENTAJA - Se necesita ventaja de 2 puntos")
+                    
+                    elif puntos_set1 == 3 and puntos_set2 == 3 and modo_muerte == 1:
+                        st.info("💀 Modo MUERTE SÚBITA activado - ¡El próximo punto gana el juego!")
+                    
+                    modo_rapido = st.checkbox("⚡ Modo rápido (ingresar puntos directamente)")
+                    
+                    if modo_rapido:
+                        st.subheader("Ingresar puntos del partido directamente")
+                        col_r1, col_r2 = st.columns(2)
+                        
+                        with col_r1:
+                            st.number_input(f"Puntos {partido['pareja1']}", min_value=0, value=puntos_partido1, key="directo1")
+                        with col_r2:
+                            st.number_input(f"Puntos {partido['pareja2']}", min_value=0, value=puntos_partido2, key="directo2")
+                        
+                        st.button("💾 Guardar puntos", type="primary", on_click=guardar_puntos_rapido,
+                                  args=(liga_actual(), partido_id, partido['version']))
+                        if "aviso_puntos_rapido" in st.session_state:
+                            guardado, aviso = st.session_state.pop("aviso_puntos_rapido")
+                            if guardado:
+                                st.success(aviso)
+                            else:
+                                st.error(aviso)
+                    
                     else:
-                        col_btn1, col_btn2 = st.columns(2)
+                        st.subheader("Puntuación del juego actual (15-30-40)")
                         
-                        with col_btn1:
-                            if st.button(f"🏸 +1 PUNTO - {partido['pareja1']}", use_container_width=True, type="primary"):
-                                nuevos_set1, nuevos_set2, juego_ganado, ganador = procesar_punto(
-                                    puntos_set1, puntos_set2, 1, modo_muerte
-                                )
-                                actualizar_puntos_set(partido_id, nuevos_set1, nuevos_set2)
-                                if juego_ganado and ganador == 1:
-                                    actualizar_puntos_partido(partido_id, puntos_partido1 + 1, puntos_partido2)
-                                    actualizar_puntos_set(partido_id, 0, 0)
-                                    actualizar_modo_muerte(partido_id, 0)
-                                    st.success(f"🎉 ¡Juego ganado!")
-                                st.rerun()
+                        juego_terminado = False
+                        ganador_juego = None
                         
-                        with col_btn2:
-                            if st.button(f"🏸 +1 PUNTO - {partido['pareja2']}", use_container_width=True, type="primary"):
-                                nuevos_set1, nuevos_set2, juego_ganado, ganador = procesar_punto(
-                                    puntos_set1, puntos_set2, 2, modo_muerte
-                                )
-                                actualizar_puntos_set(partido_id, nuevos_set1, nuevos_set2)
-                                if juego_ganado and ganador == 2:
-                                    actualizar_puntos_partido(partido_id, puntos_partido1, puntos_partido2 + 1)
-                                    actualizar_puntos_set(partido_id, 0, 0)
-                                    actualizar_modo_muerte(partido_id, 0)
-                                    st.success(f"🎉 ¡Juego ganado!")
-                                st.rerun()
-                
-                st.markdown("---")
-                
-                st.subheader("🏁 Finalizar Partido")
-                if puntos_partido1 > 0 or puntos_partido2 > 0:
-                    col_f1, col_f2, col_f3 = st.columns(3)
-                    with col_f2:
-                        if st.button("✅ FINALIZAR PARTIDO", type="primary", use_container_width=True):
-                            if puntos_partido1 != puntos_partido2:
-                                ganador = partido['pareja1'] if puntos_partido1 > puntos_partido2 else partido['pareja2']
-                                if finalizar_partido(partido_id, puntos_partido1, puntos_partido2, ganador):
-                                    st.success(f"✅ Partido finalizado! Ganó {ganador}")
-                                    st.balloons()
+                        if modo_muerte:
+                            if puntos_set1 == 4:
+                                juego_terminado = True
+                                ganador_juego = 1
+                            elif puntos_set2 == 4:
+                                juego_terminado = True
+                                ganador_juego = 2
+                        else:
+                            if puntos_set1 >= 4 and puntos_set1 - puntos_set2 >= 2:
+                                juego_terminado = True
+                                ganador_juego = 1
+                            elif puntos_set2 >= 4 and puntos_set2 - puntos_set1 >= 2:
+                                juego_terminado = True
+                                ganador_juego = 2
+                        
+                        if juego_terminado:
+                            ganador_nombre = partido['pareja1'] if ganador_juego == 1 else partido['pareja2']
+                            st.success(f"🎉 ¡{ganador_nombre} ganó el juego!")
+                            col_g1, col_g2 = st.columns(2)
+                            with col_g1:
+                                if st.button("✅ Sumar punto al marcador", use_container_width=True, type="primary"):
+                                    cerrar_juego(partido_id, ganador_juego)
                                     st.rerun()
-                            else:
-                                st.error("❌ No puede haber empate. Debe haber un ganador")
-                else:
-                    st.info("No se puede finalizar el partido sin puntos")
-    else:
-        st.info("No hay partidos activos. Crea un partido primero en la pestaña 'Partidos'")
+                            with col_g2:
+                                if st.button("🔄 Continuar sin sumar", use_container_width=True):
+                                    cerrar_juego(partido_id)
+                                    st.rerun()
+                        else:
+                            col_btn1, col_btn2 = st.columns(2)
+                            
+                            with col_btn1:
+                                if st.button(f"🏸 +1 PUNTO - {partido['pareja1']}", use_container_width=True, type="primary"):
+                                    if anotar_punto(partido_id, 1):
+                                        st.success(f"🎉 ¡Juego ganado!")
+                                    st.rerun()
+                            
+                            with col_btn2:
+                                if st.button(f"🏸 +1 PUNTO - {partido['pareja2']}", use_container_width=True, type="primary"):
+                                    if anotar_punto(partido_id, 2):
+                                        st.success(f"🎉 ¡Juego ganado!")
+                                    st.rerun()
+                    
+                    st.markdown("---")
+                    
+                    st.subheader("🏁 Finalizar Partido")
+                    if puntos_partido1 > 0 or puntos_partido2 > 0:
+                        col_f1, col_f2, col_f3 = st.columns(3)
+                        with col_f2:
+                            if st.button("✅ FINALIZAR PARTIDO", type="primary", use_container_width=True):
+                                if puntos_partido1 != puntos_partido2:
+                                    ganador = partido['pareja1'] if puntos_partido1 > puntos_partido2 else partido['pareja2']
+                                    if finalizar_partido(partido_id, puntos_partido1, puntos_partido2, ganador):
+                                        st.success(f"✅ Partido finalizado! Ganó {ganador}")
+                                        st.balloons()
+                                        st.rerun()
+                                else:
+                                    st.error("❌ No puede haber empate. Debe haber un ganador")
+                    else:
+                        st.info("No se puede finalizar el partido sin puntos")
+        else:
+            st.info("No hay partidos activos. Crea un partido primero en la pestaña 'Partidos'")
 
 # TAB 4: Clasificación
 with tab4:
-    jugadores = cargar_jugadores()
-    
-    if jugadores:
-        st.subheader("🏆 Clasificación General")
+    if tab4.open:
+        import pandas as pd
         
-        orden = st.radio(
-            "Ordenar por:",
-            ["Puntos a favor", "Victorias", "Diferencia", "Partidos jugados"],
-            horizontal=True
-        )
+        jugadores = cargar_jugadores_df()
         
-        if orden == "Puntos a favor":
-            clasificacion = sorted(jugadores, key=lambda x: x['puntos_favor'], reverse=True)
-        elif orden == "Victorias":
-            clasificacion = sorted(jugadores, key=lambda x: x['victorias'], reverse=True)
-        elif orden == "Diferencia":
-            clasificacion = sorted(jugadores, key=lambda x: x['diferencia'], reverse=True)
-        else:
-            clasificacion = sorted(jugadores, key=lambda x: x['partidos'], reverse=True)
+        temporadas = cargar_temporadas()
+        if len(temporadas) > 1:
+            opciones_temporada = ["Histórico"] + [t['nombre'] for t in temporadas]
+            temporada_elegida = st.selectbox("📅 Temporada", opciones_temporada)
+            if temporada_elegida != "Histórico":
+                temporada = next(t for t in temporadas if t['nombre'] == temporada_elegida)
+                jugadores = cargar_clasificacion_temporada_df(temporada)
         
-        data = []
-        for i, j in enumerate(clasificacion, 1):
-            data.append({
-                'Pos': i,
-                'Jugador': j['nombre'],
-                'Nivel': j['nivel'],
-                'Pts Favor': j['puntos_favor'],
-                'Pts Contra': j['puntos_contra'],
-                'Dif': j['diferencia'],
-                'V': j['victorias'],
-                'D': j['derrotas'],
-                'PJ': j['partidos']
+        if not jugadores.empty:
+            st.subheader("🏆 Clasificación General")
+            
+            orden = st.radio(
+                "Ordenar por:",
+                ["Puntos a favor", "Victorias", "Diferencia", "Partidos jugados"],
+                horizontal=True
+            )
+            
+            columnas_orden = {
+                "Puntos a favor": 'puntos_favor',
+                "Victorias": 'victorias',
+                "Diferencia": 'diferencia',
+                "Partidos jugados": 'partidos'
+            }
+            clasificacion = jugadores.sort_values(columnas_orden[orden], ascending=False, kind='stable')
+            
+            df = clasificacion[[
+                'nombre', 'nivel', 'puntos_favor', 'puntos_contra', 'diferencia', 'victorias', 'derrotas', 'partidos'
+            ]].rename(columns={
+                'nombre': 'Jugador',
+                'nivel': 'Nivel',
+                'puntos_favor': 'Pts Favor',
+                'puntos_contra': 'Pts Contra',
+                'diferencia': 'Dif',
+                'victorias': 'V',
+                'derrotas': 'D',
+                'partidos': 'PJ'
             })
+            df.insert(0, 'Pos', range(1, len(df) + 1))
+            st.dataframe(df, use_container_width=True, hide_index=True)
+            
+            st.markdown("---")
+            st.subheader("🥇 Máximos anotadores")
+            top_puntos = jugadores.sort_values('puntos_favor', ascending=False, kind='stable').head(3)
+            
+            columnas_top = st.columns(3)
+            for columna, medalla, (_, j) in zip(columnas_top, ["🥇 1º", "🥈 2º", "🥉 3º"], top_puntos.iterrows()):
+                with columna:
+                    st.metric(medalla, j['nombre'], f"{j['puntos_favor']} pts")
+            
+            st.markdown("---")
+            st.subheader("⭐ Mejor diferencia")
+            mejor_diff = jugadores.loc[jugadores['diferencia'].idxmax()]
+            st.write(f"**{mejor_diff['nombre']}** - Diferencia: +{mejor_diff['diferencia']}")
         
-        df = pd.DataFrame(data)
-        st.dataframe(df, use_container_width=True, hide_index=True)
+        else:
+            st.info("No hay datos para mostrar")
         
-        st.markdown("---")
-        st.subheader("🥇 Máximos anotadores")
-        top_puntos = sorted(jugadores, key=lambda x: x['puntos_favor'], reverse=True)[:3]
+        if len(listar_ligas()) > 1:
+            st.markdown("---")
+            st.subheader("🌍 Clasificación entre ligas")
+            
+            data = []
+            for i, j in enumerate(clasificacion_entre_ligas(), 1):
+                data.append({
+                    'Pos': i,
+                    'Liga': j['liga'],
+                    'Jugador': j['nombre'],
+                    'Nivel': j['nivel'],
+                    'Pts Favor': j['puntos_favor'],
+                    'Dif': j['diferencia'],
+                    'V': j['victorias'],
+                    'D': j['derrotas'],
+                    'PJ': j['partidos']
+                })
+            
+            if data:
+                st.dataframe(pd.DataFrame(data), use_container_width=True, hide_index=True)
+
+# TAB 5: Parejas
+with tab5:
+    if tab5.open:
+        import pandas as pd
         
-        col1, col2, col3 = st.columns(3)
-        if len(top_puntos) >= 1:
-            with col1:
-                st.metric("🥇 1º", top_puntos[0]['nombre'], f"{top_puntos[0]['puntos_favor']} pts")
-        if len(top_puntos) >= 2:
-            with col2:
-                st.metric("🥈 2º", top_puntos[1]['nombre'], f"{top_puntos[1]['puntos_favor']} pts")
-        if len(top_puntos) >= 3:
-            with col3:
-                st.metric("🥉 3º", top_puntos[2]['nombre'], f"{top_puntos[2]['puntos_favor']} pts")
+        st.subheader("🤝 Parejas y cara a cara")
         
-        st.markdown("---")
-        st.subheader("⭐ Mejor diferencia")
-        mejor_diff = sorted(jugadores, key=lambda x: x['diferencia'], reverse=True)[0]
-        st.write(f"**{mejor_diff['nombre']}** - Diferencia: +{mejor_diff['diferencia']}")
+        nombres_jugadores = [j['nombre'] for j in cargar_jugadores()]
         
-    else:
-        st.info("No hay datos para mostrar")
+        if nombres_jugadores:
+            jugador_stats = st.selectbox("Jugador", nombres_jugadores, key="parejas_jugador")
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.markdown("**Con sus compañeros**")
+                companeros = cargar_companeros(jugador_stats)
+                if companeros:
+                    st.dataframe(pd.DataFrame([{
+                        'Compañero': c['companero'],
+                        'PJ': c['partidos'],
+                        'V': c['victorias'],
+                        'D': c['partidos'] - c['victorias'],
+                        'Pts Favor': c['puntos_favor'],
+                        'Pts Contra': c['puntos_contra']
+                    } for c in companeros]), use_container_width=True, hide_index=True)
+                else:
+                    st.info("Todavía no ha jugado ningún partido")
+            
+            with col2:
+                st.markdown("**Contra sus rivales**")
+                enfrentamientos = cargar_enfrentamientos(jugador_stats)
+                if enfrentamientos:
+                    st.dataframe(pd.DataFrame([{
+                        'Rival': e['rival'],
+                        'PJ': e['partidos'],
+                        'V': e['victorias'],
+                        'D': e['partidos'] - e['victorias'],
+                        'Pts Favor': e['puntos_favor'],
+                        'Pts Contra': e['puntos_contra']
+                    } for e in enfrentamientos]), use_container_width=True, hide_index=True)
+                else:
+                    st.info("Todavía no ha jugado ningún partido")
+            
+            st.markdown("---")
+            st.subheader("⚔️ Cara a cara")
+            rivales = [n for n in nombres_jugadores if n != jugador_stats]
+            if rivales:
+                rival = st.selectbox("Rival", rivales, key="parejas_rival")
+                cara_a_cara = cargar_enfrentamientos(jugador_stats, rival)
+                if cara_a_cara:
+                    e = cara_a_cara[0]
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        st.metric("Partidos", e['partidos'])
+                    with col2:
+                        st.metric(f"Victorias de {jugador_stats}", e['victorias'])
+                    with col3:
+                        st.metric(f"Victorias de {rival}", e['partidos'] - e['victorias'])
+                else:
+                    st.info(f"{jugador_stats} y {rival} no se han enfrentado todavía")
+            
+            st.markdown("---")
+            st.subheader("🏅 Mejores parejas")
+            mejores = cargar_mejores_parejas()
+            if mejores:
+                st.dataframe(pd.DataFrame([{
+                    'Pareja': f"{p['jugador_a']} y {p['jugador_b']}",
+                    'PJ': p['partidos'],
+                    'V': p['victorias'],
+                    'D': p['partidos'] - p['victorias'],
+                    'Dif': p['puntos_favor'] - p['puntos_contra']
+                } for p in mejores]), use_container_width=True, hide_index=True)
+        else:
+            st.info("No hay jugadores. Agrega desde el menú lateral.")
 
-# TAB 5: Historial
-with tab5:
-    st.subheader("📜 Historial de Partidos")
-    
-    historial = cargar_historial()
-    
-    if historial:
-        for partido in historial:
-            with st.container():
-                col1, col2, col3 = st.columns([2, 3, 2])
-                with col1:
-                    st.write(f"**{partido['fecha'][:16]}**")
-                with col2:
-                    st.write(f"{partido['pareja1']} vs {partido['pareja2']}")
-                with col3:
-                    st.write(f"📊 {partido['resultado']}")
-                st.write(f"🏆 Ganadores: {partido['ganadores']}")
-                st.divider()
+# TAB 6: Perfil
+with tab6:
+    if tab6.open:
+        import pandas as pd
         
-        st.markdown("---")
-        st.subheader("📈 Resumen Global")
+        jugadores_perfil = cargar_jugadores()
         
-        total_partidos, total_puntos, max_puntos = obtener_estadisticas_globales()
+        if jugadores_perfil:
+            nombres_perfil = [j['nombre'] for j in jugadores_perfil]
+            nombre_perfil = st.selectbox("Jugador", nombres_perfil, key="perfil_jugador")
+            j = next(j for j in jugadores_perfil if j['nombre'] == nombre_perfil)
+            
+            st.subheader(f"👤 {j['nombre']}")
+            st.caption(f"Nivel: {j['nivel']}")
+            
+            partidos_perfil = cargar_partidos_jugador(nombre_perfil, limite=20)
+            victorias_seguidas, derrotas_seguidas = calcular_racha(partidos_perfil)
+            
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("🎾 Partidos", j['partidos'])
+            with col2:
+                st.metric("✅ Victorias", j['victorias'])
+            with col3:
+                st.metric("⚡ Diferencia", j['diferencia'])
+            with col4:
+                if victorias_seguidas:
+                    st.metric("🔥 Racha", f"{victorias_seguidas} V")
+                elif derrotas_seguidas:
+                    st.metric("🥶 Racha", f"{derrotas_seguidas} D")
+                else:
+                    st.metric("Racha", "-")
+            
+            finalizados = [p for p in partidos_perfil if not p['activo']]
+            if finalizados:
+                st.write("**Forma (últimos 5):** " + " ".join("✅" if p['gana'] else "❌" for p in finalizados[:5]))
+                
+                st.markdown("**📈 Puntos por partido**")
+                tendencia = pd.DataFrame([{
+                    'Partido': f"#{p['partido_id']}",
+                    'A favor': p['puntos_favor'],
+                    'En contra': p['puntos_contra']
+                } for p in reversed(finalizados)]).set_index('Partido')
+                st.line_chart(tendencia)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**🕒 Últimos partidos**")
+                if partidos_perfil:
+                    st.dataframe(pd.DataFrame([{
+                        'Fecha': (p['fecha'] or '')[:16],
+                        'Compañero': p['companero'],
+                        'Rivales': p['rivales'],
+                        'Resultado': "En juego" if p['activo'] else f"{p['puntos_favor']} - {p['puntos_contra']}",
+                        '': "" if p['activo'] else ("✅" if p['gana'] else "❌")
+                    } for p in partidos_perfil]), use_container_width=True, hide_index=True)
+                else:
+                    st.info("Todavía no ha jugado ningún partido")
+            with col2:
+                st.markdown("**🤝 Compañeros**")
+                companeros_perfil = cargar_companeros(nombre_perfil)
+                if companeros_perfil:
+                    st.dataframe(pd.DataFrame([{
+                        'Compañero': c['companero'],
+                        'PJ': c['partidos'],
+                        'V': c['victorias']
+                    } for c in companeros_perfil]), use_container_width=True, hide_index=True)
+        else:
+            st.info("No hay jugadores. Agrega desde el menú lateral.")
+
+# TAB 7: Historial
+with tab7:
+    if tab7.open:
+        st.subheader("📜 Historial de Partidos")
+        
+        col_buscar, col_orden = st.columns([3, 2])
+        with col_buscar:
+            filtro_historial = st.text_input("🔍 Buscar por pareja", key="filtro_historial",
+                                             on_change=volver_a_primera_pagina, args=("historial",))
+        with col_orden:
+            orden_historial = st.radio("Orden", ["Más recientes", "Más antiguos"], horizontal=True,
+                                       key="orden_historial", on_change=volver_a_primera_pagina,
+                                       args=("historial",))
+        recientes_primero = orden_historial == "Más recientes"
+        
+        items_por_pagina = 50
+        historial, total_historial = cargar_pagina(
+            "historial", cargar_historial_paginado, items_por_pagina, filtro_historial, recientes_primero
+        )
         
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Total Partidos", total_partidos)
-        with col2:
-            st.metric("Total Puntos", total_puntos)
-        with col3:
-            st.metric("Máximo Puntos", max_puntos)
-    else:
-        st.info("No hay partidos finalizados aún")
+        if historial or filtro_historial:
+            if historial:
+                st.caption(f"{total_historial} partidos")
+                st.dataframe([{
+                    'Fecha': (partido['fecha_fin'] or partido['fecha'] or '')[:16],
+                    'Pareja 1': partido['pareja1'],
+                    'Pareja 2': partido['pareja2'],
+                    '📊 Resultado': partido['resultado'],
+                    '🏆 Ganadores': partido['ganadores']
+                } for partido in historial], use_container_width=True, hide_index=True)
+                mostrar_controles_paginacion("historial", total_historial, items_por_pagina)
+            else:
+                st.info("Ningún partido coincide con la búsqueda")
+            
+            st.markdown("---")
+            st.subheader("📈 Resumen Global")
+            
+            total_partidos, total_puntos, max_puntos = obtener_estadisticas_globales()
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Total Partidos", total_partidos)
+            with col2:
+                st.metric("Total Puntos", total_puntos)
+            with col3:
+                st.metric("Máximo Puntos", max_puntos)
+        else:
+            st.info("No hay partidos finalizados aún")
 
-# TAB 6: Borrar Partido
-with tab6:
-    st.header("🗑️ Borrar Partido")
-    st.warning("⚠️ Esta acción eliminará permanentemente el partido y no se puede deshacer")
-    st.markdown("---")
-    
-    filtro_partido = st.text_input("🔍 Buscar partido (por ID o pareja)", key="filtro_borrar")
-    
-    items_por_pagina = 15
-    todos_partidos, total_partidos = cargar_todos_partidos_paginado(0, 999, filtro_partido)
-    
-    if todos_partidos:
-        st.write(f"**Total partidos: {total_partidos}**")
+# TAB 8: Borrar Partido
+with tab8:
+    if tab8.open:
+        st.header("🗑️ Borrar Partido")
+        st.warning("⚠️ Esta acción eliminará permanentemente el partido y no se puede deshacer")
+        st.markdown("---")
         
-        # Paginación
-        pagina = obtener_pagina("borrar", total_partidos, items_por_pagina)
-        offset = (pagina - 1) * items_por_pagina
-        partidos_pagina, _ = cargar_todos_partidos_paginado(offset, items_por_pagina, filtro_partido)
+        filtro_partido = st.text_input("🔍 Buscar partido (por ID o pareja)", key="filtro_borrar")
         
-        opciones_partido = []
-        for p in partidos_pagina:
-            estado = "🟢 Activo" if p['activo'] == 1 else "🔴 Finalizado"
-            fecha = p['fecha'][:16] if p['fecha'] else "Fecha desconocida"
-            resultado = f" - {p['resultado']}" if p['resultado'] else ""
-            opciones_partido.append(f"{estado} - #{p['id']} [{fecha}] - {p['pareja1']} vs {p['pareja2']}{resultado}")
+        items_por_pagina = 15
+        partidos_pagina, total_partidos = cargar_pagina(
+            "borrar", cargar_todos_partidos_paginado, items_por_pagina, filtro_partido
+        )
         
-        if opciones_partido:
-            partido_seleccionado = st.selectbox(
-                "Selecciona el partido que quieres eliminar",
-                opciones_partido,
-                key="borrar_partido_select"
-            )
+        if partidos_pagina:
+            st.write(f"**Total partidos: {total_partidos}**")
             
-            mostrar_controles_paginacion("borrar", total_partidos, items_por_pagina)
+            opciones_partido = []
+            for p in partidos_pagina:
+                estado = "🟢 Activo" if p['activo'] == 1 else "🔴 Finalizado"
+                fecha = p['fecha'][:16] if p['fecha'] else "Fecha desconocida"
+                resultado = f" - {p['resultado']}" if p['resultado'] else ""
+                opciones_partido.append(f"{estado} - #{p['id']} [{fecha}] - {p['pareja1']} vs {p['pareja2']}{resultado}")
             
-            if partido_seleccionado:
-                match = re.search(r'#(\d+)', partido_seleccionado)
-                if match:
-                    partido_id = int(match.group(1))
-                    partido = cargar_partido(partido_id)
-                    
-                    if partido:
-                        st.markdown("---")
-                        st.subheader("📋 Detalles del partido a eliminar:")
-                        
-                        col_d1, col_d2 = st.columns(2)
-                        with col_d1:
-                            st.write(f"**ID:** #{partido['id']}")
-                            st.write(f"**Fecha:** {partido['fecha']}")
-                            st.write(f"**Pareja 1:** {partido['pareja1']}")
-                            st.write(f"**Pareja 2:** {partido['pareja2']}")
-                        with col_d2:
-                            st.write(f"**Estado:** {'🟢 Activo' if partido['activo'] == 1 else '🔴 Finalizado'}")
-                            if partido['resultado']:
-                                st.write(f"**Resultado:** {partido['resultado']}")
-                            if partido['ganadores']:
-                                st.write(f"**Ganadores:** {partido['ganadores']}")
-                        
-                        st.markdown("---")
-                        st.error("⚠️ ¡ATENCIÓN! Esta acción es irreversible")
-                        
-                        confirmar_texto = st.text_input("Escribe 'ELIMINAR' para confirmar:", key="confirmar_eliminar")
+            if opciones_partido:
+                partido_seleccionado = st.selectbox(
+                    "Selecciona el partido que quieres eliminar",
+                    opciones_partido,
+                    key="borrar_partido_select"
+                )
+                
+                mostrar_controles_paginacion("borrar", total_partidos, items_por_pagina)
+                
+                if partido_seleccionado:
+                    match = re.search(r'#(\d+)', partido_seleccionado)
+                    if match:
+                        partido_id = int(match.group(1))
+                        partido = cargar_partido(partido_id)
                         
-                        if confirmar_texto == "ELIMINAR":
-                            if st.button("🗑️ SÍ, ELIMINAR PARTIDO PERMANENTEMENTE", type="primary", use_container_width=True):
-                                if eliminar_partido(partido_id):
-                                    st.success(f"✅ Partido #{partido_id} eliminado correctamente!")
-                                    st.balloons()
-                                    st.session_state['borrar_pagina'] = 1
-                                    st.rerun()
-                                else:
-                                    st.error("❌ Error al eliminar el partido")
-                        elif confirmar_texto:
-                            st.info("Escribe 'ELIMINAR' para habilitar el botón de eliminación")
+                        if partido:
+                            st.markdown("---")
+                            st.subheader("📋 Detalles del partido a eliminar:")
+                            
+                            col_d1, col_d2 = st.columns(2)
+                            with col_d1:
+                                st.write(f"**ID:** #{partido['id']}")
+                                st.write(f"**Fecha:** {partido['fecha']}")
+                                st.write(f"**Pareja 1:** {partido['pareja1']}")
+                                st.write(f"**Pareja 2:** {partido['pareja2']}")
+                            with col_d2:
+                                st.write(f"**Estado:** {'🟢 Activo' if partido['activo'] == 1 else '🔴 Finalizado'}")
+                                if partido['resultado']:
+                                    st.write(f"**Resultado:** {partido['resultado']}")
+                                if partido['ganadores']:
+                                    st.write(f"**Ganadores:** {partido['ganadores']}")
+                            
+                            st.markdown("---")
+                            st.error("⚠️ ¡ATENCIÓN! Esta acción es irreversible")
+                            
+                            confirmar_texto = st.text_input("Escribe 'ELIMINAR' para confirmar:", key="confirmar_eliminar")
+                            
+                            if confirmar_texto == "ELIMINAR":
+                                if st.button("🗑️ SÍ, ELIMINAR PARTIDO PERMANENTEMENTE", type="primary", use_container_width=True):
+                                    if eliminar_partido(partido_id):
+                                        st.success(f"✅ Partido #{partido_id} eliminado correctamente!")
+                                        st.balloons()
+                                        st.session_state['borrar_pagina'] = 1
+                                        st.rerun()
+                                    else:
+                                        st.error("❌ Error al eliminar el partido")
+                            elif confirmar_texto:
+                                st.info("Escribe 'ELIMINAR' para habilitar el botón de eliminación")
+            else:
+                if filtro_partido:
+                    st.info(f"No hay partidos que coincidan con '{filtro_partido}'")
+                else:
+                    st.info("No hay partidos registrados")
         else:
             if filtro_partido:
                 st.info(f"No hay partidos que coincidan con '{filtro_partido}'")
             else:
                 st.info("No hay partidos registrados")
-    else:
-        if filtro_partido:
-            st.info(f"No hay partidos que coincidan con '{filtro_partido}'")
+
+# TAB 9: Actividad
+with tab9:
+    if tab9.open:
+        st.subheader("📈 Actividad de la liga")
+        
+        periodo = st.radio("Agrupar por:", ["Día", "Semana", "Mes"], horizontal=True, key="actividad_periodo")
+        if periodo == "Día":
+            # Por días solo los últimos tres meses; semanas y meses desde el principio
+            desde = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')
+            actividad = cargar_partidos_por_periodo('dia', desde)
+        else:
+            actividad = cargar_partidos_por_periodo('semana' if periodo == "Semana" else 'mes')
+        
+        if actividad.empty:
+            st.info("Todavía no hay partidos finalizados")
         else:
-            st.info("No hay partidos registrados")
+            st.bar_chart(actividad, x='periodo', y='partidos', x_label=periodo, y_label="Partidos")
+            
+            st.markdown("---")
+            st.subheader("🎯 Puntos por jugador y mes")
+            nombres_actividad = [j['nombre'] for j in cargar_jugadores()]
+            elegidos = st.multiselect("Jugadores", nombres_actividad, default=nombres_actividad[:5])
+            puntos_mes = cargar_puntos_jugador_mes(elegidos)
+            if not puntos_mes.empty:
+                st.line_chart(puntos_mes, x='mes', y='puntos_favor', color='nombre', x_label="Mes", y_label="Puntos")
+            
+            st.markdown("---")
+            st.subheader("📶 Actividad por nivel")
+            por_nivel = cargar_actividad_por_nivel()
+            st.bar_chart(por_nivel, x='mes', y='participaciones', color='nivel', x_label="Mes", y_label="Participaciones")
+            st.caption("Cada partido cuenta una participación por jugador, según su nivel actual")
+
+# Lecturas de esta ejecución: las repetidas se han servido de memoria (iniciar_ejecucion)
+lecturas = resumen_ejecucion()
+hueco_lecturas.caption(
+    f"🧮 Lecturas en esta ejecución: {lecturas['consultas']} a la BD · "
+    f"{lecturas['ahorradas']} repetidas servidas de memoria"
+)
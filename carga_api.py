@@ -0,0 +1,110 @@
+"""Prueba de carga local de la API (api.py).
+
+Simula pantallas que sondean partidos y clasificación con If-None-Match y
+anotadores que suman puntos, y muestra peticiones por segundo, latencias
+p50/p95/p99, proporción de 304 y errores por endpoint.
+
+    uvicorn api:app --port 8502 &
+    python carga_api.py --url http://127.0.0.1:8502 --clientes 20 --segundos 10
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+class Cliente:
+    """Un cliente HTTP con conexión persistente que recuerda los ETag recibidos"""
+
+    def __init__(self, url):
+        partes = urlsplit(url)
+        self.conn = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=30)
+        self.etags = {}
+
+    def pedir(self, metodo, ruta, cuerpo=None):
+        cabeceras = {}
+        if metodo == 'GET' and ruta in self.etags:
+            cabeceras['If-None-Match'] = self.etags[ruta]
+        if cuerpo is not None:
+            cuerpo = json.dumps(cuerpo)
+            cabeceras['Content-Type'] = 'application/json'
+        self.conn.request(metodo, ruta, body=cuerpo, headers=cabeceras)
+        respuesta = self.conn.getresponse()
+        datos = respuesta.read()
+        if respuesta.getheader('ETag'):
+            self.etags[ruta] = respuesta.getheader('ETag')
+        return respuesta.status, datos
+
+
+def ejecutar(url, liga, clientes, segundos, proporcion_puntos):
+    muestras = defaultdict(list)
+    estados = defaultdict(lambda: defaultdict(int))
+    lock = threading.Lock()
+    fin = time.perf_counter() + segundos
+
+    def _trabajar():
+        cliente = Cliente(url)
+        partidos = []
+        while time.perf_counter() < fin:
+            if partidos and random.random() < proporcion_puntos:
+                endpoint = 'POST punto'
+                metodo, ruta = 'POST', f"/ligas/{liga}/partidos/{random.choice(partidos)}/punto"
+                cuerpo = {'ganador': random.choice((1, 2))}
+            else:
+                endpoint = random.choice(('GET partidos', 'GET clasificacion'))
+                metodo, ruta, cuerpo = 'GET', f"/ligas/{liga}/{endpoint.split()[1]}", None
+            inicio = time.perf_counter()
+            try:
+                status, datos = cliente.pedir(metodo, ruta, cuerpo)
+            except (OSError, http.client.HTTPException):
+                status, datos = 'error', b''
+                cliente = Cliente(url)
+            duracion = time.perf_counter() - inicio
+            if endpoint == 'GET partidos' and status == 200:
+                partidos = [p['id'] for p in json.loads(datos)['partidos']]
+            with lock:
+                muestras[endpoint].append(duracion)
+                estados[endpoint][status] += 1
+
+    hilos = [threading.Thread(target=_trabajar) for _ in range(clientes)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    total = sum(len(v) for v in muestras.values())
+    print(f"{clientes} clientes, {segundos} s: {total} peticiones, {total / segundos:.0f} pet/s")
+    print(f"{'endpoint':<20}{'n':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'304':>7}{'errores':>9}")
+    for endpoint in sorted(muestras):
+        tiempos = muestras[endpoint]
+        n = len(tiempos)
+        no_modificadas = estados[endpoint].get(304, 0)
+        errores = sum(c for s, c in estados[endpoint].items() if s == 'error' or s >= 400)
+        print(f"{endpoint:<20}{n:>7}{percentil(tiempos, 50) * 1000:>9.1f}{percentil(tiempos, 95) * 1000:>9.1f}"
+              f"{percentil(tiempos, 99) * 1000:>9.1f}{no_modificadas / n:>7.0%}{errores:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de pádel")
+    parser.add_argument('--url', default='http://127.0.0.1:8502')
+    parser.add_argument('--liga', default='principal')
+    parser.add_argument('--clientes', type=int, default=20)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--puntos', type=float, default=0.1, help="proporción de peticiones que anotan un punto")
+    args = parser.parse_args(argv)
+    ejecutar(args.url, args.liga, args.clientes, args.segundos, args.puntos)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""Prueba de carga de la app de Streamlit con varias sesiones simultáneas.
+
+Cada sesión es un AppTest en su propio proceso (AppTest no admite varias
+ejecuciones a la vez en un mismo proceso: instala un Runtime global), así
+que las sesiones comparten el archivo SQLite pero no las cachés ni el
+escritor agrupado, como varias réplicas del servidor apuntando a la misma
+base. Todas arrancan a la vez tras un primer run de calentamiento. Se
+trabaja en un directorio temporal con su propio padel.db.
+
+Escenarios:
+    anotar         anotadores pulsando "+1 PUNTO" en partidos activos
+    partidos       crear un partido, meter el marcador y finalizarlo
+    clasificacion  espectadores navegando la clasificación
+    mixto          mezcla de los anteriores (60/10/30)
+
+    python carga_app.py --sesiones 10 --acciones 30
+    python carga_app.py --escenario anotar --sesiones 20
+
+Para cada escenario muestra la latencia de cada rerun (p50/p95/p99), las
+excepciones y errores mostrados en pantalla, y los reintentos y fallos por
+bloqueo de la BD registrados en ese tiempo.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+ESCENARIOS = ('anotar', 'partidos', 'clasificacion', 'mixto')
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+class Sesion:
+    """Una sesión de navegador simulada; mide cada rerun que provoca"""
+
+    def __init__(self, ruta_app, numero):
+        from streamlit.testing.v1 import AppTest
+        self.app = AppTest.from_file(ruta_app, default_timeout=120)
+        self.numero = numero
+        self.pestana = None
+        self.tiempos = []
+        self.incidencias = Counter()
+
+    def ejecutar(self, accion=None):
+        inicio = time.perf_counter()
+        try:
+            if accion is None:
+                self.app.run()
+            else:
+                accion().run()
+        except Exception as e:
+            self.incidencias[f"excepción {type(e).__name__}"] += 1
+            return
+        self.tiempos.append(time.perf_counter() - inicio)
+        if self.app.exception:
+            self.incidencias["excepción en la app"] += 1
+        for error in self.app.error:
+            self.incidencias[f"error: {error.value[:60]}"] += 1
+
+    def abrir(self, pestana):
+        self.pestana = pestana
+        self.app.session_state["pestana"] = pestana
+        self.ejecutar()
+
+    def boton(self, texto):
+        for boton in self.app.button:
+            if texto in str(boton.label):
+                return boton
+        return None
+
+    def widget(self, tipo, key):
+        """Widget con esa key si está en pantalla (otra sesión puede haber cambiado lo que se ve)"""
+        for elemento in getattr(self.app, tipo):
+            if elemento.key == key:
+                return elemento
+        return None
+
+    # Escenarios: cada paso es un rerun
+
+    def anotar(self):
+        if self.pestana != "🏆 Puntuación":
+            self.abrir("🏆 Puntuación")
+            selector = self.widget('selectbox', "puntaje_partido")
+            if selector is not None and selector.options:
+                # Varias sesiones pueden acabar en el mismo partido, como dos anotadores en una pista
+                self.ejecutar(lambda: selector.set_value(selector.options[self.numero % len(selector.options)]))
+            return
+        for texto in ("Sumar punto al marcador", "SUBE"):
+            boton = self.boton(texto)
+            if boton is not None:
+                self.ejecutar(boton.click)
+                return
+        botones = [b for b in self.app.button if "+1 PUNTO" in str(b.label)]
+        if botones:
+            self.ejecutar(random.choice(botones).click)
+        else:
+            self.ejecutar()
+
+    def partidos(self):
+        self.abrir("🎯 Partidos")
+        crear = self.boton("Crear Partido")
+        if crear is None:
+            return
+        self.ejecutar(crear.click)
+        self.abrir("🏆 Puntuación")
+        selector = self.widget('selectbox', "puntaje_partido")
+        if selector is None or not selector.options:
+            self.incidencias["sin partido que puntuar"] += 1
+            return
+        # El más reciente sale primero; puede ser el de otra sesión, que también vale
+        self.ejecutar(lambda: selector.set_value(selector.options[0]))
+        rapido = [c for c in self.app.checkbox if "Modo rápido" in str(c.label)]
+        if rapido:
+            self.ejecutar(rapido[0].check)
+        for key, puntos in (("directo1", random.randint(1, 6)), ("directo2", random.randint(7, 9))):
+            campo = self.widget('number_input', key)
+            if campo is None:
+                self.incidencias["marcador no disponible"] += 1
+                return
+            self.ejecutar(lambda: campo.set_value(puntos))
+        for texto in ("Guardar puntos", "FINALIZAR PARTIDO"):
+            boton = self.boton(texto)
+            if boton is not None:
+                self.ejecutar(boton.click)
+
+    def clasificacion(self):
+        if self.pestana != "📊 Clasificación":
+            self.abrir("📊 Clasificación")
+            return
+        if not self.app.radio:
+            self.ejecutar()
+            return
+        orden = self.app.radio[0]
+        self.ejecutar(lambda: orden.set_value(random.choice(orden.options)))
+
+    def mixto(self):
+        escenario = random.choices((self.anotar, self.partidos, self.clasificacion), weights=(6, 1, 3))[0]
+        escenario()
+
+
+def sembrar(jugadores, partidos):
+    import datos
+    datos.usar_liga(datos.LIGA_POR_DEFECTO)
+    datos.preparar_liga()
+    for i in range(jugadores):
+        datos.guardar_jugador(f"Jugadora {i:03d}", datos.NIVELES[i % len(datos.NIVELES)])
+    for i in range(partidos):
+        nombres = random.sample([f"Jugadora {n:03d}" for n in range(jugadores)], 4)
+        datos.crear_partido(*nombres, f"{nombres[0]} y {nombres[1]}", f"{nombres[2]} y {nombres[3]}")
+
+
+def contadores_bloqueo():
+    import datos
+    totales = Counter()
+    for entrada in datos.obtener_metricas_bloqueo(datos.LIGA_POR_DEFECTO).funciones.values():
+        totales['llamadas'] += entrada['llamadas']
+        totales['reintentos'] += entrada['reintentos']
+        totales['fallos'] += entrada['fallos']
+    return totales
+
+
+def _sesion(escenario, numero, acciones, ruta_app, barrera, resultados):
+    """Proceso de una sesión: calienta, espera a las demás y ejecuta los pasos"""
+    sesion = Sesion(ruta_app, numero)
+    sesion.ejecutar()
+    sesion.tiempos.clear()
+    sesion.incidencias.clear()
+    antes = contadores_bloqueo()
+    barrera.wait()
+    paso = getattr(sesion, escenario)
+    for _ in range(acciones):
+        paso()
+    despues = contadores_bloqueo()
+    resultados.put((sesion.tiempos, dict(sesion.incidencias), dict(despues - antes)))
+
+
+def ejecutar_escenario(escenario, sesiones, acciones):
+    contexto = multiprocessing.get_context('spawn')
+    barrera = contexto.Barrier(sesiones + 1)
+    resultados = contexto.Queue()
+    ruta_app = os.path.join(DIRECTORIO_APP, 'app.py')
+    procesos = [contexto.Process(target=_sesion, args=(escenario, n, acciones, ruta_app, barrera, resultados))
+                for n in range(sesiones)]
+    for proceso in procesos:
+        proceso.start()
+
+    barrera.wait()
+    inicio = time.perf_counter()
+    recibidos = [resultados.get() for _ in procesos]
+    duracion = time.perf_counter() - inicio
+    for proceso in procesos:
+        proceso.join()
+
+    tiempos = [t for tiempos_sesion, _, _ in recibidos for t in tiempos_sesion]
+    incidencias = sum((Counter(i) for _, i, _ in recibidos), Counter())
+    bloqueo = sum((Counter(b) for _, _, b in recibidos), Counter())
+    return {
+        'escenario': escenario,
+        'reruns': len(tiempos),
+        'por_segundo': len(tiempos) / duracion if duracion else 0,
+        'p50': percentil(tiempos, 50),
+        'p95': percentil(tiempos, 95),
+        'p99': percentil(tiempos, 99),
+        'errores': sum(incidencias.values()),
+        'incidencias': incidencias,
+        'llamadas_bd': bloqueo['llamadas'],
+        'reintentos': bloqueo['reintentos'],
+        'fallos_bloqueo': bloqueo['fallos'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga multi-sesión de la app de pádel")
+    parser.add_argument('--escenario', choices=ESCENARIOS + ('todos',), default='todos')
+    parser.add_argument('--sesiones', type=int, default=10)
+    parser.add_argument('--acciones', type=int, default=20, help="pasos por sesión")
+    parser.add_argument('--jugadores', type=int, default=40)
+    parser.add_argument('--partidos', type=int, default=10, help="partidos activos al empezar")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('PADEL_COPIAS_CADA_HORAS', '0')
+    sys.path.insert(0, DIRECTORIO_APP)
+    escenarios = ESCENARIOS if args.escenario == 'todos' else (args.escenario,)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        sembrar(args.jugadores, args.partidos)
+        resultados = [ejecutar_escenario(e, args.sesiones, args.acciones) for e in escenarios]
+        os.chdir(DIRECTORIO_APP)
+
+    print(f"{args.sesiones} sesiones x {args.acciones} pasos")
+    print(f"{'escenario':<15}{'reruns':>8}{'/s':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'errores':>9}{'llam. BD':>10}{'reint.':>8}{'bloqueos':>10}")
+    for r in resultados:
+        tasa_reintentos = r['reintentos'] / r['llamadas_bd'] if r['llamadas_bd'] else 0
+        print(f"{r['escenario']:<15}{r['reruns']:>8}{r['por_segundo']:>7.1f}{r['p50'] * 1000:>9.0f}"
+              f"{r['p95'] * 1000:>9.0f}{r['p99'] * 1000:>9.0f}{r['errores']:>9}"
+              f"{r['llamadas_bd']:>10}{tasa_reintentos:>8.1%}{r['fallos_bloqueo']:>10}")
+    for r in resultados:
+        for incidencia, veces in r['incidencias'].most_common(5):
+            print(f"  {r['escenario']}: {veces} x {incidencia}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""Comprueba que dos anotadores a la vez sobre el mismo partido no pierden puntos.
+
+Dos pruebas, en un directorio temporal con su propio padel.db:
+
+1. Dos procesos (dos móviles, o dos réplicas del servidor) suman juegos al
+   mismo partido a la vez con modificar_partido. Al final el marcador debe
+   ser exactamente la suma de lo anotado por los dos, y los conflictos de
+   versión se cuentan.
+2. Dos sesiones de la app en modo rápido con el mismo partido abierto: la
+   segunda guarda 0-1 y después la primera, que aún ve el marcador viejo,
+   intenta guardar 5-3. Debe ver el aviso de conflicto y el 0-1 se conserva.
+3. Una sesión en otra liga (?liga=otra) guarda 4-2 en modo rápido: el
+   marcador debe cambiar en esa liga y no en el partido con el mismo id de
+   la liga por defecto.
+
+    python comprobar_anotadores.py
+    python comprobar_anotadores.py --juegos 500
+
+Sale con código 1 si alguna falla.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+OTRA_LIGA = "otra"
+
+
+def sembrar(liga, partidos):
+    import datos
+    datos.usar_liga(liga)
+    datos.preparar_liga()
+    for nombre in ("Ana", "Bea", "Cris", "Dani"):
+        datos.guardar_jugador(nombre, datos.NIVELES[0])
+    ids = [datos.crear_partido("Ana", "Bea", "Cris", "Dani", "Ana y Bea", "Cris y Dani") for _ in range(partidos)]
+    datos.usar_liga(datos.LIGA_POR_DEFECTO)
+    return ids
+
+
+def marcador(liga, partido_id):
+    import datos
+    datos.usar_liga(liga)
+    partido = datos.cargar_partido(partido_id)
+    datos.usar_liga(datos.LIGA_POR_DEFECTO)
+    return partido['puntos_pareja1'], partido['puntos_pareja2']
+
+
+def _anotador(pareja, partido_id, juegos, barrera, resultados):
+    """Proceso anotador: suma juegos a su pareja y cuenta cuántas veces tuvo que recalcular"""
+    import datos
+    datos.usar_liga(datos.LIGA_POR_DEFECTO)
+    campo = f'puntos_pareja{pareja}'
+    calculos = 0
+
+    def _sumar_juego(partido):
+        nonlocal calculos
+        calculos += 1
+        return {campo: partido[campo] + 1}, True
+
+    barrera.wait()
+    anotados = sum(1 for _ in range(juegos) if datos.modificar_partido(partido_id, _sumar_juego)[1])
+    resultados.put((pareja, anotados, calculos - anotados))
+
+
+def probar_datos(partido_id, juegos):
+    contexto = multiprocessing.get_context('spawn')
+    barrera = contexto.Barrier(2)
+    resultados = contexto.Queue()
+    procesos = [contexto.Process(target=_anotador, args=(pareja, partido_id, juegos, barrera, resultados))
+                for pareja in (1, 2)]
+    for proceso in procesos:
+        proceso.start()
+    recibidos = {pareja: (anotados, conflictos) for pareja, anotados, conflictos in
+                 (resultados.get() for _ in procesos)}
+    for proceso in procesos:
+        proceso.join()
+
+    import datos
+    partido = datos.cargar_partido(partido_id)
+    correcto = True
+    for pareja in (1, 2):
+        anotados, conflictos = recibidos[pareja]
+        marcador = partido[f'puntos_pareja{pareja}']
+        print(f"anotador {pareja}: {anotados} juegos anotados, {conflictos} conflictos resueltos, "
+              f"marcador {marcador}")
+        correcto = correcto and anotados == juegos and marcador == juegos
+    conflictos = sum(c for _, c in recibidos.values())
+    print(f"datos: {'OK' if correcto else 'FALLA'} (versión final {partido['version']}, {conflictos} conflictos)")
+    return correcto
+
+
+def abrir_modo_rapido(ruta_app, partido_id, liga=None):
+    """Una sesión de la app (en la liga indicada) con el partido abierto en modo rápido"""
+    from streamlit.testing.v1 import AppTest
+    sesion = AppTest.from_file(ruta_app, default_timeout=60)
+    if liga:
+        sesion.query_params["liga"] = liga
+    sesion.session_state["pestana"] = "🏆 Puntuación"
+    sesion.run()
+    selector = next(s for s in sesion.selectbox if s.key == "puntaje_partido")
+    selector.set_value(next(o for o in selector.options if str(o).startswith(f"#{partido_id} "))).run()
+    next(c for c in sesion.checkbox if "Modo rápido" in str(c.label)).check().run()
+    return sesion
+
+
+def guardar(sesion, puntos1, puntos2):
+    next(n for n in sesion.number_input if n.key == "directo1").set_value(puntos1)
+    next(n for n in sesion.number_input if n.key == "directo2").set_value(puntos2)
+    next(b for b in sesion.button if "Guardar puntos" in str(b.label)).click().run()
+    return [e.value for e in sesion.error], [s.value for s in sesion.success]
+
+
+def probar_app(partido_id):
+    import datos
+    ruta_app = os.path.join(DIRECTORIO_APP, 'app.py')
+    primera = abrir_modo_rapido(ruta_app, partido_id)
+    segunda = abrir_modo_rapido(ruta_app, partido_id)
+
+    guardar(segunda, 0, 1)
+    errores, _ = guardar(primera, 5, 3)
+    partido = datos.cargar_partido(partido_id)
+    conflicto = any("Otro anotador" in e for e in errores)
+    print(f"app: la segunda sesión guarda 0-1; la primera intenta 5-3 con el marcador viejo -> "
+          f"{'aviso de conflicto' if conflicto else 'sin aviso'}, queda "
+          f"{partido['puntos_pareja1']}-{partido['puntos_pareja2']}")
+    correcto = conflicto and (partido['puntos_pareja1'], partido['puntos_pareja2']) == (0, 1)
+
+    # Tras el aviso, la primera ya ve el marcador actual y puede guardar
+    _, exitos = guardar(primera, 5, 3)
+    partido = datos.cargar_partido(partido_id)
+    reintento = bool(exitos) and (partido['puntos_pareja1'], partido['puntos_pareja2']) == (5, 3)
+    print(f"app: reintento de la primera -> {partido['puntos_pareja1']}-{partido['puntos_pareja2']}")
+    print(f"app: {'OK' if correcto and reintento else 'FALLA'}")
+    return correcto and reintento
+
+
+def probar_otra_liga(partido_id):
+    import datos
+    ruta_app = os.path.join(DIRECTORIO_APP, 'app.py')
+    # El mismo id existe también en la liga por defecto
+    antes = marcador(datos.LIGA_POR_DEFECTO, partido_id)
+    sesion = abrir_modo_rapido(ruta_app, partido_id, liga=OTRA_LIGA)
+    guardar(sesion, 4, 2)
+    en_otra = marcador(OTRA_LIGA, partido_id)
+    en_defecto = marcador(datos.LIGA_POR_DEFECTO, partido_id)
+    print(f"app: en la liga {OTRA_LIGA} se guarda 4-2 en el partido #{partido_id} -> "
+          f"{OTRA_LIGA} {en_otra[0]}-{en_otra[1]}, liga por defecto {en_defecto[0]}-{en_defecto[1]}")
+    correcto = en_otra == (4, 2) and en_defecto == antes
+    print(f"app ({OTRA_LIGA}): {'OK' if correcto else 'FALLA'}")
+    return correcto
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dos anotadores concurrentes sobre el mismo partido")
+    parser.add_argument('--juegos', type=int, default=200, help="juegos que suma cada anotador")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('PADEL_COPIAS_CADA_HORAS', '0')
+    sys.path.insert(0, DIRECTORIO_APP)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        import datos
+        partido_datos, partido_app = sembrar(datos.LIGA_POR_DEFECTO, 2)
+        datos.crear_liga(OTRA_LIGA)
+        partido_otra, = sembrar(OTRA_LIGA, 1)
+        correcto = probar_datos(partido_datos, args.juegos)
+        correcto = probar_app(partido_app) and correcto
+        correcto = probar_otra_liga(partido_otra) and correcto
+        os.chdir(DIRECTORIO_APP)
+    return 0 if correcto else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,314 @@
+"""Comprueba los planes de consulta de la capa de datos sobre una base sintética.
+
+Crea en un directorio temporal una liga de tamaño realista (jugadores,
+partidos finalizados, una temporada archivada y partidos activos), llama a
+cada función de datos registrando las sentencias SQL que lanza y pasa cada
+una por EXPLAIN QUERY PLAN.
+
+Las consultas calientes (partidos activos, búsqueda, consultas por jugador
+y clasificación) tienen sus reglas en CONSULTAS_CALIENTES: no pueden
+recorrer enteras las tablas grandes y la función tiene un presupuesto de
+tiempo. Si alguna falla, sale con código 1, así que sirve como control
+antes de tocar el esquema o las consultas:
+
+    python comprobar_planes.py
+    python comprobar_planes.py --partidos 200000 --todas
+    python comprobar_planes.py --analizar
+    python comprobar_planes.py --memoria
+
+Con --memoria la liga sintética vive en el almacén en memoria, sin E/S de
+disco: los planes son los mismos y los tiempos no dependen del disco.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Tablas que crecen con los partidos: recorrerlas enteras en una consulta caliente es una regresión
+TABLAS_GRANDES = ('partidos', 'partidos_archivo', 'partidos_jugador', 'estadisticas_pareja',
+                  'estadisticas_enfrentamiento', 'resumen_jugador_mes')
+
+# Sentencias de sesión o de esquema, sin plan que comprobar
+NO_CONSULTAS = re.compile(r'^\s*(PRAGMA|BEGIN|COMMIT|ROLLBACK|CREATE|DROP|ATTACH|DETACH|SAVEPOINT|RELEASE|ANALYZE)\b',
+                          re.IGNORECASE)
+TABLA_TEMPORAL = re.compile(r'^\s*CREATE\s+TEMP(ORARY)?\s+TABLE\b', re.IGNORECASE)
+
+# nombre: (función de datos, argumentos, tablas grandes que puede recorrer, presupuesto en ms)
+# Los argumentos que empiezan por ':' se sustituyen por valores de la base sintética
+CONSULTAS_CALIENTES = {
+    'partidos activos': ('cargar_partidos_activos_paginado', (0, 20), (), 20),
+    'partido por id': ('cargar_partido', (':partido_activo',), (), 5),
+    # LIKE '%texto%' no puede usar índices: solo se vigila el tiempo
+    'búsqueda de partidos': ('cargar_todos_partidos_paginado', (0, 20, ':texto_busqueda'), ('partidos',), 150),
+    'partidos de un jugador': ('cargar_partidos_jugador', (':jugador', 20), (), 20),
+    'compañeros de un jugador': ('cargar_companeros', (':jugador',), (), 20),
+    'rivales de un jugador': ('cargar_enfrentamientos', (':jugador',), (), 20),
+    'clasificación': ('cargar_jugadores', (), (), 20),
+    'historial paginado': ('cargar_historial_paginado', (0, 50), (), 20),
+    'clasificación de temporada': ('cargar_clasificacion_temporada', (':temporada_actual',), (), 250),
+}
+
+# El resto de lecturas de la capa de datos: sus planes se muestran pero no hacen fallar la comprobación
+OTRAS_LECTURAS = [
+    ('cargar_todos_partidos_paginado', (0, 20)),
+    ('cargar_historial_paginado', (0, 50, ':texto_busqueda', False)),
+    ('cargar_jugadores_paginado', (0, 50, ':texto_busqueda', None, 'Nombre')),
+    ('obtener_estadisticas_globales', ()),
+    ('cargar_temporadas', ()),
+    ('cargar_mejores_parejas', (10, 1)),
+    ('cargar_enfrentamientos', (':jugador', ':rival')),
+    ('cargar_partidos_por_periodo', ('semana',)),
+    ('cargar_puntos_jugador_mes', ([':jugador', ':rival'],)),
+    ('cargar_actividad_por_nivel', ()),
+    ('verificar_estadisticas', ()),
+    # Con un límite alto llega a los partidos archivados
+    ('cargar_partidos_jugador', (':jugador', 1000)),
+    ('clasificacion_entre_ligas', ()),
+]
+
+# Escrituras, en este orden y al final porque cambian la base
+ESCRITURAS = [
+    ('guardar_jugador', ('Jugadora nueva', ':nivel')),
+    ('actualizar_puntos_partido', (':partido_activo', 3, 2)),
+    ('cerrar_juego', (':partido_activo', 1)),
+    ('elegir_modo_muerte', (':partido_activo', 1)),
+    ('anotar_punto', (':partido_activo', 1)),
+    ('finalizar_partido', (':partido_activo', 6, 4, ':ganadores')),
+    ('crear_partido', (':jugador', ':rival', ':tercero', ':cuarto', 'A', 'B')),
+    ('eliminar_partido', (':partido_finalizado',)),
+    ('eliminar_jugador', (':cuarto',)),
+    ('reparar_estadisticas', ()),
+    # Archiva todos los partidos finalizados: la última
+    ('iniciar_temporada', ('Temporada de comprobación',)),
+]
+
+
+def sembrar(datos, jugadores, partidos, activos, proporcion_archivada):
+    """Llena la liga actual de datos sintéticos y devuelve los valores para los argumentos ':...'"""
+    nombres = [f"Jugadora {i:04d}" for i in range(jugadores)]
+    for i, nombre in enumerate(nombres):
+        datos.guardar_jugador(nombre, datos.NIVELES[i % len(datos.NIVELES)])
+
+    def _insertar(n, activo, inicio):
+        def _op(cursor):
+            filas = []
+            for i in range(n):
+                j = random.sample(nombres, 4)
+                fecha = (inicio + timedelta(minutes=37 * i)).strftime('%Y-%m-%d %H:%M:%S')
+                p1, p2 = (0, 0) if activo else (random.randint(0, 9), random.randint(0, 9))
+                filas.append((fecha, None if activo else fecha, *j, f"{j[0]} y {j[1]}", f"{j[2]} y {j[3]}",
+                              int(activo), p1, p2))
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM partidos")
+            ultimo = cursor.fetchone()[0]
+            cursor.executemany('''
+                INSERT INTO partidos (fecha, fecha_fin, j1, j2, j3, j4, pareja1, pareja2,
+                                      activo, puntos_pareja1, puntos_pareja2)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', filas)
+            # Las tablas derivadas como las deja init_database al migrar una base existente
+            datos._indexar_partidos_jugador(cursor, "SELECT id, fecha, j1, j2, j3, j4 FROM partidos WHERE id > ?",
+                                            (ultimo,))
+            if not activo:
+                nuevos = '''
+                    SELECT fecha, fecha_fin, j1, j2, j3, j4, puntos_pareja1, puntos_pareja2
+                    FROM partidos WHERE id > ?
+                '''
+                datos._sumar_estadisticas_cruzadas(
+                    cursor, "SELECT j1, j2, j3, j4, puntos_pareja1, puntos_pareja2 FROM partidos WHERE id > ?",
+                    (ultimo,))
+                datos._sumar_resumenes(cursor, nuevos, (ultimo,))
+        datos.enviar_escritura(_op).result()
+
+    archivados = int(partidos * proporcion_archivada)
+    hace = datetime.now() - timedelta(minutes=37 * (partidos + 10))
+    _insertar(archivados, False, hace)
+    datos.recalcular_estadisticas()
+    datos.iniciar_temporada("Temporada sintética")
+    _insertar(partidos - archivados, False, datetime.now())
+    _insertar(activos, True, datetime.now())
+    datos.recalcular_estadisticas()
+
+    activo = datos.cargar_partidos_activos_paginado(0, 1)[0][0]
+    finalizado = next(p for p in datos.cargar_todos_partidos_paginado(0, 50)[0] if not p['activo'])
+    return {
+        'partido_activo': activo['id'],
+        'partido_finalizado': finalizado['id'],
+        'ganadores': f"{activo['j1']} y {activo['j2']}",
+        'jugador': nombres[1],
+        'rival': nombres[2],
+        'tercero': nombres[3],
+        'cuarto': nombres[4],
+        'nivel': datos.NIVELES[0],
+        'texto_busqueda': nombres[7][-4:],
+        'temporada_actual': datos.cargar_temporadas()[0]['id'],
+    }
+
+
+def resolver(argumentos, valores):
+    def _valor(a):
+        if isinstance(a, str) and a.startswith(':'):
+            return valores[a[1:]]
+        if isinstance(a, list):
+            return [_valor(x) for x in a]
+        return a
+    return tuple(_valor(a) for a in argumentos)
+
+
+class Registro:
+    """Envuelve get_db_connection para apuntar cada sentencia que lanza la función en curso.
+
+    Las tablas temporales que crean las funciones se guardan aparte para
+    crearlas también en la conexión de los planes.
+    """
+
+    def __init__(self, datos):
+        self.sentencias = []
+        self.temporales = {}
+        original = datos.get_db_connection
+
+        def _apuntar(sentencia):
+            self.sentencias.append(sentencia)
+            if TABLA_TEMPORAL.match(sentencia):
+                self.temporales.setdefault(sentencia, False)
+
+        def _con_traza(*args, **kwargs):
+            conn = original(*args, **kwargs)
+            if conn is not None:
+                conn.set_trace_callback(_apuntar)
+            return conn
+        datos.get_db_connection = _con_traza
+
+    def crear_temporales(self, conn):
+        """Crea en conn las tablas temporales vistas desde la última llamada"""
+        for sentencia, creada in self.temporales.items():
+            if not creada:
+                conn.execute(sentencia)
+                self.temporales[sentencia] = True
+
+
+def plan(conn, sentencia):
+    """Líneas de EXPLAIN QUERY PLAN de una sentencia ya con sus parámetros expandidos"""
+    try:
+        return [fila[3] for fila in conn.execute("EXPLAIN QUERY PLAN " + sentencia).fetchall()]
+    except Exception as e:
+        return [f"(sin plan: {e})"]
+
+
+def recorridos(lineas):
+    """Tablas grandes recorridas enteras (SCAN sin índice) en un plan"""
+    tablas = set()
+    for linea in lineas:
+        m = re.match(r'SCAN (\w+)(?: AS \w+)?$', linea.strip())
+        if m and m.group(1) in TABLAS_GRANDES:
+            tablas.add(m.group(1))
+    return tablas
+
+
+def medir(datos, registro, funcion, argumentos, repeticiones):
+    """Llama a la función; devuelve la mediana en ms y las sentencias distintas que lanzó"""
+    tiempos = []
+    for _ in range(repeticiones):
+        registro.sentencias.clear()
+        inicio = time.perf_counter()
+        getattr(datos, funcion)(*argumentos)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    # Una sola por forma: las que solo cambian en los valores (un UPDATE por jugador) tienen el mismo plan
+    sentencias = {}
+    for sentencia in registro.sentencias:
+        if not NO_CONSULTAS.match(sentencia):
+            sentencias.setdefault(re.sub(r"'[^']*'|\b\d+\b", '?', sentencia), sentencia)
+    return sorted(tiempos)[len(tiempos) // 2], list(sentencias.values())
+
+
+def resumir(sentencia, largo=90):
+    return re.sub(r'\s+', ' ', sentencia).strip()[:largo]
+
+
+def mostrar_planes(planes):
+    for sentencia, lineas in planes:
+        print(f"    {resumir(sentencia)}\n      " + "\n      ".join(lineas))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regresiones de planes de consulta de la app de pádel")
+    parser.add_argument('--jugadores', type=int, default=300)
+    parser.add_argument('--partidos', type=int, default=50000, help="partidos finalizados")
+    parser.add_argument('--activos', type=int, default=40)
+    parser.add_argument('--archivados', type=float, default=0.5, help="proporción de partidos en el archivo")
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--todas', action='store_true', help="mostrar el plan de todas las sentencias")
+    parser.add_argument('--analizar', action='store_true',
+                        help="pasar ANALYZE antes de medir, como tras la tarea de mantenimiento")
+    parser.add_argument('--memoria', action='store_true', help="usar el almacén en memoria (sin disco)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('PADEL_COPIAS_CADA_HORAS', '0')
+    if args.memoria:
+        os.environ['PADEL_ALMACEN'] = 'memoria'
+    random.seed(2024)
+    fallos = []
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        import datos
+        datos.usar_liga(datos.LIGA_POR_DEFECTO)
+        datos.preparar_liga()
+        inicio = time.perf_counter()
+        valores = sembrar(datos, args.jugadores, args.partidos, args.activos, args.archivados)
+        print(f"base sintética: {args.jugadores} jugadores, {args.partidos} partidos finalizados "
+              f"({args.archivados:.0%} archivados), {args.activos} activos "
+              f"en {time.perf_counter() - inicio:.1f} s")
+        if args.analizar:
+            datos.analizar_bd()
+            print("con estadísticas del planificador (ANALYZE)")
+
+        registro = Registro(datos)
+        conn = datos.get_db_connection()
+        conn.set_trace_callback(None)
+        # Los planes de clasificacion_entre_ligas necesitan las ligas adjuntas como las adjunta ella
+        for n, liga in enumerate(datos.listar_ligas()[:datos.MAX_LIGAS_ADJUNTAS]):
+            conn.execute(f"ATTACH DATABASE ? AS liga{n}",
+                         (datos.obtener_almacen().uri(liga, solo_lectura=True),))
+
+        print(f"\n{'consulta caliente':<28}{'ms':>8}{'límite':>8}  resultado")
+        for nombre, (funcion, argumentos, permitidas, limite) in CONSULTAS_CALIENTES.items():
+            ms, sentencias = medir(datos, registro, funcion, resolver(argumentos, valores), args.repeticiones)
+            registro.crear_temporales(conn)
+            planes = [(sentencia, plan(conn, sentencia)) for sentencia in sentencias]
+            problemas = [f"recorre {tabla} entera: {resumir(sentencia)}"
+                         for sentencia, lineas in planes
+                         for tabla in sorted(recorridos(lineas) - set(permitidas))]
+            if ms > limite:
+                problemas.append(f"{ms:.1f} ms supera el límite de {limite} ms")
+            print(f"{nombre:<28}{ms:>8.1f}{limite:>8}  {'OK' if not problemas else 'FALLA'}")
+            for problema in problemas:
+                print(f"    {problema}")
+            if args.todas:
+                mostrar_planes(planes)
+            fallos.extend(f"{nombre}: {p}" for p in problemas)
+
+        print(f"\n{'otras funciones':<40}{'ms':>8}  tablas grandes recorridas")
+        for funcion, argumentos in OTRAS_LECTURAS + ESCRITURAS:
+            ms, sentencias = medir(datos, registro, funcion, resolver(argumentos, valores),
+                                   1 if (funcion, argumentos) in ESCRITURAS else args.repeticiones)
+            registro.crear_temporales(conn)
+            planes = [(sentencia, plan(conn, sentencia)) for sentencia in sentencias]
+            tablas = set().union(*(recorridos(lineas) for _, lineas in planes))
+            print(f"{funcion:<40}{ms:>8.1f}  {', '.join(sorted(tablas)) or '-'}")
+            if args.todas:
+                mostrar_planes(planes)
+        conn.close()
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if fallos:
+        print(f"\n{len(fallos)} problemas en consultas calientes")
+        return 1
+    print("\nTodas las consultas calientes usan índices y están dentro de su límite")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
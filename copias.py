@@ -0,0 +1,263 @@
+"""Copias de seguridad en caliente de las bases de datos SQLite de la app.
+
+Usa la API de backup de SQLite copiando pocas páginas por paso, con una
+pausa entre pasos para que entren los escritores: los anotadores solo
+esperan, como mucho, lo que tarda un paso (`copias.py medir` lo comprueba).
+
+Uso desde la línea de comandos:
+    python copias.py crear padel.db
+    python copias.py listar
+    python copias.py restaurar copias/padel-20261019-101500.db padel.db
+    python copias.py medir padel.db
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+COPIAS_DIR = 'copias'
+RETENCION_COPIAS = 14
+PAGINAS_POR_PASO = 64
+PAUSA_ENTRE_PASOS = 0.005
+# Si otra conexión escribe durante la copia, SQLite la reinicia desde el principio
+MAX_REINICIOS = 5
+
+
+class CopiaReiniciada(Exception):
+    """La copia por pasos se reinició demasiadas veces por escrituras concurrentes"""
+    pass
+
+
+def _copiar(origen, destino, paginas_por_paso, pausa):
+    """Copia origen en destino por pasos y mide cuánto dura cada paso"""
+    medicion = {'pasos': 0, 'reinicios': 0, 'paso_maximo': 0.0, 'paginas': 0}
+    estado = {'restantes': None, 'ultimo': time.perf_counter()}
+
+    def _progreso(status, restantes, total):
+        # Lo que dura un paso es lo que, como mucho, puede esperar un escritor
+        medicion['paso_maximo'] = max(medicion['paso_maximo'], time.perf_counter() - estado['ultimo'])
+        medicion['pasos'] += 1
+        medicion['paginas'] = total
+        if estado['restantes'] is not None and restantes > estado['restantes']:
+            medicion['reinicios'] += 1
+            if medicion['reinicios'] > MAX_REINICIOS:
+                raise CopiaReiniciada()
+        estado['restantes'] = restantes
+        # backup() no descansa entre pasos (su sleep solo se usa ante SQLITE_BUSY/LOCKED):
+        # la pausa es el hueco en el que entran los escritores
+        if restantes and pausa:
+            time.sleep(pausa)
+        estado['ultimo'] = time.perf_counter()
+
+    try:
+        origen.backup(destino, pages=paginas_por_paso, progress=_progreso, sleep=pausa)
+    except CopiaReiniciada:
+        # Con tanta escritura, copiar de una vez: en modo WAL la lectura no bloquea a los escritores
+        estado['restantes'] = None
+        estado['ultimo'] = time.perf_counter()
+        origen.backup(destino, pages=-1, progress=_progreso)
+    return medicion
+
+
+def nombre_copia(prefijo, momento=None):
+    momento = momento or datetime.now()
+    return f"{prefijo}-{momento.strftime('%Y%m%d-%H%M%S')}.db"
+
+
+def crear_copia(ruta_bd, directorio=COPIAS_DIR, prefijo=None, paginas_por_paso=PAGINAS_POR_PASO,
+                pausa=PAUSA_ENTRE_PASOS, retencion=RETENCION_COPIAS):
+    """Crea una copia consistente de ruta_bd sin parar a los escritores.
+
+    Devuelve un dict con el archivo creado, páginas, pasos, reinicios,
+    duración total y el paso más largo (segundos).
+    """
+    prefijo = prefijo or os.path.splitext(os.path.basename(ruta_bd))[0]
+    os.makedirs(directorio, exist_ok=True)
+    archivo = os.path.join(directorio, nombre_copia(prefijo))
+    temporal = archivo + '.tmp'
+
+    inicio = time.perf_counter()
+    origen = sqlite3.connect(ruta_bd, timeout=10)
+    destino = sqlite3.connect(temporal)
+    try:
+        medicion = _copiar(origen, destino, paginas_por_paso, pausa)
+    finally:
+        destino.close()
+        origen.close()
+    os.replace(temporal, archivo)
+
+    medicion['archivo'] = archivo
+    medicion['duracion'] = time.perf_counter() - inicio
+    medicion['eliminadas'] = limpiar_copias(directorio, prefijo, retencion)
+    return medicion
+
+
+def listar_copias(directorio=COPIAS_DIR, prefijo=None):
+    """Copias disponibles, de la más reciente a la más antigua"""
+    if not os.path.isdir(directorio):
+        return []
+    copias = []
+    for archivo in os.listdir(directorio):
+        if not archivo.endswith('.db'):
+            continue
+        # prefijo-AAAAMMDD-HHMMSS.db, para no mezclar ligas cuyo nombre empieza igual
+        if prefijo and not (archivo.startswith(f"{prefijo}-") and len(archivo) == len(prefijo) + 19):
+            continue
+        ruta = os.path.join(directorio, archivo)
+        copias.append({
+            'archivo': ruta,
+            'nombre': archivo,
+            'tamano': os.path.getsize(ruta),
+            'fecha': datetime.fromtimestamp(os.path.getmtime(ruta)),
+        })
+    return sorted(copias, key=lambda c: c['nombre'], reverse=True)
+
+
+def limpiar_copias(directorio=COPIAS_DIR, prefijo=None, retencion=RETENCION_COPIAS):
+    """Borra las copias más antiguas dejando solo las últimas `retencion`"""
+    eliminadas = []
+    for copia in listar_copias(directorio, prefijo)[retencion:]:
+        os.remove(copia['archivo'])
+        eliminadas.append(copia['archivo'])
+    return eliminadas
+
+
+def restaurar_copia(archivo, ruta_bd, paginas_por_paso=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS,
+                    directorio=COPIAS_DIR):
+    """Restaura ruta_bd desde una copia, guardando antes una copia del estado actual.
+
+    La base de datos se sustituye página a página con la misma API de
+    backup, así que las conexiones abiertas ven el contenido restaurado.
+    """
+    if not os.path.exists(archivo):
+        raise FileNotFoundError(archivo)
+
+    previa = None
+    if os.path.exists(ruta_bd):
+        prefijo = 'antes-de-restaurar-' + os.path.splitext(os.path.basename(ruta_bd))[0]
+        previa = crear_copia(ruta_bd, directorio, prefijo, retencion=RETENCION_COPIAS)['archivo']
+
+    inicio = time.perf_counter()
+    origen = sqlite3.connect(archivo)
+    destino = sqlite3.connect(ruta_bd, timeout=10)
+    try:
+        medicion = _copiar(origen, destino, paginas_por_paso, pausa)
+    finally:
+        destino.close()
+        origen.close()
+
+    medicion['archivo'] = archivo
+    medicion['copia_previa'] = previa
+    medicion['duracion'] = time.perf_counter() - inicio
+    return medicion
+
+
+def medir_espera_escritores(ruta_bd, paginas_por_paso=PAGINAS_POR_PASO, pausa=PAUSA_ENTRE_PASOS,
+                            intervalo=0.05, segundos_base=1.0):
+    """Mide cuánto esperan los escritores mientras se hace una copia de ruta_bd.
+
+    Trabaja sobre una copia temporal de ruta_bd (no toca la original): un
+    hilo escribe en ella cada `intervalo` segundos, primero sin copia en
+    marcha y después durante crear_copia. Devuelve la latencia de esas
+    escrituras en cada caso y la medición de la copia.
+    """
+    with tempfile.TemporaryDirectory() as directorio:
+        prueba = os.path.join(directorio, 'prueba.db')
+        origen = sqlite3.connect(ruta_bd, timeout=10)
+        destino = sqlite3.connect(prueba)
+        try:
+            modo = origen.execute("PRAGMA journal_mode").fetchone()[0]
+            origen.backup(destino)
+            destino.execute(f"PRAGMA journal_mode={modo}")
+            destino.execute("CREATE TABLE sonda_copia (id INTEGER PRIMARY KEY, momento REAL)")
+            destino.commit()
+        finally:
+            destino.close()
+            origen.close()
+
+        def _sondear(parar, latencias):
+            conn = sqlite3.connect(prueba, timeout=10, isolation_level=None)
+            try:
+                while not parar.is_set():
+                    inicio = time.perf_counter()
+                    conn.execute("BEGIN IMMEDIATE")
+                    conn.execute("INSERT INTO sonda_copia (momento) VALUES (?)", (inicio,))
+                    conn.execute("COMMIT")
+                    latencias.append(time.perf_counter() - inicio)
+                    parar.wait(intervalo)
+            finally:
+                conn.close()
+
+        def _con_sonda(trabajo):
+            parar = threading.Event()
+            latencias = []
+            hilo = threading.Thread(target=_sondear, args=(parar, latencias))
+            hilo.start()
+            try:
+                resultado = trabajo()
+            finally:
+                parar.set()
+                hilo.join()
+            return latencias, resultado
+
+        sin_copia, _ = _con_sonda(lambda: time.sleep(segundos_base))
+        con_copia, copia = _con_sonda(lambda: crear_copia(prueba, os.path.join(directorio, 'copias'),
+                                                          paginas_por_paso=paginas_por_paso, pausa=pausa))
+    return {'sin_copia': sin_copia, 'con_copia': con_copia, 'copia': copia}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copias de seguridad de las bases de datos de pádel")
+    parser.add_argument('--dir', default=COPIAS_DIR, help="directorio de las copias")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_crear = sub.add_parser('crear', help="crear una copia en caliente")
+    p_crear.add_argument('bd', nargs='?', default='padel.db')
+    p_crear.add_argument('--retencion', type=int, default=RETENCION_COPIAS)
+
+    p_listar = sub.add_parser('listar', help="listar las copias disponibles")
+    p_listar.add_argument('--prefijo')
+
+    p_restaurar = sub.add_parser('restaurar', help="restaurar una copia")
+    p_restaurar.add_argument('copia')
+    p_restaurar.add_argument('bd', nargs='?', default='padel.db')
+
+    p_medir = sub.add_parser('medir', help="medir la espera de los escritores durante una copia")
+    p_medir.add_argument('bd', nargs='?', default='padel.db')
+    p_medir.add_argument('--paginas', type=int, default=PAGINAS_POR_PASO, help="páginas por paso")
+    p_medir.add_argument('--pausa', type=float, default=PAUSA_ENTRE_PASOS, help="segundos entre pasos")
+
+    args = parser.parse_args(argv)
+
+    if args.comando == 'crear':
+        info = crear_copia(args.bd, args.dir, retencion=args.retencion)
+        print(f"Copia creada: {info['archivo']} ({info['paginas']} páginas, {info['pasos']} pasos, "
+              f"{info['duracion'] * 1000:.0f} ms, paso más largo {info['paso_maximo'] * 1000:.1f} ms)")
+    elif args.comando == 'listar':
+        for copia in listar_copias(args.dir, args.prefijo):
+            print(f"{copia['nombre']}\t{copia['tamano'] / 1024:.0f} KB\t{copia['fecha']:%Y-%m-%d %H:%M}")
+    elif args.comando == 'restaurar':
+        info = restaurar_copia(args.copia, args.bd, directorio=args.dir)
+        print(f"Restaurado {args.bd} desde {info['archivo']} en {info['duracion'] * 1000:.0f} ms")
+        if info['copia_previa']:
+            print(f"Estado anterior guardado en {info['copia_previa']}")
+    elif args.comando == 'medir':
+        info = medir_espera_escritores(args.bd, args.paginas, args.pausa)
+        copia = info['copia']
+        print(f"Copia: {copia['paginas']} páginas, {copia['pasos']} pasos, {copia['reinicios']} reinicios, "
+              f"{copia['duracion'] * 1000:.0f} ms, paso más largo {copia['paso_maximo'] * 1000:.1f} ms")
+        for caso in ('sin_copia', 'con_copia'):
+            latencias = sorted(info[caso])
+            mediana = latencias[len(latencias) // 2] if latencias else 0
+            maxima = latencias[-1] if latencias else 0
+            print(f"Escritor {caso.replace('_', ' ')}: {len(latencias)} escrituras, "
+                  f"mediana {mediana * 1000:.1f} ms, máxima {maxima * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2647 @@
+"""Capa de datos de la app de pádel: ligas, conexiones, partidos y estadísticas.
+
+La usan tanto la interfaz de Streamlit (app.py) como la API HTTP (api.py).
+Cada función trabaja sobre la liga del hilo actual (usar_liga), así que
+cada sesión o petición elige su liga antes de llamarlas.
+"""
+import streamlit as st
+import sqlite3
+from datetime import datetime
+import re
+import json
+import time
+import os
+import random
+import bisect
+import queue
+import threading
+import functools
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import almacen
+import copias
+
+# ============================================
+# CONEXIÓN A BASE DE DATOS
+# ============================================
+
+DB_PATH = 'padel.db'
+
+# Tiempo que SQLite espera por un bloqueo antes de devolver "database is locked"
+BUSY_TIMEOUT_MS = 5000
+
+# Estado por hilo: cada sesión de Streamlit ejecuta su script en su propio hilo
+_contexto_bd = threading.local()
+
+# ============================================
+# LIGAS
+# ============================================
+
+# Cada liga vive en su propio archivo SQLite; la liga por defecto sigue en padel.db
+LIGA_POR_DEFECTO = 'principal'
+LIGAS_DIR = 'ligas'
+
+# SQLite permite 10 bases adjuntas por conexión por defecto
+MAX_LIGAS_ADJUNTAS = 8
+
+def nombre_liga_valido(liga):
+    """Solo minúsculas, números, '-' y '_' para poder usarlo como nombre de archivo"""
+    return bool(liga) and re.fullmatch(r'[a-z0-9][a-z0-9_-]{0,39}', liga) is not None
+
+# ============================================
+# ALMACÉN DE DATOS
+# ============================================
+
+# 'sqlite' (archivos en disco) o 'memoria' (sin disco, para pruebas y benchmarks)
+ALMACEN = os.environ.get("PADEL_ALMACEN", "sqlite")
+
+@st.cache_resource
+def obtener_almacen():
+    """Almacén de todas las ligas, compartido por todas las sesiones del proceso"""
+    if ALMACEN == 'memoria':
+        # Al vaciarlo las ligas pierden el esquema: hay que volver a prepararlas
+        return almacen.AlmacenMemoria(al_vaciar=olvidar_ligas_preparadas)
+    return almacen.AlmacenSQLite(DB_PATH, LIGAS_DIR, LIGA_POR_DEFECTO)
+
+def listar_ligas():
+    """Liga por defecto más las ligas que ya existen en el almacén"""
+    ligas = [LIGA_POR_DEFECTO]
+    for liga in obtener_almacen().ligas():
+        if nombre_liga_valido(liga) and liga != LIGA_POR_DEFECTO:
+            ligas.append(liga)
+    return ligas
+
+def crear_liga(liga):
+    """Crea una liga nueva con su base de datos vacía; devuelve True si se creó.
+    
+    Es la única forma de crear una liga: ni la app ni la API abren ligas que
+    no existan, para que un nombre mal escrito en la URL no cree otra.
+    """
+    if not nombre_liga_valido(liga):
+        st.error("❌ Nombre de liga no válido: minúsculas, números, '-' y '_' (máximo 40)")
+        return False
+    if liga in listar_ligas():
+        st.error(f"❌ La liga {liga} ya existe")
+        return False
+    anterior = liga_actual()
+    usar_liga(liga)
+    try:
+        return preparar_liga()
+    finally:
+        usar_liga(anterior)
+
+def usar_liga(liga):
+    """Dirige las funciones de datos de este hilo (la sesión actual) a la liga indicada"""
+    _contexto_bd.liga = liga
+
+def liga_actual():
+    return getattr(_contexto_bd, 'liga', LIGA_POR_DEFECTO)
+
+def get_db_connection(liga=None):
+    """Obtiene una conexión a la base de datos SQLite de la liga (por defecto, la de la sesión) con timeout"""
+    try:
+        conn = obtener_almacen().conectar(liga or liga_actual(), BUSY_TIMEOUT_MS)
+        conn.row_factory = sqlite3.Row
+        return conn
+    except Exception as e:
+        st.error(f"Error de conexión a BD: {e}")
+        return None
+
+def _sumar_estadisticas_cruzadas(cursor, consulta_partidos, params=(), signo=1):
+    """Suma (signo=1) o resta (signo=-1) a las tablas de parejas y cara a cara
+    los partidos que devuelve consulta_partidos (j1, j2, j3, j4, puntos_pareja1, puntos_pareja2).
+    
+    Gana la pareja 1 si tiene más puntos; si no, la pareja 2, igual que en
+    recalcular_estadisticas.
+    """
+    fuente = f'''
+        WITH fuente AS (
+            SELECT j1, j2, j3, j4,
+                   COALESCE(puntos_pareja1, 0) AS p1,
+                   COALESCE(puntos_pareja2, 0) AS p2
+            FROM ({consulta_partidos})
+        )
+    '''
+    acumular = '''
+        ON CONFLICT ({clave}) DO UPDATE SET
+            partidos = partidos + excluded.partidos,
+            victorias = victorias + excluded.victorias,
+            puntos_favor = puntos_favor + excluded.puntos_favor,
+            puntos_contra = puntos_contra + excluded.puntos_contra
+    '''
+    # Al restar, el upsert devuelve las filas que toca para borrar solo las que queden a cero
+    devolver = "RETURNING {clave}, partidos" if signo < 0 else ""
+    cursor.execute(fuente + f'''
+        , parejas AS (
+            SELECT MIN(j1, j2) AS a, MAX(j1, j2) AS b, p1 AS pf, p2 AS pc, p1 > p2 AS gana FROM fuente
+            UNION ALL
+            SELECT MIN(j3, j4), MAX(j3, j4), p2, p1, p1 <= p2 FROM fuente
+        )
+        INSERT INTO estadisticas_pareja (jugador_a, jugador_b, partidos, victorias, puntos_favor, puntos_contra)
+        SELECT a, b, ? * COUNT(*), ? * SUM(gana), ? * SUM(pf), ? * SUM(pc)
+        FROM parejas
+        WHERE true
+        GROUP BY a, b
+        {acumular.format(clave="jugador_a, jugador_b")}
+        {devolver.format(clave="jugador_a, jugador_b")}
+    ''', (*params, signo, signo, signo, signo))
+    if signo < 0:
+        _borrar_filas_vacias(cursor, 'estadisticas_pareja', ('jugador_a', 'jugador_b'))
+    cursor.execute(fuente + f'''
+        , cruces AS (
+            SELECT j1 AS jugador, j3 AS rival, p1 AS pf, p2 AS pc, p1 > p2 AS gana FROM fuente
+            UNION ALL SELECT j1, j4, p1, p2, p1 > p2 FROM fuente
+            UNION ALL SELECT j2, j3, p1, p2, p1 > p2 FROM fuente
+            UNION ALL SELECT j2, j4, p1, p2, p1 > p2 FROM fuente
+            UNION ALL SELECT j3, j1, p2, p1, p1 <= p2 FROM fuente
+            UNION ALL SELECT j3, j2, p2, p1, p1 <= p2 FROM fuente
+            UNION ALL SELECT j4, j1, p2, p1, p1 <= p2 FROM fuente
+            UNION ALL SELECT j4, j2, p2, p1, p1 <= p2 FROM fuente
+        )
+        INSERT INTO estadisticas_enfrentamiento (jugador, rival, partidos, victorias, puntos_favor, puntos_contra)
+        SELECT jugador, rival, ? * COUNT(*), ? * SUM(gana), ? * SUM(pf), ? * SUM(pc)
+        FROM cruces
+        WHERE true
+        GROUP BY jugador, rival
+        {acumular.format(clave="jugador, rival")}
+        {devolver.format(clave="jugador, rival")}
+    ''', (*params, signo, signo, signo, signo))
+    if signo < 0:
+        _borrar_filas_vacias(cursor, 'estadisticas_enfrentamiento', ('jugador', 'rival'))
+
+def _borrar_filas_vacias(cursor, tabla, clave):
+    """Borra por clave primaria las filas que el último upsert ... RETURNING clave, partidos dejó a cero.
+    
+    Así no se recorre la tabla entera buscando partidos <= 0 en cada resta.
+    """
+    vacias = [tuple(fila)[:-1] for fila in cursor.fetchall() if fila[-1] <= 0]
+    if vacias:
+        condicion = " AND ".join(f"{columna} = ?" for columna in clave)
+        cursor.executemany(f"DELETE FROM {tabla} WHERE {condicion}", vacias)
+
+def _sumar_resumenes(cursor, consulta_partidos, params=(), signo=1):
+    """Suma (signo=1) o resta (signo=-1) a las tablas de resumen por día y por jugador y mes
+    los partidos que devuelve consulta_partidos (fecha, fecha_fin, j1, j2, j3, j4, puntos_pareja1, puntos_pareja2).
+    """
+    fuente = f'''
+        WITH fuente AS (
+            SELECT date(COALESCE(fecha_fin, fecha)) AS dia, j1, j2, j3, j4,
+                   COALESCE(puntos_pareja1, 0) AS p1,
+                   COALESCE(puntos_pareja2, 0) AS p2
+            FROM ({consulta_partidos})
+        )
+    '''
+    # Al restar, cada upsert devuelve las filas que toca para borrar solo las que queden a cero
+    devolver = "RETURNING {clave}, partidos" if signo < 0 else ""
+    cursor.execute(fuente + f'''
+        INSERT INTO resumen_diario (dia, partidos, puntos)
+        SELECT dia, ? * COUNT(*), ? * SUM(p1 + p2)
+        FROM fuente
+        WHERE dia IS NOT NULL
+        GROUP BY dia
+        ON CONFLICT (dia) DO UPDATE SET
+            partidos = partidos + excluded.partidos,
+            puntos = puntos + excluded.puntos
+        {devolver.format(clave="dia")}
+    ''', (*params, signo, signo))
+    if signo < 0:
+        _borrar_filas_vacias(cursor, 'resumen_diario', ('dia',))
+    cursor.execute(fuente + f'''
+        , lados AS (
+            SELECT dia, j1 AS nombre, p1 AS pf, p2 AS pc, p1 > p2 AS gana FROM fuente
+            UNION ALL SELECT dia, j2, p1, p2, p1 > p2 FROM fuente
+            UNION ALL SELECT dia, j3, p2, p1, p1 <= p2 FROM fuente
+            UNION ALL SELECT dia, j4, p2, p1, p1 <= p2 FROM fuente
+        )
+        INSERT INTO resumen_jugador_mes (nombre, mes, partidos, victorias, puntos_favor, puntos_contra)
+        SELECT nombre, substr(dia, 1, 7), ? * COUNT(*), ? * SUM(gana), ? * SUM(pf), ? * SUM(pc)
+        FROM lados
+        WHERE dia IS NOT NULL
+        GROUP BY nombre, substr(dia, 1, 7)
+        ON CONFLICT (nombre, mes) DO UPDATE SET
+            partidos = partidos + excluded.partidos,
+            victorias = victorias + excluded.victorias,
+            puntos_favor = puntos_favor + excluded.puntos_favor,
+            puntos_contra = puntos_contra + excluded.puntos_contra
+        {devolver.format(clave="nombre, mes")}
+    ''', (*params, signo, signo, signo, signo))
+    if signo < 0:
+        _borrar_filas_vacias(cursor, 'resumen_jugador_mes', ('nombre', 'mes'))
+
+def _indexar_partidos_jugador(cursor, consulta_partidos, params=()):
+    """Añade a partidos_jugador una fila por jugador de cada partido de consulta_partidos (id, fecha, j1..j4)"""
+    cursor.execute(f'''
+        WITH fuente AS ({consulta_partidos})
+        INSERT OR IGNORE INTO partidos_jugador (nombre, fecha, partido_id, pareja)
+        SELECT j1, COALESCE(fecha, ''), id, 1 FROM fuente
+        UNION ALL SELECT j2, COALESCE(fecha, ''), id, 1 FROM fuente
+        UNION ALL SELECT j3, COALESCE(fecha, ''), id, 2 FROM fuente
+        UNION ALL SELECT j4, COALESCE(fecha, ''), id, 2 FROM fuente
+    ''', params)
+
+def _registrar_migracion(cursor, nombre, detalle):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS migraciones (
+            nombre TEXT PRIMARY KEY,
+            fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            detalle TEXT
+        )
+    ''')
+    cursor.execute(
+        "INSERT OR REPLACE INTO migraciones (nombre, detalle) VALUES (?, ?)",
+        (nombre, json.dumps(detalle))
+    )
+
+def _retirar_tabla_migrada(cursor, tabla, comprobacion):
+    """Elimina una tabla ya sustituida por una vista, salvo que la vista no pueda mostrar todas sus filas.
+    
+    Si hay filas sin partido o con otro resultado, la tabla no se borra: se
+    renombra a <tabla>_migrada y se avisa para revisarla a mano. Devuelve el
+    nombre con el que se conserva, o None si se eliminó.
+    """
+    if not comprobacion['huerfanas'] and not comprobacion['distintas']:
+        cursor.execute(f"DROP TABLE {tabla}")
+        return None
+    conservada = f"{tabla}_migrada"
+    cursor.execute(f"ALTER TABLE {tabla} RENAME TO {conservada}")
+    st.warning(
+        f"⚠️ {tabla}: {comprobacion['huerfanas']} filas sin partido y {comprobacion['distintas']} "
+        f"con otro resultado no se ven en la nueva vista. Se conservan en la tabla {conservada} para revisarlas"
+    )
+    return conservada
+
+def _migrar_historial_a_vista(cursor):
+    """Migración única de la antigua tabla historial a una vista sobre partidos.
+    
+    Completa en partidos lo que solo estuviera en historial, comprueba que
+    ambas copias coinciden, guarda el resultado en migraciones y retira la
+    tabla (ver _retirar_tabla_migrada).
+    """
+    cursor.execute('''
+        UPDATE partidos
+        SET resultado = COALESCE(resultado, (
+                SELECT h.resultado FROM historial h
+                WHERE h.partido_id = partidos.id ORDER BY h.id DESC LIMIT 1)),
+            ganadores = COALESCE(ganadores, (
+                SELECT h.ganadores FROM historial h
+                WHERE h.partido_id = partidos.id ORDER BY h.id DESC LIMIT 1)),
+            fecha_fin = COALESCE(fecha_fin, fecha)
+        WHERE activo = 0
+    ''')
+    cursor.execute('''
+        SELECT
+            (SELECT COUNT(*) FROM historial) AS filas,
+            (SELECT COUNT(*) FROM historial h
+             WHERE NOT EXISTS (SELECT 1 FROM partidos p WHERE p.id = h.partido_id AND p.activo = 0)) AS huerfanas,
+            (SELECT COUNT(*) FROM partidos p
+             WHERE p.activo = 0 AND NOT EXISTS (SELECT 1 FROM historial h WHERE h.partido_id = p.id)) AS sin_historial,
+            (SELECT COUNT(*) - COUNT(DISTINCT partido_id) FROM historial) AS duplicadas,
+            (SELECT COUNT(*) FROM historial h JOIN partidos p ON p.id = h.partido_id
+             WHERE p.resultado IS NOT h.resultado OR p.ganadores IS NOT h.ganadores) AS distintas
+    ''')
+    comprobacion = dict(cursor.fetchone())
+    comprobacion['conservada'] = _retirar_tabla_migrada(cursor, 'historial', comprobacion)
+    _registrar_migracion(cursor, 'historial_vista', comprobacion)
+    return comprobacion
+
+def _migrar_historial_archivo_a_vista(cursor):
+    """Migración única de la antigua tabla historial_archivo a una vista sobre partidos_archivo"""
+    cursor.execute('''
+        SELECT
+            (SELECT COUNT(*) FROM historial_archivo) AS filas,
+            (SELECT COUNT(*) FROM historial_archivo h
+             WHERE NOT EXISTS (SELECT 1 FROM partidos_archivo p WHERE p.id = h.partido_id)) AS huerfanas,
+            (SELECT COUNT(*) FROM historial_archivo h JOIN partidos_archivo p ON p.id = h.partido_id
+             WHERE p.resultado IS NOT h.resultado OR p.ganadores IS NOT h.ganadores) AS distintas
+    ''')
+    comprobacion = dict(cursor.fetchone())
+    comprobacion['conservada'] = _retirar_tabla_migrada(cursor, 'historial_archivo', comprobacion)
+    _registrar_migracion(cursor, 'historial_archivo_vista', comprobacion)
+    return comprobacion
+
+def init_database():
+    """Inicializa la base de datos creando las tablas si no existen"""
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    
+    try:
+        cursor = conn.cursor()
+        
+        # Tabla de jugadores
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jugadores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nombre TEXT UNIQUE NOT NULL,
+                nivel TEXT NOT NULL,
+                partidos INTEGER DEFAULT 0,
+                puntos_favor INTEGER DEFAULT 0,
+                puntos_contra INTEGER DEFAULT 0,
+                victorias INTEGER DEFAULT 0,
+                derrotas INTEGER DEFAULT 0,
+                diferencia INTEGER DEFAULT 0,
+                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Tabla de partidos
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS partidos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                j1 TEXT NOT NULL,
+                j2 TEXT NOT NULL,
+                j3 TEXT NOT NULL,
+                j4 TEXT NOT NULL,
+                pareja1 TEXT NOT NULL,
+                pareja2 TEXT NOT NULL,
+                activo BOOLEAN DEFAULT 1,
+                puntos_pareja1 INTEGER DEFAULT 0,
+                puntos_pareja2 INTEGER DEFAULT 0,
+                puntos_set1 INTEGER DEFAULT 0,
+                puntos_set2 INTEGER DEFAULT 0,
+                modo_muerte BOOLEAN DEFAULT 0,
+                ganadores TEXT,
+                resultado TEXT,
+                version INTEGER DEFAULT 0,
+                fecha_fin TIMESTAMP
+            )
+        ''')
+        
+        # Verificar y agregar columnas faltantes
+        cursor.execute("PRAGMA table_info(partidos)")
+        columnas = [columna[1] for columna in cursor.fetchall()]
+        
+        if 'puntos_set1' not in columnas:
+            cursor.execute("ALTER TABLE partidos ADD COLUMN puntos_set1 INTEGER DEFAULT 0")
+        
+        if 'puntos_set2' not in columnas:
+            cursor.execute("ALTER TABLE partidos ADD COLUMN puntos_set2 INTEGER DEFAULT 0")
+        
+        if 'modo_muerte' not in columnas:
+            cursor.execute("ALTER TABLE partidos ADD COLUMN modo_muerte BOOLEAN DEFAULT 0")
+        
+        if 'version' not in columnas:
+            cursor.execute("ALTER TABLE partidos ADD COLUMN version INTEGER DEFAULT 0")
+        
+        if 'fecha_fin' not in columnas:
+            cursor.execute("ALTER TABLE partidos ADD COLUMN fecha_fin TIMESTAMP")
+        
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_partidos_activo_fecha ON partidos (activo, fecha)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_partidos_finalizados ON partidos (activo, fecha_fin)")
+        
+        # Historial: vista sobre los partidos finalizados (antes era una tabla con una copia)
+        cursor.execute("SELECT type FROM sqlite_master WHERE name = 'historial'")
+        existente = cursor.fetchone()
+        if existente is not None and existente['type'] == 'table':
+            _migrar_historial_a_vista(cursor)
+        cursor.execute('''
+            CREATE VIEW IF NOT EXISTS historial AS
+            SELECT id, id AS partido_id, fecha, fecha_fin, pareja1, pareja2, resultado, ganadores
+            FROM partidos
+            WHERE activo = 0
+        ''')
+        
+        # Temporadas: cada una empieza en fecha_inicio y dura hasta que empieza la siguiente
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS temporadas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nombre TEXT UNIQUE NOT NULL,
+                fecha_inicio TIMESTAMP NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            INSERT INTO temporadas (nombre, fecha_inicio)
+            SELECT 'Temporada inicial', '1970-01-01 00:00:00'
+            WHERE NOT EXISTS (SELECT 1 FROM temporadas)
+        ''')
+        
+        # Partidos finalizados de temporadas anteriores, fuera de las tablas diarias
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS partidos_archivo (
+                id INTEGER PRIMARY KEY,
+                temporada_id INTEGER NOT NULL,
+                fecha TIMESTAMP,
+                j1 TEXT NOT NULL,
+                j2 TEXT NOT NULL,
+                j3 TEXT NOT NULL,
+                j4 TEXT NOT NULL,
+                pareja1 TEXT NOT NULL,
+                pareja2 TEXT NOT NULL,
+                puntos_pareja1 INTEGER DEFAULT 0,
+                puntos_pareja2 INTEGER DEFAULT 0,
+                ganadores TEXT,
+                resultado TEXT,
+                fecha_fin TIMESTAMP
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_partidos_archivo_temporada ON partidos_archivo (temporada_id)")
+        
+        cursor.execute("PRAGMA table_info(partidos_archivo)")
+        if 'fecha_fin' not in [columna[1] for columna in cursor.fetchall()]:
+            cursor.execute("ALTER TABLE partidos_archivo ADD COLUMN fecha_fin TIMESTAMP")
+        
+        cursor.execute("SELECT type FROM sqlite_master WHERE name = 'historial_archivo'")
+        existente = cursor.fetchone()
+        if existente is not None and existente['type'] == 'table':
+            _migrar_historial_archivo_a_vista(cursor)
+        cursor.execute('''
+            CREATE VIEW IF NOT EXISTS historial_archivo AS
+            SELECT id, temporada_id, id AS partido_id, fecha, fecha_fin, pareja1, pareja2, resultado, ganadores
+            FROM partidos_archivo
+        ''')
+        
+        # Totales por jugador de lo archivado en cada temporada
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS estadisticas_temporada (
+                temporada_id INTEGER NOT NULL,
+                nombre TEXT NOT NULL,
+                partidos INTEGER DEFAULT 0,
+                puntos_favor INTEGER DEFAULT 0,
+                puntos_contra INTEGER DEFAULT 0,
+                victorias INTEGER DEFAULT 0,
+                derrotas INTEGER DEFAULT 0,
+                diferencia INTEGER DEFAULT 0,
+                PRIMARY KEY (temporada_id, nombre)
+            )
+        ''')
+        
+        # Estadísticas de cada pareja (jugador_a < jugador_b) y de cada jugador contra cada rival
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'estadisticas_pareja'")
+        migrar_cruzadas = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS estadisticas_pareja (
+                jugador_a TEXT NOT NULL,
+                jugador_b TEXT NOT NULL,
+                partidos INTEGER DEFAULT 0,
+                victorias INTEGER DEFAULT 0,
+                puntos_favor INTEGER DEFAULT 0,
+                puntos_contra INTEGER DEFAULT 0,
+                PRIMARY KEY (jugador_a, jugador_b)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_pareja_jugador_b ON estadisticas_pareja (jugador_b)")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS estadisticas_enfrentamiento (
+                jugador TEXT NOT NULL,
+                rival TEXT NOT NULL,
+                partidos INTEGER DEFAULT 0,
+                victorias INTEGER DEFAULT 0,
+                puntos_favor INTEGER DEFAULT 0,
+                puntos_contra INTEGER DEFAULT 0,
+                PRIMARY KEY (jugador, rival)
+            ) WITHOUT ROWID
+        ''')
+        if migrar_cruzadas:
+            _sumar_estadisticas_cruzadas(cursor, '''
+                SELECT j1, j2, j3, j4, puntos_pareja1, puntos_pareja2 FROM partidos WHERE activo = 0
+                UNION ALL
+                SELECT j1, j2, j3, j4, puntos_pareja1, puntos_pareja2 FROM partidos_archivo
+            ''')
+        
+        # Partidos de cada jugador ordenados por fecha, para el perfil sin recorrer j1..j4
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'partidos_jugador'")
+        migrar_partidos_jugador = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS partidos_jugador (
+                nombre TEXT NOT NULL,
+                fecha TIMESTAMP NOT NULL,
+                partido_id INTEGER NOT NULL,
+                pareja INTEGER NOT NULL,
+                PRIMARY KEY (nombre, fecha, partido_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_partidos_jugador_partido ON partidos_jugador (partido_id)")
+        if migrar_partidos_jugador:
+            _indexar_partidos_jugador(cursor, "SELECT id, fecha, j1, j2, j3, j4 FROM partidos")
+            _indexar_partidos_jugador(cursor, "SELECT id, fecha, j1, j2, j3, j4 FROM partidos_archivo")
+        
+        # Resúmenes por día y por jugador y mes de los partidos finalizados, para las gráficas de actividad
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'resumen_diario'")
+        migrar_resumenes = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS resumen_diario (
+                dia TEXT PRIMARY KEY,
+                partidos INTEGER DEFAULT 0,
+                puntos INTEGER DEFAULT 0
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS resumen_jugador_mes (
+                nombre TEXT NOT NULL,
+                mes TEXT NOT NULL,
+                partidos INTEGER DEFAULT 0,
+                victorias INTEGER DEFAULT 0,
+                puntos_favor INTEGER DEFAULT 0,
+                puntos_contra INTEGER DEFAULT 0,
+                PRIMARY KEY (nombre, mes)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumen_jugador_mes_mes ON resumen_jugador_mes (mes)")
+        if migrar_resumenes:
+            _sumar_resumenes(cursor, '''
+                SELECT fecha, fecha_fin, j1, j2, j3, j4, puntos_pareja1, puntos_pareja2 FROM partidos WHERE activo = 0
+                UNION ALL
+                SELECT fecha, fecha_fin, j1, j2, j3, j4, puntos_pareja1, puntos_pareja2 FROM partidos_archivo
+            ''')
+        
+        # Cola de tareas pesadas (reconstrucciones, mantenimiento, copias) que ejecuta EjecutorTareas
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tareas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                estado TEXT NOT NULL DEFAULT 'pendiente',
+                creada TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                iniciada TIMESTAMP,
+                terminada TIMESTAMP,
+                intentos INTEGER DEFAULT 0,
+                resultado TEXT,
+                error TEXT
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tareas_estado ON tareas (estado, id)")
+        
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        st.error(f"Error inicializando BD: {e}")
+        if conn:
+            conn.close()
+        return False
+
+# Ligas cuyo esquema ya se ha creado o migrado en este proceso
+_ligas_preparadas = set()
+_lock_preparacion = threading.Lock()
+
+def preparar_liga():
+    """Ejecuta init_database una sola vez por proceso para la liga del hilo actual.
+    
+    Streamlit vuelve a ejecutar app.py en cada interacción; el esquema solo
+    hace falta comprobarlo la primera vez que se usa cada liga.
+    """
+    liga = liga_actual()
+    if liga in _ligas_preparadas:
+        return True
+    with _lock_preparacion:
+        if liga not in _ligas_preparadas and init_database():
+            _ligas_preparadas.add(liga)
+    return liga in _ligas_preparadas
+
+def olvidar_ligas_preparadas():
+    """Hace que preparar_liga vuelva a ejecutar init_database (p. ej. tras vaciar el almacén en memoria)"""
+    with _lock_preparacion:
+        _ligas_preparadas.clear()
+
+# ============================================
+# FUNCIONES DE BASE DE DATOS
+# ============================================
+
+# Backoff exponencial entre reintentos: 50 ms, 100 ms, 200 ms... hasta 2 s, con jitter
+BACKOFF_BASE = 0.05
+BACKOFF_MAXIMO = 2.0
+
+class MetricasBloqueo:
+    """Contadores e histograma de esperas por bloqueo de la BD, por función"""
+    
+    LIMITES = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.funciones = {}
+    
+    def _entrada(self, funcion):
+        if funcion not in self.funciones:
+            self.funciones[funcion] = {
+                'llamadas': 0,
+                'reintentos': 0,
+                'fallos': 0,
+                'espera_total': 0.0,
+                'espera_maxima': 0.0,
+                'histograma': [0] * (len(self.LIMITES) + 1),
+            }
+        return self.funciones[funcion]
+    
+    def registrar(self, funcion, llamadas=0, reintentos=0, fallos=0):
+        with self._lock:
+            entrada = self._entrada(funcion)
+            entrada['llamadas'] += llamadas
+            entrada['reintentos'] += reintentos
+            entrada['fallos'] += fallos
+    
+    def registrar_espera(self, funcion, segundos):
+        with self._lock:
+            entrada = self._entrada(funcion)
+            entrada['espera_total'] += segundos
+            entrada['espera_maxima'] = max(entrada['espera_maxima'], segundos)
+            entrada['histograma'][bisect.bisect_left(self.LIMITES, segundos)] += 1
+    
+    def resumen(self):
+        """Una fila por función, lista para mostrar en una tabla"""
+        etiquetas = [f"≤{limite * 1000:g}ms" for limite in self.LIMITES] + [f">{self.LIMITES[-1] * 1000:g}ms"]
+        filas = []
+        with self._lock:
+            for funcion, entrada in sorted(self.funciones.items()):
+                fila = {
+                    'Función': funcion,
+                    'Llamadas': entrada['llamadas'],
+                    'Reintentos': entrada['reintentos'],
+                    'Fallos': entrada['fallos'],
+                    'Espera total (s)': round(entrada['espera_total'], 3),
+                    'Espera máx (s)': round(entrada['espera_maxima'], 3),
+                }
+                fila.update(zip(etiquetas, entrada['histograma']))
+                filas.append(fila)
+        return filas
+
+@st.cache_resource
+def obtener_metricas_bloqueo(liga):
+    """Métricas de la liga, compartidas por todas las sesiones del proceso"""
+    return MetricasBloqueo()
+
+def es_error_bloqueo(e):
+    """True si el error de SQLite se debe a un bloqueo (SQLITE_BUSY / SQLITE_LOCKED)"""
+    if not isinstance(e, sqlite3.OperationalError):
+        return False
+    codigo = getattr(e, 'sqlite_errorcode', None)
+    if codigo is not None:
+        return codigo & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(e) or "busy" in str(e)
+
+def nombre_funcion(func):
+    """Nombre de la función de datos a la que pertenece func (sin '<locals>')"""
+    nombre = getattr(func, '__qualname__', None) or getattr(func, '__name__', repr(func))
+    return nombre.split('.<locals>')[0]
+
+def iniciar_escritura(conn):
+    """Abre una transacción de escritura tomando el bloqueo desde el principio.
+    
+    Con BEGIN IMMEDIATE la espera por el bloqueo ocurre aquí, dentro del
+    busy_timeout, en lugar de fallar al promocionar una lectura a escritura.
+    """
+    _olvidar_lecturas()
+    inicio = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    espera = time.perf_counter() - inicio
+    funcion = getattr(_contexto_bd, 'funcion', None)
+    if funcion and espera >= MetricasBloqueo.LIMITES[0]:
+        obtener_metricas_bloqueo(liga_actual()).registrar_espera(funcion, espera)
+
+def ejecutar_con_retry(func, *args, max_retries=6, **kwargs):
+    """Ejecuta una función con reintentos en caso de bloqueo.
+    
+    Entre intentos espera con backoff exponencial y jitter para que varios
+    escritores no vuelvan a chocar a la vez, y registra reintentos y
+    tiempos de espera en las métricas de bloqueo de la función.
+    """
+    metricas = obtener_metricas_bloqueo(liga_actual())
+    funcion = nombre_funcion(func)
+    anterior = getattr(_contexto_bd, 'funcion', None)
+    _contexto_bd.funcion = funcion
+    metricas.registrar(funcion, llamadas=1)
+    inicio = time.perf_counter()
+    esperado = 0.0
+    try:
+        for intento in range(max_retries):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not es_error_bloqueo(e):
+                    raise
+                if intento == max_retries - 1:
+                    metricas.registrar(funcion, fallos=1)
+                    raise
+                metricas.registrar(funcion, reintentos=1)
+                espera = min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** intento)
+                time.sleep(random.uniform(espera / 2, espera))
+                # Tiempo perdido en intentos bloqueados y esperas de backoff
+                esperado = time.perf_counter() - inicio
+    finally:
+        _contexto_bd.funcion = anterior
+        if esperado:
+            metricas.registrar_espera(funcion, esperado)
+    return None
+
+# ============================================
+# LECTURAS POR EJECUCIÓN DEL SCRIPT
+# ============================================
+
+# Columnas de un partido tal como lo devuelve cargar_partido
+COLUMNAS_PARTIDO = '''id, fecha, j1, j2, j3, j4, pareja1, pareja2, activo,
+                       puntos_pareja1, puntos_pareja2, puntos_set1, puntos_set2,
+                       modo_muerte, ganadores, resultado, version'''
+
+def iniciar_ejecucion():
+    """Empieza una ejecución del script en este hilo.
+    
+    Hasta la siguiente llamada, las lecturas marcadas con
+    @lectura_por_ejecucion que se repitan con los mismos argumentos se
+    sirven de memoria; cualquier escritura las olvida. Sin esta llamada (API,
+    scripts) cada lectura va siempre a la BD.
+    """
+    _contexto_bd.lecturas = {}
+    _contexto_bd.informe = Counter()
+
+def resumen_ejecucion():
+    """Consultas hechas y ahorradas en la ejecución actual: {'consultas', 'ahorradas', 'por_funcion'}"""
+    informe = getattr(_contexto_bd, 'informe', Counter())
+    return {
+        'consultas': sum(v for (tipo, _), v in informe.items() if tipo == 'consulta'),
+        'ahorradas': sum(v for (tipo, _), v in informe.items() if tipo == 'ahorrada'),
+        'por_funcion': {funcion: v for (tipo, funcion), v in informe.items() if tipo == 'ahorrada'},
+    }
+
+def _olvidar_lecturas():
+    lecturas = getattr(_contexto_bd, 'lecturas', None)
+    if lecturas:
+        lecturas.clear()
+
+def _recordar_lectura(funcion, args, resultado):
+    """Guarda un resultado como si lo hubiera devuelto funcion(*args) en esta ejecución"""
+    lecturas = getattr(_contexto_bd, 'lecturas', None)
+    if lecturas is not None:
+        lecturas[(funcion, liga_actual(), args, ())] = resultado
+
+def _recordar_partidos(partidos):
+    """Deja cada partido (con todas las COLUMNAS_PARTIDO) listo para cargar_partido(id) sin otra consulta"""
+    for partido in partidos:
+        _recordar_lectura('cargar_partido', (partido['id'],), partido)
+
+def lectura_por_ejecucion(func):
+    """Memoriza func durante la ejecución actual del script (ver iniciar_ejecucion).
+    
+    El resultado se comparte entre las llamadas repetidas: quien lo reciba
+    no debe modificarlo.
+    """
+    @functools.wraps(func)
+    def _leer(*args, **kwargs):
+        lecturas = getattr(_contexto_bd, 'lecturas', None)
+        if lecturas is None:
+            return func(*args, **kwargs)
+        clave = (func.__name__, liga_actual(), args, tuple(sorted(kwargs.items())))
+        try:
+            if clave in lecturas:
+                _contexto_bd.informe['ahorrada', func.__name__] += 1
+                return lecturas[clave]
+        except TypeError:
+            # Argumentos no hashables (listas): se lee sin memorizar
+            return func(*args, **kwargs)
+        resultado = func(*args, **kwargs)
+        _contexto_bd.informe['consulta', func.__name__] += 1
+        lecturas[clave] = resultado
+        return resultado
+    
+    return _leer
+
+# ============================================
+# ESCRITOR AGRUPADO EN SEGUNDO PLANO (OPCIONAL)
+# ============================================
+
+# Activar con PADEL_ESCRITOR_AGRUPADO=1 en noches con muchas pistas a la vez
+USAR_ESCRITOR_AGRUPADO = os.environ.get("PADEL_ESCRITOR_AGRUPADO", "0") == "1"
+
+class EscritorAgrupado:
+    """Hilo único que agrupa las escrituras pendientes de todas las sesiones.
+    
+    Cada operación es una función que recibe un cursor. El hilo toma todas
+    las operaciones encoladas (hasta max_lote), las ejecuta en una sola
+    transacción, cada una en su propio SAVEPOINT para que un error no tumbe
+    al resto, y hace un único commit por lote.
+    """
+    
+    def __init__(self, liga, max_lote=50):
+        self.liga = liga
+        self.almacen = obtener_almacen()
+        self.max_lote = max_lote
+        self.cola = queue.Queue()
+        self.lotes = 0
+        self.escrituras = 0
+        self.mayor_lote = 0
+        self.ultimos_lotes = deque(maxlen=100)
+        self.hilo = threading.Thread(target=self._bucle, name="escritor-padel", daemon=True)
+        self.hilo.start()
+    
+    def enviar(self, operacion):
+        """Encola operacion(cursor) y devuelve un Future que se completa tras el commit"""
+        futuro = Future()
+        self.cola.put((operacion, futuro))
+        return futuro
+    
+    def estadisticas(self):
+        """Profundidad de la cola y tamaños de los lotes confirmados"""
+        ultimos = list(self.ultimos_lotes)
+        return {
+            'en_cola': self.cola.qsize(),
+            'lotes': self.lotes,
+            'escrituras': self.escrituras,
+            'lote_medio': round(self.escrituras / self.lotes, 2) if self.lotes else 0,
+            'lote_maximo': self.mayor_lote,
+            'ultimos_lotes': ultimos,
+        }
+    
+    def _bucle(self):
+        usar_liga(self.liga)
+        conn = None
+        while True:
+            pendientes = [self.cola.get()]
+            while len(pendientes) < self.max_lote:
+                try:
+                    pendientes.append(self.cola.get_nowait())
+                except queue.Empty:
+                    break
+            
+            try:
+                if conn is None:
+                    conn = self.almacen.conectar(self.liga, BUSY_TIMEOUT_MS, isolation_level=None)
+                    conn.row_factory = sqlite3.Row
+                resultados = self._escribir_lote(conn, pendientes)
+            except Exception as e:
+                for _, futuro in pendientes:
+                    futuro.set_exception(e)
+                if conn is not None:
+                    conn.close()
+                    conn = None
+                continue
+            
+            for futuro, resultado, error in resultados:
+                if error is None:
+                    futuro.set_result(resultado)
+                else:
+                    futuro.set_exception(error)
+    
+    def _escribir_lote(self, conn, pendientes):
+        cursor = conn.cursor()
+        ejecutar_con_retry(iniciar_escritura, conn)
+        try:
+            resultados = []
+            for operacion, futuro in pendientes:
+                cursor.execute("SAVEPOINT operacion")
+                try:
+                    resultados.append((futuro, operacion(cursor), None))
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO operacion")
+                    resultados.append((futuro, None, e))
+                cursor.execute("RELEASE operacion")
+            cursor.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            raise
+        
+        self.lotes += 1
+        self.escrituras += len(pendientes)
+        self.mayor_lote = max(self.mayor_lote, len(pendientes))
+        self.ultimos_lotes.append(len(pendientes))
+        return resultados
+
+@st.cache_resource
+def obtener_escritor(liga):
+    """Un único escritor por liga y proceso, compartido por todas las sesiones"""
+    return EscritorAgrupado(liga)
+
+def enviar_escritura(operacion):
+    """Ejecuta operacion(cursor) en una transacción y devuelve un Future con su resultado.
+    
+    Con el escritor agrupado activo la operación se encola y se confirma junto
+    con el resto de escrituras pendientes; si no, se ejecuta aquí mismo en su
+    propia conexión y el Future se devuelve ya completado.
+    """
+    _olvidar_lecturas()
+    if USAR_ESCRITOR_AGRUPADO:
+        return obtener_escritor(liga_actual()).enviar(operacion)
+    
+    def _ejecutar():
+        conn = get_db_connection()
+        if conn is None:
+            raise sqlite3.OperationalError("sin conexión a la base de datos")
+        try:
+            iniciar_escritura(conn)
+            resultado = operacion(conn.cursor())
+            conn.commit()
+            return resultado
+        finally:
+            conn.close()
+    
+    _ejecutar.__qualname__ = operacion.__qualname__
+    futuro = Future()
+    try:
+        futuro.set_result(ejecutar_con_retry(_ejecutar))
+    except Exception as e:
+        futuro.set_exception(e)
+    return futuro
+
+# ============================================
+# COPIAS DE SEGURIDAD
+# ============================================
+
+# Horas entre copias automáticas de cada liga (0 desactiva el programador)
+COPIAS_CADA_HORAS = float(os.environ.get("PADEL_COPIAS_CADA_HORAS", "24"))
+
+class ProgramadorCopias:
+    """Hilo que hace una copia en caliente de cada liga cuando la última es más antigua que el intervalo.
+    
+    Las copias se hacen por pasos con la API de backup de SQLite, así que los
+    anotadores siguen escribiendo mientras tanto; la retención la aplica
+    copias.crear_copia.
+    """
+    
+    def __init__(self, almacen_ligas, intervalo_horas):
+        self.almacen = almacen_ligas
+        self.intervalo = intervalo_horas * 3600
+        self.ultimas = {}
+        self.errores = {}
+        self.hilo = threading.Thread(target=self._bucle, name="copias-padel", daemon=True)
+        self.hilo.start()
+    
+    def pendiente(self, liga):
+        """True si la liga no tiene copias o la más reciente ya ha caducado"""
+        existentes = copias.listar_copias(prefijo=liga)
+        if not existentes:
+            return True
+        return (datetime.now() - existentes[0]['fecha']).total_seconds() >= self.intervalo
+    
+    def _bucle(self):
+        while True:
+            for liga in self.almacen.ligas():
+                try:
+                    if self.pendiente(liga):
+                        self.ultimas[liga] = copias.crear_copia(self.almacen.ruta(liga), prefijo=liga)
+                        self.errores.pop(liga, None)
+                except Exception as e:
+                    self.errores[liga] = str(e)
+            time.sleep(min(self.intervalo, 600))
+
+@st.cache_resource
+def obtener_programador_copias():
+    """Un único programador por proceso para todas las ligas (solo si el almacén está en disco)"""
+    almacen_ligas = obtener_almacen()
+    if COPIAS_CADA_HORAS <= 0 or not almacen_ligas.persistente:
+        return None
+    return ProgramadorCopias(almacen_ligas, COPIAS_CADA_HORAS)
+
+def crear_copia_liga():
+    """Copia en caliente de la liga actual; devuelve la medición o None si falla"""
+    if not obtener_almacen().persistente:
+        st.error("❌ El almacén en memoria no admite copias de seguridad")
+        return None
+    try:
+        return copias.crear_copia(obtener_almacen().ruta(liga_actual()), prefijo=liga_actual())
+    except Exception as e:
+        st.error(f"Error al crear la copia: {e}")
+        return None
+
+def restaurar_copia_liga(archivo):
+    """Restaura la liga actual desde una copia, guardando antes su estado"""
+    if not obtener_almacen().persistente:
+        st.error("❌ El almacén en memoria no admite copias de seguridad")
+        return None
+    try:
+        restaurada = copias.restaurar_copia(archivo, obtener_almacen().ruta(liga_actual()))
+        # Lo leído antes en esta ejecución es de la base sustituida
+        _olvidar_lecturas()
+        return restaurada
+    except Exception as e:
+        st.error(f"Error al restaurar la copia: {e}")
+        return None
+
+def recalcular_estadisticas():
+    """Recalcula todas las estadísticas de los jugadores desde cero"""
+    def _recalcular():
+        conn = get_db_connection()
+        if conn is None:
+            return False
+        try:
+            cursor = conn.cursor()
+            iniciar_escritura(conn)
+            
+            # Resetear estadísticas
+            cursor.execute('''
+                UPDATE jugadores 
+                SET partidos = 0, puntos_favor = 0, puntos_contra = 0, 
+                    victorias = 0, derrotas = 0, diferencia = 0
+            ''')
+            
+            # Partir de los totales ya archivados de temporadas anteriores
+            cursor.execute('''
+                UPDATE jugadores
+                SET partidos = t.partidos, puntos_favor = t.puntos_favor,
+                    puntos_contra = t.puntos_contra, victorias = t.victorias,
+                    derrotas = t.derrotas, diferencia = t.diferencia
+                FROM (
+                    SELECT nombre, SUM(partidos) AS partidos, SUM(puntos_favor) AS puntos_favor,
+                           SUM(puntos_contra) AS puntos_contra, SUM(victorias) AS victorias,
+                           SUM(derrotas) AS derrotas, SUM(diferencia) AS diferencia
+                    FROM estadisticas_temporada
+                    GROUP BY nombre
+                ) AS t
+                WHERE jugadores.nombre = t.nombre
+            ''')
+            
+            # Obtener los partidos finalizados que siguen en la tabla diaria
+            cursor.execute('''
+                SELECT j1, j2, j3, j4, puntos_pareja1, puntos_pareja2, ganadores
+                FROM partidos 
+                WHERE activo = 0
+            ''')
+            
+            partidos = cursor.fetchall()
+            
+            for partido in partidos:
+                puntos1 = partido['puntos_pareja1'] or 0
+                puntos2 = partido['puntos_pareja2'] or 0
+                
+                if puntos1 > puntos2:
+                    ganadores = [partido['j1'], partido['j2']]
+                    perdedores = [partido['j3'], partido['j4']]
+                    puntos_ganadores = puntos1
+                    puntos_perdedores = puntos2
+                else:
+                    ganadores = [partido['j3'], partido['j4']]
+                    perdedores = [partido['j1'], partido['j2']]
+                    puntos_ganadores = puntos2
+                    puntos_perdedores = puntos1
+                
+                for nombre in ganadores:
+                    cursor.execute('''
+                        UPDATE jugadores 
+                        SET partidos = partidos + 1,
+                            victorias = victorias + 1,
+                            puntos_favor = puntos_favor + ?,
+                            puntos_contra = puntos_contra + ?,
+                            diferencia = (puntos_favor + ?) - (puntos_contra + ?)
+                        WHERE nombre = ?
+                    ''', (puntos_ganadores, puntos_perdedores, puntos_ganadores, puntos_perdedores, nombre))
+                
+                for nombre in perdedores:
+                    cursor.execute('''
+                        UPDATE jugadores 
+                        SET partidos = partidos + 1,
+                            derrotas = derrotas + 1,
+                            puntos_favor = puntos_favor + ?,
+                            puntos_contra = puntos_contra + ?,
+                            diferencia = (puntos_favor + ?) - (puntos_contra + ?)
+                        WHERE nombre = ?
+                    ''', (puntos_perdedores, puntos_ganadores, puntos_perdedores, puntos_ganadores, nombre))
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error recalculando estadísticas: {e}")
+            if conn:
+                conn.close()
+            return False
+    
+    return ejecutar_con_retry(_recalcular)
+
+@lectura_por_ejecucion
+def cargar_jugadores():
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return []
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, nombre, nivel, partidos, puntos_favor, puntos_contra, 
+                       victorias, derrotas, diferencia 
+                FROM jugadores 
+                ORDER BY puntos_favor DESC
+            ''')
+            jugadores = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return jugadores
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando jugadores: {e}")
+            conn.close()
+            return []
+    
+    return ejecutar_con_retry(_cargar)
+
+# Criterios de orden de la lista de jugadores (etiqueta -> ORDER BY); solo se acepta uno de estos
+ORDENES_JUGADORES = {
+    "Puntos a favor": "puntos_favor DESC, nombre",
+    "Nombre": "nombre COLLATE NOCASE, nombre",
+    "Partidos": "partidos DESC, nombre",
+    "Victorias": "victorias DESC, nombre",
+    "Diferencia": "diferencia DESC, nombre",
+}
+
+@lectura_por_ejecucion
+def cargar_jugadores_paginado(offset=0, limit=50, filtro="", nivel=None, orden="Puntos a favor"):
+    """Una página de jugadores filtrada y ordenada en la BD; devuelve (jugadores, total filtrado)"""
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return [], 0
+        try:
+            cursor = conn.cursor()
+            condiciones = []
+            params = []
+            if filtro:
+                condiciones.append("nombre LIKE ?")
+                params.append(f'%{filtro}%')
+            if nivel:
+                condiciones.append("nivel = ?")
+                params.append(nivel)
+            where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+            
+            cursor.execute(f"SELECT COUNT(*) AS total FROM jugadores {where}", params)
+            total = cursor.fetchone()['total']
+            
+            cursor.execute(f'''
+                SELECT id, nombre, nivel, partidos, puntos_favor, puntos_contra,
+                       victorias, derrotas, diferencia
+                FROM jugadores
+                {where}
+                ORDER BY {ORDENES_JUGADORES.get(orden, ORDENES_JUGADORES["Puntos a favor"])}
+                LIMIT ? OFFSET ?
+            ''', [*params, limit, offset])
+            jugadores = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return jugadores, total
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando jugadores: {e}")
+            conn.close()
+            return [], 0
+    
+    return ejecutar_con_retry(_cargar)
+
+def guardar_jugador(nombre, nivel):
+    def _guardar():
+        conn = get_db_connection()
+        if conn is None:
+            return False
+        try:
+            cursor = conn.cursor()
+            iniciar_escritura(conn)
+            cursor.execute('''
+                INSERT INTO jugadores (nombre, nivel, partidos, puntos_favor, puntos_contra, 
+                                      victorias, derrotas, diferencia)
+                VALUES (?, ?, 0, 0, 0, 0, 0, 0)
+            ''', (nombre, nivel))
+            conn.commit()
+            conn.close()
+            return True
+        except sqlite3.IntegrityError:
+            conn.close()
+            return False
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error guardando jugador: {e}")
+            conn.close()
+            return False
+    
+    return ejecutar_con_retry(_guardar)
+
+def _recalcular_jugadores(cursor):
+    """Recalcula desde cero las estadísticas de los jugadores de temp.afectados.
+    
+    Igual que recalcular_estadisticas pero solo para esos jugadores: parte de
+    lo archivado en estadisticas_temporada y suma sus partidos finalizados
+    de la tabla diaria, que se localizan por partidos_jugador.
+    """
+    cursor.execute('''
+        UPDATE jugadores
+        SET partidos = 0, puntos_favor = 0, puntos_contra = 0,
+            victorias = 0, derrotas = 0, diferencia = 0
+        WHERE nombre IN (SELECT nombre FROM temp.afectados)
+    ''')
+    cursor.execute(f'''
+        UPDATE jugadores
+        SET partidos = t.partidos, puntos_favor = t.puntos_favor,
+            puntos_contra = t.puntos_contra, victorias = t.victorias,
+            derrotas = t.derrotas, diferencia = t.diferencia
+        FROM (
+            SELECT nombre, SUM(partidos) AS partidos, SUM(puntos_favor) AS puntos_favor,
+                   SUM(puntos_contra) AS puntos_contra, SUM(victorias) AS victorias,
+                   SUM(derrotas) AS derrotas, SUM(diferencia) AS diferencia
+            FROM (
+                SELECT nombre, partidos, puntos_favor, puntos_contra, victorias, derrotas, diferencia
+                FROM estadisticas_temporada
+                WHERE nombre IN (SELECT nombre FROM temp.afectados)
+                UNION ALL
+                SELECT nombre, partidos, puntos_favor, puntos_contra, victorias, derrotas, diferencia
+                FROM ({sql_estadisticas_por_jugador(
+                    "partidos",
+                    "activo = 0 AND id IN (SELECT partido_id FROM partidos_jugador "
+                    "WHERE nombre IN (SELECT nombre FROM temp.afectados))"
+                )})
+            )
+            GROUP BY nombre
+        ) AS t
+        WHERE jugadores.nombre = t.nombre
+          AND jugadores.nombre IN (SELECT nombre FROM temp.afectados)
+    ''')
+
+def _marcar_afectados(cursor, partido_id):
+    """Deja en temp.afectados los cuatro jugadores del partido, para _recalcular_jugadores"""
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS afectados (nombre TEXT PRIMARY KEY)")
+    cursor.execute("DELETE FROM temp.afectados")
+    cursor.execute('''
+        INSERT OR IGNORE INTO temp.afectados (nombre)
+        SELECT nombre FROM partidos_jugador WHERE partido_id = ?
+    ''', (partido_id,))
+
+def eliminar_jugador(nombre):
+    """Elimina un jugador junto con todos sus partidos (activos, finalizados y archivados).
+    
+    Todo va en una transacción: se descuentan esos partidos de las tablas de
+    parejas, cara a cara, resúmenes y temporadas, y solo se recalculan las
+    estadísticas de los jugadores que compartieron partido con él.
+    Devuelve el número de partidos borrados, o None si no se pudo.
+    """
+    def _eliminar(cursor):
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS a_borrar (id INTEGER PRIMARY KEY)")
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS afectados (nombre TEXT PRIMARY KEY)")
+        cursor.execute("DELETE FROM temp.a_borrar")
+        cursor.execute("DELETE FROM temp.afectados")
+        
+        cursor.execute('''
+            INSERT OR IGNORE INTO temp.a_borrar (id)
+            SELECT partido_id FROM partidos_jugador WHERE nombre = ?
+        ''', (nombre,))
+        cursor.execute('''
+            INSERT OR IGNORE INTO temp.afectados (nombre)
+            SELECT nombre FROM partidos_jugador
+            WHERE partido_id IN (SELECT id FROM temp.a_borrar) AND nombre <> ?
+        ''', (nombre,))
+        
+        # Descontar los partidos ya contados en parejas, cara a cara y resúmenes
+        contados = '''
+            SELECT fecha, fecha_fin, j1, j2, j3, j4, puntos_pareja1, puntos_pareja2
+            FROM partidos WHERE activo = 0 AND id IN (SELECT id FROM temp.a_borrar)
+            UNION ALL
+            SELECT fecha, fecha_fin, j1, j2, j3, j4, puntos_pareja1, puntos_pareja2
+            FROM partidos_archivo WHERE id IN (SELECT id FROM temp.a_borrar)
+        '''
+        _sumar_estadisticas_cruzadas(cursor, contados, signo=-1)
+        _sumar_resumenes(cursor, contados, signo=-1)
+        
+        # Y los archivados, de los totales de su temporada
+        cursor.execute('''
+            SELECT DISTINCT temporada_id FROM partidos_archivo
+            WHERE id IN (SELECT id FROM temp.a_borrar)
+        ''')
+        for (temporada_id,) in cursor.fetchall():
+            cursor.execute(f'''
+                INSERT INTO estadisticas_temporada (temporada_id, nombre, partidos, puntos_favor,
+                                                    puntos_contra, victorias, derrotas, diferencia)
+                SELECT ?, nombre, -partidos, -puntos_favor, -puntos_contra, -victorias, -derrotas, -diferencia
+                FROM ({sql_estadisticas_por_jugador(
+                    "partidos_archivo",
+                    "temporada_id = ? AND id IN (SELECT id FROM temp.a_borrar)"
+                )})
+                WHERE true
+                ON CONFLICT (temporada_id, nombre) DO UPDATE SET
+                    partidos = partidos + excluded.partidos,
+                    puntos_favor = puntos_favor + excluded.puntos_favor,
+                    puntos_contra = puntos_contra + excluded.puntos_contra,
+                    victorias = victorias + excluded.victorias,
+                    derrotas = derrotas + excluded.derrotas,
+                    diferencia = diferencia + excluded.diferencia
+            ''', (temporada_id, temporada_id))
+        cursor.execute("DELETE FROM estadisticas_temporada WHERE partidos <= 0 OR nombre = ?", (nombre,))
+        
+        cursor.execute("DELETE FROM partidos_jugador WHERE partido_id IN (SELECT id FROM temp.a_borrar)")
+        cursor.execute("DELETE FROM partidos WHERE id IN (SELECT id FROM temp.a_borrar)")
+        borrados = cursor.rowcount
+        cursor.execute("DELETE FROM partidos_archivo WHERE id IN (SELECT id FROM temp.a_borrar)")
+        borrados += cursor.rowcount
+        cursor.execute("DELETE FROM jugadores WHERE nombre = ?", (nombre,))
+        
+        _recalcular_jugadores(cursor)
+        cursor.execute("DELETE FROM temp.a_borrar")
+        cursor.execute("DELETE FROM temp.afectados")
+        return borrados
+    
+    try:
+        return enviar_escritura(_eliminar).result()
+    except Exception as e:
+        st.error(f"Error eliminando jugador: {e}")
+        return None
+
+def crear_partido(j1, j2, j3, j4, pareja1, pareja2):
+    def _insertar(cursor):
+        cursor.execute('''
+            INSERT INTO partidos (j1, j2, j3, j4, pareja1, pareja2, activo, puntos_set1, puntos_set2, modo_muerte)
+            VALUES (?, ?, ?, ?, ?, ?, 1, 0, 0, 0)
+        ''', (j1, j2, j3, j4, pareja1, pareja2))
+        partido_id = cursor.lastrowid
+        _indexar_partidos_jugador(cursor, "SELECT id, fecha, j1, j2, j3, j4 FROM partidos WHERE id = ?", (partido_id,))
+        return partido_id
+    
+    try:
+        return enviar_escritura(_insertar).result()
+    except Exception as e:
+        st.error(f"Error creando partido: {e}")
+        return None
+
+@lectura_por_ejecucion
+def cargar_partido(partido_id):
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT {COLUMNAS_PARTIDO}
+                FROM partidos 
+                WHERE id = ?
+            ''', (partido_id,))
+            partido = cursor.fetchone()
+            conn.close()
+            if partido:
+                return dict(partido)
+            return None
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando partido: {e}")
+            conn.close()
+            return None
+    
+    return ejecutar_con_retry(_cargar)
+
+@lectura_por_ejecucion
+def cargar_partidos_activos_paginado(offset=0, limit=20):
+    """Carga partidos activos con paginación; los de la página quedan listos para cargar_partido"""
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return [], 0
+        try:
+            cursor = conn.cursor()
+            
+            # Obtener total
+            cursor.execute('SELECT COUNT(*) as total FROM partidos WHERE activo = 1')
+            total = cursor.fetchone()['total']
+            
+            # Obtener página
+            cursor.execute(f'''
+                SELECT {COLUMNAS_PARTIDO}
+                FROM partidos 
+                WHERE activo = 1
+                ORDER BY fecha DESC
+                LIMIT ? OFFSET ?
+            ''', (limit, offset))
+            partidos = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            _recordar_partidos(partidos)
+            return partidos, total
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando partidos activos: {e}")
+            conn.close()
+            return [], 0
+    
+    return ejecutar_con_retry(_cargar)
+
+@lectura_por_ejecucion
+def cargar_todos_partidos_paginado(offset=0, limit=20, filtro=""):
+    """Carga todos los partidos con paginación y filtro; los de la página quedan listos para cargar_partido"""
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return [], 0
+        try:
+            cursor = conn.cursor()
+            
+            # Construir query base
+            query_base = "FROM partidos"
+            params = []
+            
+            if filtro:
+                query_base += " WHERE id LIKE ? OR pareja1 LIKE ? OR pareja2 LIKE ?"
+                filtro_param = f'%{filtro}%'
+                params = [filtro_param, filtro_param, filtro_param]
+            
+            # Obtener total
+            cursor.execute(f"SELECT COUNT(*) as total {query_base}", params)
+            total = cursor.fetchone()['total']
+            
+            # Obtener página
+            query = f'''
+                SELECT {COLUMNAS_PARTIDO}
+                {query_base}
+                ORDER BY fecha DESC
+                LIMIT ? OFFSET ?
+            '''
+            params.extend([limit, offset])
+            
+            cursor.execute(query, params)
+            partidos = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            _recordar_partidos(partidos)
+            return partidos, total
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando partidos: {e}")
+            conn.close()
+            return [], 0
+    
+    return ejecutar_con_retry(_cargar)
+
+def eliminar_partido(partido_id):
+    """Elimina un partido y recalcula las estadísticas de sus cuatro jugadores"""
+    def _eliminar():
+        conn = get_db_connection()
+        if conn is None:
+            return False
+        try:
+            cursor = conn.cursor()
+            iniciar_escritura(conn)
+            # Antes de borrar sus filas de partidos_jugador, que es de donde salen
+            _marcar_afectados(cursor, partido_id)
+            
+            # Descontar el partido de parejas, cara a cara y resúmenes si ya estaba contado
+            _sumar_estadisticas_cruzadas(cursor, '''
+                SELECT j1, j2, j3, j4, puntos_pareja1, puntos_pareja2
+                FROM partidos WHERE id = ? AND activo = 0
+            ''', (partido_id,), signo=-1)
+            _sumar_resumenes(cursor, '''
+                SELECT fecha, fecha_fin, j1, j2, j3, j4, puntos_pareja1, puntos_pareja2
+                FROM partidos WHERE id = ? AND activo = 0
+            ''', (partido_id,), signo=-1)
+            
+            cursor.execute("DELETE FROM partidos_jugador WHERE partido_id = ?", (partido_id,))
+            cursor.execute("DELETE FROM partidos WHERE id = ?", (partido_id,))
+            _recalcular_jugadores(cursor)
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error eliminando partido: {e}")
+            if conn:
+                conn.close()
+            return False
+    
+    return ejecutar_con_retry(_eliminar)
+
+def actualizar_puntos_partido(partido_id, puntos_pareja1, puntos_pareja2, version=None):
+    """Guarda el marcador del partido.
+    
+    Si se indica version, solo se escribe cuando el partido sigue en esa
+    versión (devuelve False si otro anotador lo modificó antes). Devuelve
+    None si no se pudo escribir.
+    """
+    def _actualizar(cursor):
+        if version is None:
+            cursor.execute('''
+                UPDATE partidos 
+                SET puntos_pareja1 = ?, puntos_pareja2 = ?, version = version + 1
+                WHERE id = ?
+            ''', (puntos_pareja1, puntos_pareja2, partido_id))
+        else:
+            cursor.execute('''
+                UPDATE partidos 
+                SET puntos_pareja1 = ?, puntos_pareja2 = ?, version = version + 1
+                WHERE id = ? AND version = ?
+            ''', (puntos_pareja1, puntos_pareja2, partido_id, version))
+        return cursor.rowcount == 1
+    
+    try:
+        return enviar_escritura(_actualizar).result()
+    except Exception as e:
+        st.error(f"Error actualizando puntos: {e}")
+        return None
+
+# ============================================
+# CONTROL DE CONCURRENCIA OPTIMISTA
+# ============================================
+
+def modificar_partido(partido_id, calcular_cambios, max_conflictos=10):
+    """Aplica una modificación sobre el estado actual del partido sin bloquearlo.
+    
+    Lee el partido fuera de cualquier transacción de escritura, calcula los
+    cambios con calcular_cambios(partido) y solo toma el bloqueo para el
+    UPDATE condicionado a la versión leída (compare-and-swap). Si otro
+    anotador escribió entre medias, vuelve a leer y recalcula sobre el estado
+    nuevo. Devuelve (partido_actualizado, resultado) o (None, None) si el
+    partido no existe o ya no está activo.
+    """
+    def _leer():
+        conn = get_db_connection()
+        if conn is None:
+            raise sqlite3.OperationalError("sin conexión a la base de datos")
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, activo, puntos_pareja1, puntos_pareja2, puntos_set1,
+                       puntos_set2, modo_muerte, version
+                FROM partidos
+                WHERE id = ?
+            ''', (partido_id,))
+            fila = cursor.fetchone()
+            return dict(fila) if fila else None
+        finally:
+            conn.close()
+    
+    def _escribir(cambios, version):
+        def _cas(cursor):
+            asignaciones = ", ".join(f"{campo} = ?" for campo in cambios)
+            cursor.execute(f'''
+                UPDATE partidos
+                SET {asignaciones}, version = version + 1
+                WHERE id = ? AND version IS ? AND activo = 1
+            ''', (*cambios.values(), partido_id, version))
+            return cursor.rowcount == 1
+        
+        _cas.__qualname__ = modificar_partido.__qualname__
+        return enviar_escritura(_cas).result()
+    
+    try:
+        for intento in range(max_conflictos):
+            partido = ejecutar_con_retry(_leer)
+            if partido is None or not partido['activo']:
+                return None, None
+            version_leida = partido['version']
+            
+            for campo in ('puntos_pareja1', 'puntos_pareja2', 'puntos_set1', 'puntos_set2', 'modo_muerte', 'version'):
+                partido[campo] = partido[campo] or 0
+            
+            cambios, resultado = calcular_cambios(dict(partido))
+            if not cambios:
+                return partido, resultado
+            
+            if _escribir(cambios, version_leida):
+                partido.update(cambios)
+                partido['version'] += 1
+                return partido, resultado
+            # Otro anotador escribió antes (o el partido se finalizó): reintentar sobre el estado
+            # nuevo, con un poco de jitter para no volver a chocar con él
+            time.sleep(random.uniform(0, min(BACKOFF_MAXIMO, BACKOFF_BASE * 2 ** intento) / 2))
+        
+        raise RuntimeError(f"el partido #{partido_id} está siendo modificado por otro anotador, inténtalo de nuevo")
+    except Exception as e:
+        st.error(f"Error modificando partido: {e}")
+        return None, None
+
+def anotar_punto(partido_id, ganador):
+    """Suma un punto del juego actual a la pareja indicada (1 o 2).
+    
+    Devuelve la pareja que ganó el juego con este punto, 0 si el juego
+    sigue, o None si no se pudo anotar.
+    """
+    def _calcular(partido):
+        nuevos_set1, nuevos_set2, juego_ganado, ganador_juego = procesar_punto(
+            partido['puntos_set1'], partido['puntos_set2'], ganador, partido['modo_muerte']
+        )
+        cambios = {'puntos_set1': nuevos_set1, 'puntos_set2': nuevos_set2}
+        if juego_ganado:
+            if ganador_juego == 1:
+                cambios['puntos_pareja1'] = partido['puntos_pareja1'] + 1
+            else:
+                cambios['puntos_pareja2'] = partido['puntos_pareja2'] + 1
+            cambios['modo_muerte'] = 0
+        return cambios, ganador_juego
+    
+    partido, ganador_juego = modificar_partido(partido_id, _calcular)
+    return ganador_juego if partido else None
+
+def cerrar_juego(partido_id, ganador=None):
+    """Cierra el juego actual: suma el juego al ganador (si se indica) y reinicia el 15-30-40"""
+    def _calcular(partido):
+        cambios = {'puntos_set1': 0, 'puntos_set2': 0, 'modo_muerte': 0}
+        if ganador == 1:
+            cambios['puntos_pareja1'] = partido['puntos_pareja1'] + 1
+        elif ganador == 2:
+            cambios['puntos_pareja2'] = partido['puntos_pareja2'] + 1
+        return cambios, True
+    
+    partido, _ = modificar_partido(partido_id, _calcular)
+    return partido is not None
+
+def elegir_modo_muerte(partido_id, modo_muerte):
+    """Fija el modo de desempate solo si el juego sigue en 40-40"""
+    def _calcular(partido):
+        if partido['puntos_set1'] != 3 or partido['puntos_set2'] != 3:
+            return None, False
+        return {'modo_muerte': modo_muerte}, True
+    
+    _, aplicado = modificar_partido(partido_id, _calcular)
+    return bool(aplicado)
+
+def finalizar_partido(partido_id, puntos_pareja1, puntos_pareja2, ganadores):
+    def _finalizar():
+        conn = get_db_connection()
+        if conn is None:
+            return False
+        try:
+            cursor = conn.cursor()
+            iniciar_escritura(conn)
+            
+            cursor.execute('SELECT activo FROM partidos WHERE id = ?', (partido_id,))
+            partido = dict(cursor.fetchone())
+            
+            # El historial es una vista sobre partidos: basta con esta actualización
+            resultado = f"{puntos_pareja1} - {puntos_pareja2}"
+            cursor.execute('''
+                UPDATE partidos 
+                SET activo = 0, puntos_pareja1 = ?, puntos_pareja2 = ?, 
+                    ganadores = ?, resultado = ?, fecha_fin = COALESCE(fecha_fin, CURRENT_TIMESTAMP)
+                WHERE id = ?
+            ''', (puntos_pareja1, puntos_pareja2, ganadores, resultado, partido_id))
+            
+            if partido['activo']:
+                _sumar_estadisticas_cruzadas(cursor, '''
+                    SELECT j1, j2, j3, j4, puntos_pareja1, puntos_pareja2
+                    FROM partidos WHERE id = ?
+                ''', (partido_id,))
+                _sumar_resumenes(cursor, '''
+                    SELECT fecha, fecha_fin, j1, j2, j3, j4, puntos_pareja1, puntos_pareja2
+                    FROM partidos WHERE id = ?
+                ''', (partido_id,))
+            
+            # Solo cambian los cuatro jugadores del partido; la reconstrucción completa es una tarea aparte
+            _marcar_afectados(cursor, partido_id)
+            _recalcular_jugadores(cursor)
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error finalizando partido: {e}")
+            if conn:
+                conn.close()
+            return False
+    
+    return ejecutar_con_retry(_finalizar)
+
+@lectura_por_ejecucion
+def cargar_historial_paginado(offset=0, limit=50, filtro="", recientes_primero=True):
+    """Una página del historial filtrada por pareja y ordenada por fecha de fin; devuelve (partidos, total)"""
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return [], 0
+        try:
+            cursor = conn.cursor()
+            where = ""
+            params = []
+            if filtro:
+                where = "WHERE pareja1 LIKE ? OR pareja2 LIKE ?"
+                params = [f'%{filtro}%', f'%{filtro}%']
+            
+            cursor.execute(f"SELECT COUNT(*) AS total FROM historial {where}", params)
+            total = cursor.fetchone()['total']
+            
+            sentido = "DESC" if recientes_primero else "ASC"
+            cursor.execute(f'''
+                SELECT id, fecha, fecha_fin, pareja1, pareja2, resultado, ganadores
+                FROM historial
+                {where}
+                ORDER BY fecha_fin {sentido}, id {sentido}
+                LIMIT ? OFFSET ?
+            ''', [*params, limit, offset])
+            historial = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return historial, total
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando historial: {e}")
+            conn.close()
+            return [], 0
+    
+    return ejecutar_con_retry(_cargar)
+
+@lectura_por_ejecucion
+def obtener_estadisticas_globales():
+    def _obtener():
+        conn = get_db_connection()
+        if conn is None:
+            return 0, 0, 0
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT (SELECT COALESCE(SUM(partidos), 0) FROM resumen_diario) AS total_partidos,
+                       COALESCE(SUM(puntos_favor), 0) AS total_puntos,
+                       COALESCE(MAX(puntos_favor), 0) AS max_puntos
+                FROM jugadores
+            ''')
+            totales = cursor.fetchone()
+            conn.close()
+            return totales['total_partidos'], totales['total_puntos'], totales['max_puntos']
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error obteniendo estadísticas: {e}")
+            conn.close()
+            return 0, 0, 0
+    
+    return ejecutar_con_retry(_obtener)
+
+@lectura_por_ejecucion
+def clasificacion_entre_ligas(limite=50):
+    """Clasificación conjunta de todas las ligas adjuntando sus bases de datos con ATTACH"""
+    almacen_ligas = obtener_almacen()
+    ligas = listar_ligas()
+    
+    def _cargar():
+        # Las ligas se adjuntan a una conexión normal de la liga actual; todas las consultas van
+        # cualificadas con su liga{n}, así que la base principal de la conexión no interviene
+        conn = get_db_connection()
+        if conn is None:
+            return []
+        try:
+            filas = []
+            for inicio in range(0, len(ligas), MAX_LIGAS_ADJUNTAS):
+                grupo = ligas[inicio:inicio + MAX_LIGAS_ADJUNTAS]
+                consultas = []
+                for n, liga in enumerate(grupo):
+                    conn.execute(f"ATTACH DATABASE ? AS liga{n}", (almacen_ligas.uri(liga, solo_lectura=True),))
+                    consultas.append(f'''
+                        SELECT ? AS liga, nombre, nivel, partidos, puntos_favor, puntos_contra,
+                               victorias, derrotas, diferencia
+                        FROM liga{n}.jugadores
+                    ''')
+                cursor = conn.execute(
+                    " UNION ALL ".join(consultas) + " ORDER BY puntos_favor DESC LIMIT ?",
+                    (*grupo, limite)
+                )
+                filas.extend(dict(row) for row in cursor.fetchall())
+                for n in range(len(grupo)):
+                    conn.execute(f"DETACH DATABASE liga{n}")
+            conn.close()
+            filas.sort(key=lambda x: x['puntos_favor'], reverse=True)
+            return filas[:limite]
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando clasificación entre ligas: {e}")
+            conn.close()
+            return []
+    
+    return ejecutar_con_retry(_cargar)
+
+# ============================================
+# TEMPORADAS Y ARCHIVO
+# ============================================
+
+def sql_estadisticas_por_jugador(tabla, condicion="1"):
+    """Consulta que agrega por jugador los partidos finalizados de tabla.
+    
+    Aplica las mismas reglas que recalcular_estadisticas: gana la pareja 1
+    si tiene más puntos; si no, la pareja 2.
+    """
+    return f'''
+        WITH fuente AS (
+            SELECT j1, j2, j3, j4,
+                   COALESCE(puntos_pareja1, 0) AS p1,
+                   COALESCE(puntos_pareja2, 0) AS p2
+            FROM {tabla}
+            WHERE {condicion}
+        ),
+        lados AS (
+            SELECT j1 AS nombre, p1 AS pf, p2 AS pc, p1 > p2 AS gana FROM fuente
+            UNION ALL SELECT j2, p1, p2, p1 > p2 FROM fuente
+            UNION ALL SELECT j3, p2, p1, p1 <= p2 FROM fuente
+            UNION ALL SELECT j4, p2, p1, p1 <= p2 FROM fuente
+        )
+        SELECT nombre, COUNT(*) AS partidos, SUM(pf) AS puntos_favor, SUM(pc) AS puntos_contra,
+               SUM(gana) AS victorias, COUNT(*) - SUM(gana) AS derrotas,
+               SUM(pf) - SUM(pc) AS diferencia
+        FROM lados
+        GROUP BY nombre
+    '''
+
+@lectura_por_ejecucion
+def cargar_temporadas():
+    """Temporadas de la liga, de la más reciente a la más antigua"""
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return []
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, nombre, fecha_inicio,
+                       LEAD(fecha_inicio) OVER (ORDER BY fecha_inicio) AS fecha_fin
+                FROM temporadas
+                ORDER BY fecha_inicio DESC
+            ''')
+            temporadas = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return temporadas
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando temporadas: {e}")
+            conn.close()
+            return []
+    
+    return ejecutar_con_retry(_cargar)
+
+def _archivar_partidos(cursor):
+    """Mueve al archivo los partidos finalizados anteriores a la temporada actual"""
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS a_archivar (id INTEGER PRIMARY KEY, temporada_id INTEGER)")
+    cursor.execute("DELETE FROM temp.a_archivar")
+    cursor.execute('''
+        INSERT INTO temp.a_archivar (id, temporada_id)
+        SELECT p.id, (
+            SELECT t.id FROM temporadas t
+            WHERE t.fecha_inicio <= p.fecha
+            ORDER BY t.fecha_inicio DESC LIMIT 1
+        )
+        FROM partidos p
+        WHERE p.activo = 0
+          AND p.fecha < (SELECT MAX(fecha_inicio) FROM temporadas)
+    ''')
+    
+    # Totales de la temporada antes de sacar los partidos de la tabla diaria
+    cursor.execute("SELECT DISTINCT temporada_id FROM temp.a_archivar")
+    for (temporada_id,) in cursor.fetchall():
+        cursor.execute(f'''
+            INSERT INTO estadisticas_temporada (temporada_id, nombre, partidos, puntos_favor,
+                                                puntos_contra, victorias, derrotas, diferencia)
+            SELECT ?, nombre, partidos, puntos_favor, puntos_contra, victorias, derrotas, diferencia
+            FROM ({sql_estadisticas_por_jugador(
+                "partidos",
+                "id IN (SELECT id FROM temp.a_archivar WHERE temporada_id = ?)"
+            )})
+            WHERE true
+            ON CONFLICT (temporada_id, nombre) DO UPDATE SET
+                partidos = partidos + excluded.partidos,
+                puntos_favor = puntos_favor + excluded.puntos_favor,
+                puntos_contra = puntos_contra + excluded.puntos_contra,
+                victorias = victorias + excluded.victorias,
+                derrotas = derrotas + excluded.derrotas,
+                diferencia = diferencia + excluded.diferencia
+        ''', (temporada_id, temporada_id))
+    
+    cursor.execute('''
+        INSERT INTO partidos_archivo (id, temporada_id, fecha, j1, j2, j3, j4, pareja1, pareja2,
+                                      puntos_pareja1, puntos_pareja2, ganadores, resultado, fecha_fin)
+        SELECT p.id, a.temporada_id, p.fecha, p.j1, p.j2, p.j3, p.j4, p.pareja1, p.pareja2,
+               p.puntos_pareja1, p.puntos_pareja2, p.ganadores, p.resultado, p.fecha_fin
+        FROM partidos p JOIN temp.a_archivar a ON a.id = p.id
+    ''')
+    cursor.execute("DELETE FROM partidos WHERE id IN (SELECT id FROM temp.a_archivar)")
+    archivados = cursor.rowcount
+    cursor.execute("DELETE FROM temp.a_archivar")
+    return archivados
+
+def iniciar_temporada(nombre):
+    """Empieza una nueva temporada y archiva los partidos finalizados de las anteriores.
+    
+    Devuelve el número de partidos archivados, o None si no se pudo.
+    """
+    def _iniciar(cursor):
+        cursor.execute('''
+            INSERT INTO temporadas (nombre, fecha_inicio)
+            VALUES (?, CURRENT_TIMESTAMP)
+        ''', (nombre,))
+        return _archivar_partidos(cursor)
+    
+    try:
+        return enviar_escritura(_iniciar).result()
+    except sqlite3.IntegrityError:
+        st.error(f"❌ Ya existe una temporada llamada '{nombre}'")
+        return None
+    except Exception as e:
+        st.error(f"Error iniciando temporada: {e}")
+        return None
+
+def sql_clasificacion_temporada():
+    """Consulta de la clasificación de una temporada.
+    
+    Parámetros: temporada_id, fecha_inicio, fecha_fin, fecha_fin (None si es la actual).
+    """
+    return f'''
+        SELECT e.nombre, COALESCE(j.nivel, '-') AS nivel,
+               SUM(e.partidos) AS partidos, SUM(e.puntos_favor) AS puntos_favor,
+               SUM(e.puntos_contra) AS puntos_contra, SUM(e.victorias) AS victorias,
+               SUM(e.derrotas) AS derrotas, SUM(e.diferencia) AS diferencia
+        FROM (
+            SELECT nombre, partidos, puntos_favor, puntos_contra, victorias, derrotas, diferencia
+            FROM estadisticas_temporada
+            WHERE temporada_id = ?
+            UNION ALL
+            SELECT * FROM ({sql_estadisticas_por_jugador(
+                "partidos",
+                "activo = 0 AND fecha >= ? AND (? IS NULL OR fecha < ?)"
+            )})
+        ) e
+        LEFT JOIN jugadores j ON j.nombre = e.nombre
+        GROUP BY e.nombre
+        ORDER BY puntos_favor DESC
+    '''
+
+@lectura_por_ejecucion
+def cargar_clasificacion_temporada(temporada_id):
+    """Clasificación de una temporada: lo archivado más lo que siga en la tabla diaria"""
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return []
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT fecha_inicio,
+                       (SELECT MIN(t2.fecha_inicio) FROM temporadas t2
+                        WHERE t2.fecha_inicio > t.fecha_inicio) AS fecha_fin
+                FROM temporadas t
+                WHERE id = ?
+            ''', (temporada_id,))
+            temporada = cursor.fetchone()
+            if temporada is None:
+                conn.close()
+                return []
+            
+            cursor.execute(sql_clasificacion_temporada(), (
+                temporada_id, temporada['fecha_inicio'], temporada['fecha_fin'], temporada['fecha_fin']
+            ))
+            clasificacion = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return clasificacion
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando clasificación de la temporada: {e}")
+            conn.close()
+            return []
+    
+    return ejecutar_con_retry(_cargar)
+
+# ============================================
+# VERIFICACIÓN DE ESTADÍSTICAS
+# ============================================
+
+CAMPOS_ESTADISTICAS = ('partidos', 'puntos_favor', 'puntos_contra', 'victorias', 'derrotas', 'diferencia')
+
+def sql_desviaciones_estadisticas():
+    """Consulta que devuelve los jugadores cuyas estadísticas no cuadran con los partidos.
+    
+    Recalcula en una sola pasada lo que debería tener cada jugador (lo
+    archivado en estadisticas_temporada más los partidos finalizados de la
+    tabla diaria, con las reglas de recalcular_estadisticas) y lo compara con
+    lo guardado. Cada fila trae el valor guardado y el esperado_<campo>.
+    """
+    esperados = ", ".join(f"COALESCE(e.{c}, 0) AS esperado_{c}" for c in CAMPOS_ESTADISTICAS)
+    distintos = " OR ".join(f"j.{c} IS NOT COALESCE(e.{c}, 0)" for c in CAMPOS_ESTADISTICAS)
+    return f'''
+        WITH esperado AS (
+            SELECT nombre, SUM(partidos) AS partidos, SUM(puntos_favor) AS puntos_favor,
+                   SUM(puntos_contra) AS puntos_contra, SUM(victorias) AS victorias,
+                   SUM(derrotas) AS derrotas, SUM(diferencia) AS diferencia
+            FROM (
+                SELECT nombre, partidos, puntos_favor, puntos_contra, victorias, derrotas, diferencia
+                FROM estadisticas_temporada
+                UNION ALL
+                SELECT nombre, partidos, puntos_favor, puntos_contra, victorias, derrotas, diferencia
+                FROM ({sql_estadisticas_por_jugador("partidos", "activo = 0")})
+            )
+            GROUP BY nombre
+        )
+        SELECT j.nombre, {", ".join("j." + c for c in CAMPOS_ESTADISTICAS)}, {esperados}
+        FROM jugadores j
+        LEFT JOIN esperado e ON e.nombre = j.nombre
+        WHERE {distintos}
+        ORDER BY j.nombre
+    '''
+
+def verificar_estadisticas():
+    """Jugadores con estadísticas desviadas: lista de dicts con lo guardado y esperado_<campo>.
+    
+    Solo lee; una lista vacía significa que todo cuadra. Devuelve None si
+    no se pudo comprobar.
+    """
+    def _verificar():
+        conn = get_db_connection()
+        if conn is None:
+            return None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql_desviaciones_estadisticas())
+            desviaciones = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return desviaciones
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error verificando estadísticas: {e}")
+            conn.close()
+            return None
+    
+    return ejecutar_con_retry(_verificar)
+
+def reparar_estadisticas():
+    """Corrige solo los jugadores desviados; devuelve sus nombres, o None si falla.
+    
+    La comprobación y la corrección son un solo UPDATE dentro de una
+    transacción de escritura, así que no se cuela ningún partido entre medias.
+    """
+    def _reparar(cursor):
+        cursor.execute(f'''
+            UPDATE jugadores
+            SET {", ".join(f"{c} = d.esperado_{c}" for c in CAMPOS_ESTADISTICAS)}
+            FROM ({sql_desviaciones_estadisticas()}) AS d
+            WHERE jugadores.nombre = d.nombre
+            RETURNING jugadores.nombre
+        ''')
+        return sorted(row[0] for row in cursor.fetchall())
+    
+    try:
+        return enviar_escritura(_reparar).result()
+    except Exception as e:
+        st.error(f"Error reparando estadísticas: {e}")
+        return None
+
+# ============================================
+# TAREAS EN SEGUNDO PLANO
+# ============================================
+
+# Segundos entre vistazos a la cola si nadie avisa (otra réplica puede haber encolado)
+TAREAS_REVISAR_CADA = 30
+# Una tarea 'en_curso' más antigua que esto es de un proceso que murió: vuelve a la cola
+TAREAS_CADUCAN_MINUTOS = 60
+# Días que se guardan las tareas terminadas
+TAREAS_RETENCION_DIAS = 30
+
+def rehacer_resumenes():
+    """Reconstruye desde cero parejas, cara a cara y resúmenes de actividad; devuelve los días o None"""
+    def _rehacer(cursor):
+        for tabla in ('estadisticas_pareja', 'estadisticas_enfrentamiento', 'resumen_diario', 'resumen_jugador_mes'):
+            cursor.execute(f"DELETE FROM {tabla}")
+        _sumar_estadisticas_cruzadas(cursor, '''
+            SELECT j1, j2, j3, j4, puntos_pareja1, puntos_pareja2 FROM partidos WHERE activo = 0
+            UNION ALL
+            SELECT j1, j2, j3, j4, puntos_pareja1, puntos_pareja2 FROM partidos_archivo
+        ''')
+        _sumar_resumenes(cursor, '''
+            SELECT fecha, fecha_fin, j1, j2, j3, j4, puntos_pareja1, puntos_pareja2 FROM partidos WHERE activo = 0
+            UNION ALL
+            SELECT fecha, fecha_fin, j1, j2, j3, j4, puntos_pareja1, puntos_pareja2 FROM partidos_archivo
+        ''')
+        cursor.execute("SELECT COUNT(*) FROM resumen_diario")
+        return {'dias': cursor.fetchone()[0]}
+    
+    try:
+        return enviar_escritura(_rehacer).result()
+    except Exception as e:
+        st.error(f"Error rehaciendo resúmenes: {e}")
+        return None
+
+def _tamano_bd(cursor):
+    cursor.execute("PRAGMA page_count")
+    paginas = cursor.fetchone()[0]
+    cursor.execute("PRAGMA page_size")
+    return paginas * cursor.fetchone()[0]
+
+def analizar_bd():
+    """ANALYZE para el planificador y checkpoint del WAL; devuelve la duración o None si falla"""
+    def _analizar():
+        conn = get_db_connection()
+        if conn is None:
+            return None
+        try:
+            inicio = time.perf_counter()
+            cursor = conn.cursor()
+            cursor.execute("ANALYZE")
+            cursor.execute("PRAGMA optimize")
+            cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.close()
+            return {'duracion': round(time.perf_counter() - inicio, 3)}
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error analizando la BD: {e}")
+            conn.close()
+            return None
+    
+    return ejecutar_con_retry(_analizar)
+
+def compactar_bd():
+    """VACUUM de la liga; mientras dura, las escrituras esperan (o reintentan)"""
+    def _compactar():
+        conn = get_db_connection()
+        if conn is None:
+            return None
+        try:
+            inicio = time.perf_counter()
+            cursor = conn.cursor()
+            antes = _tamano_bd(cursor)
+            cursor.execute("VACUUM")
+            despues = _tamano_bd(cursor)
+            conn.close()
+            return {'antes': antes, 'despues': despues, 'duracion': round(time.perf_counter() - inicio, 3)}
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error compactando la BD: {e}")
+            conn.close()
+            return None
+    
+    return ejecutar_con_retry(_compactar)
+
+# Tipo de tarea -> (descripción, función sin argumentos que la hace en la liga actual).
+# Cada función devuelve algo serializable a JSON, o None/False si falla.
+TAREAS = {
+    'recalcular_estadisticas': ("Recalcular todas las estadísticas", recalcular_estadisticas),
+    'reparar_estadisticas': ("Reparar estadísticas desviadas", reparar_estadisticas),
+    'rehacer_resumenes': ("Rehacer parejas, cara a cara y resúmenes", rehacer_resumenes),
+    'analizar': ("Mantenimiento: ANALYZE", analizar_bd),
+    'compactar': ("Mantenimiento: VACUUM", compactar_bd),
+    'copia': ("Copia de seguridad", crear_copia_liga),
+}
+
+def encolar_tarea(tipo):
+    """Encola una tarea en la liga actual y vuelve enseguida; devuelve su id o None.
+    
+    Si ya hay una del mismo tipo esperando no se duplica: se devuelve esa.
+    """
+    if tipo not in TAREAS:
+        st.error(f"Tarea desconocida: {tipo}")
+        return None
+    
+    def _encolar(cursor):
+        cursor.execute("SELECT id FROM tareas WHERE tipo = ? AND estado = 'pendiente'", (tipo,))
+        existente = cursor.fetchone()
+        if existente:
+            return existente[0]
+        cursor.execute("INSERT INTO tareas (tipo) VALUES (?)", (tipo,))
+        return cursor.lastrowid
+    
+    try:
+        tarea_id = enviar_escritura(_encolar).result()
+    except Exception as e:
+        st.error(f"Error encolando la tarea: {e}")
+        return None
+    obtener_ejecutor_tareas().avisar()
+    return tarea_id
+
+def cargar_tareas(limite=10):
+    """Últimas tareas de la liga actual, la más reciente primero"""
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return []
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, tipo, estado, creada, iniciada, terminada, intentos, resultado, error
+                FROM tareas
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (limite,))
+            tareas = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return tareas
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando tareas: {e}")
+            conn.close()
+            return []
+    
+    return ejecutar_con_retry(_cargar)
+
+def _hay_tareas_pendientes():
+    conn = get_db_connection()
+    if conn is None:
+        return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT 1 FROM tareas
+            WHERE estado = 'pendiente'
+               OR (estado = 'en_curso' AND iniciada < datetime('now', ?))
+            LIMIT 1
+        ''', (f'-{TAREAS_CADUCAN_MINUTOS} minutes',))
+        return cursor.fetchone() is not None
+    finally:
+        conn.close()
+
+def _reclamar_tarea(cursor):
+    """Pasa a 'en_curso' la tarea pendiente más antigua; con varias réplicas, solo una la consigue"""
+    cursor.execute('''
+        UPDATE tareas SET estado = 'pendiente'
+        WHERE estado = 'en_curso' AND iniciada < datetime('now', ?)
+    ''', (f'-{TAREAS_CADUCAN_MINUTOS} minutes',))
+    cursor.execute('''
+        UPDATE tareas
+        SET estado = 'en_curso', iniciada = CURRENT_TIMESTAMP, intentos = intentos + 1
+        WHERE id = (SELECT id FROM tareas WHERE estado = 'pendiente' ORDER BY id LIMIT 1)
+        RETURNING id, tipo
+    ''')
+    fila = cursor.fetchone()
+    return (fila[0], fila[1]) if fila else None
+
+def _terminar_tarea(tarea_id, estado, resultado, error):
+    def _terminar(cursor):
+        cursor.execute('''
+            UPDATE tareas
+            SET estado = ?, terminada = CURRENT_TIMESTAMP, resultado = ?, error = ?
+            WHERE id = ?
+        ''', (estado, resultado, error, tarea_id))
+        cursor.execute('''
+            DELETE FROM tareas
+            WHERE estado IN ('hecha', 'fallida') AND terminada < datetime('now', ?)
+        ''', (f'-{TAREAS_RETENCION_DIAS} days',))
+    
+    enviar_escritura(_terminar).result()
+
+class EjecutorTareas:
+    """Hilo que ejecuta, de una en una, las tareas encoladas en la tabla tareas de cada liga.
+    
+    La cola vive en la BD de la liga: sobrevive a un reinicio, se ve desde
+    cualquier sesión y, si hay varias réplicas, cada tarea se reclama con
+    un UPDATE atómico para que la ejecute solo una.
+    """
+    
+    def __init__(self):
+        self.despertar = threading.Event()
+        self.en_curso = None
+        self.hilo = threading.Thread(target=self._bucle, name="tareas-padel", daemon=True)
+        self.hilo.start()
+    
+    def avisar(self):
+        """Revisa la cola ya, sin esperar al siguiente vistazo"""
+        self.despertar.set()
+    
+    def _ejecutar(self, liga, tarea_id, tipo):
+        self.en_curso = (liga, tarea_id, tipo)
+        try:
+            resultado = TAREAS[tipo][1]() if tipo in TAREAS else None
+            if resultado is None or resultado is False:
+                raise RuntimeError("la tarea no se completó (detalles en el registro del servidor)")
+            _terminar_tarea(tarea_id, 'hecha', json.dumps(resultado, default=str), None)
+        except Exception as e:
+            _terminar_tarea(tarea_id, 'fallida', None, str(e))
+        finally:
+            self.en_curso = None
+    
+    def _bucle(self):
+        while True:
+            self.despertar.clear()
+            trabajo = False
+            for liga in listar_ligas():
+                try:
+                    usar_liga(liga)
+                    preparar_liga()
+                    if not _hay_tareas_pendientes():
+                        continue
+                    tarea = enviar_escritura(_reclamar_tarea).result()
+                    if tarea:
+                        self._ejecutar(liga, *tarea)
+                        trabajo = True
+                except Exception:
+                    # La liga no está disponible ahora; se reintenta en la siguiente vuelta
+                    continue
+            if not trabajo:
+                self.despertar.wait(TAREAS_REVISAR_CADA)
+
+@st.cache_resource
+def obtener_ejecutor_tareas():
+    """Un único ejecutor de tareas por proceso para todas las ligas"""
+    return EjecutorTareas()
+
+# ============================================
+# LECTURAS EN DATAFRAME (VISTAS ANALÍTICAS)
+# ============================================
+
+NIVELES = ["Panda", "Manco", "Muy Muy"]
+
+TIPOS_ESTADISTICAS = {
+    'partidos': 'int32',
+    'puntos_favor': 'int32',
+    'puntos_contra': 'int32',
+    'victorias': 'int32',
+    'derrotas': 'int32',
+    'diferencia': 'int32',
+}
+
+def leer_dataframe(consulta, params=(), tipos=None):
+    """Lee el resultado de una consulta directamente en un DataFrame con tipos.
+    
+    Evita pasar por una lista de dicts; la columna nivel, si existe, se
+    convierte a categórica.
+    """
+    # pandas tarda medio segundo en importarse: solo se carga si alguna vista lo usa
+    import pandas as pd
+    
+    def _leer():
+        conn = get_db_connection()
+        if conn is None:
+            return pd.DataFrame()
+        try:
+            df = pd.read_sql_query(consulta, conn, params=params, dtype=tipos)
+            conn.close()
+            if 'nivel' in df.columns:
+                extra = sorted(set(df['nivel'].dropna()) - set(NIVELES))
+                df['nivel'] = pd.Categorical(df['nivel'], categories=NIVELES + extra)
+            return df
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando datos: {e}")
+            conn.close()
+            return pd.DataFrame()
+    
+    return ejecutar_con_retry(_leer)
+
+def cargar_jugadores_df():
+    """Jugadores y sus estadísticas como DataFrame, ordenados por puntos a favor"""
+    return leer_dataframe('''
+        SELECT nombre, nivel, partidos, puntos_favor, puntos_contra,
+               victorias, derrotas, diferencia
+        FROM jugadores
+        ORDER BY puntos_favor DESC
+    ''', tipos=TIPOS_ESTADISTICAS)
+
+def cargar_clasificacion_temporada_df(temporada):
+    """Clasificación de una temporada (dict de cargar_temporadas) como DataFrame"""
+    return leer_dataframe(sql_clasificacion_temporada(), (
+        temporada['id'], temporada['fecha_inicio'], temporada['fecha_fin'], temporada['fecha_fin']
+    ), tipos=TIPOS_ESTADISTICAS)
+
+# ============================================
+# PAREJAS Y CARA A CARA
+# ============================================
+
+@lectura_por_ejecucion
+def cargar_companeros(nombre):
+    """Cómo le va a un jugador con cada compañero"""
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return []
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT jugador_b AS companero, partidos, victorias, puntos_favor, puntos_contra
+                FROM estadisticas_pareja WHERE jugador_a = ?
+                UNION ALL
+                SELECT jugador_a, partidos, victorias, puntos_favor, puntos_contra
+                FROM estadisticas_pareja WHERE jugador_b = ?
+                ORDER BY victorias DESC, partidos DESC
+            ''', (nombre, nombre))
+            companeros = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return companeros
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando compañeros: {e}")
+            conn.close()
+            return []
+    
+    return ejecutar_con_retry(_cargar)
+
+@lectura_por_ejecucion
+def cargar_enfrentamientos(nombre, rival=None):
+    """Resultados de un jugador contra cada rival (o solo contra rival)"""
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return []
+        try:
+            cursor = conn.cursor()
+            if rival is None:
+                cursor.execute('''
+                    SELECT rival, partidos, victorias, puntos_favor, puntos_contra
+                    FROM estadisticas_enfrentamiento
+                    WHERE jugador = ?
+                    ORDER BY partidos DESC, victorias DESC
+                ''', (nombre,))
+            else:
+                cursor.execute('''
+                    SELECT rival, partidos, victorias, puntos_favor, puntos_contra
+                    FROM estadisticas_enfrentamiento
+                    WHERE jugador = ? AND rival = ?
+                ''', (nombre, rival))
+            enfrentamientos = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return enfrentamientos
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando enfrentamientos: {e}")
+            conn.close()
+            return []
+    
+    return ejecutar_con_retry(_cargar)
+
+@lectura_por_ejecucion
+def cargar_mejores_parejas(limite=10, minimo_partidos=1):
+    """Parejas con más victorias juntas"""
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return []
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT jugador_a, jugador_b, partidos, victorias, puntos_favor, puntos_contra
+                FROM estadisticas_pareja
+                WHERE partidos >= ?
+                ORDER BY victorias DESC, (puntos_favor - puntos_contra) DESC
+                LIMIT ?
+            ''', (minimo_partidos, limite))
+            parejas = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return parejas
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando parejas: {e}")
+            conn.close()
+            return []
+    
+    return ejecutar_con_retry(_cargar)
+
+# ============================================
+# ACTIVIDAD DE LA LIGA (RESÚMENES)
+# ============================================
+
+# Expresión SQL que agrupa la columna dia de resumen_diario en cada periodo
+PERIODOS_ACTIVIDAD = {
+    'dia': "dia",
+    'semana': "date(dia, '-6 days', 'weekday 1')",
+    'mes': "substr(dia, 1, 7)",
+}
+
+@lectura_por_ejecucion
+def cargar_partidos_por_periodo(periodo='dia', desde=None):
+    """Partidos finalizados y puntos jugados por día, semana (lunes) o mes desde la fecha indicada"""
+    agrupacion = PERIODOS_ACTIVIDAD[periodo]
+    return leer_dataframe(f'''
+        SELECT {agrupacion} AS periodo, SUM(partidos) AS partidos, SUM(puntos) AS puntos
+        FROM resumen_diario
+        WHERE dia >= ?
+        GROUP BY periodo
+        ORDER BY periodo
+    ''', (desde or '',), tipos={'partidos': 'int32', 'puntos': 'int32'})
+
+@lectura_por_ejecucion
+def cargar_puntos_jugador_mes(nombres):
+    """Partidos, victorias y puntos por mes de los jugadores indicados"""
+    marcas = ", ".join("?" * len(nombres))
+    return leer_dataframe(f'''
+        SELECT mes, nombre, partidos, victorias, puntos_favor, puntos_contra
+        FROM resumen_jugador_mes
+        WHERE nombre IN ({marcas})
+        ORDER BY mes, nombre
+    ''', tuple(nombres), tipos={
+        'partidos': 'int32', 'victorias': 'int32', 'puntos_favor': 'int32', 'puntos_contra': 'int32'
+    })
+
+@lectura_por_ejecucion
+def cargar_actividad_por_nivel():
+    """Participaciones (jugador y partido) por mes y nivel actual del jugador"""
+    return leer_dataframe('''
+        SELECT r.mes, COALESCE(j.nivel, 'Sin nivel') AS nivel, SUM(r.partidos) AS participaciones
+        FROM resumen_jugador_mes r
+        LEFT JOIN jugadores j ON j.nombre = r.nombre
+        GROUP BY r.mes, j.nivel
+        ORDER BY r.mes
+    ''', tipos={'participaciones': 'int32'})
+
+# ============================================
+# PERFIL DE JUGADOR
+# ============================================
+
+@lectura_por_ejecucion
+def cargar_partidos_jugador(nombre, limite=20):
+    """Últimos partidos de un jugador (activos, finalizados y archivados), del más reciente al más antiguo"""
+    def _cargar():
+        conn = get_db_connection()
+        if conn is None:
+            return []
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT pj.partido_id, pj.fecha, pj.pareja,
+                       COALESCE(p.j1, a.j1) AS j1, COALESCE(p.j2, a.j2) AS j2,
+                       COALESCE(p.j3, a.j3) AS j3, COALESCE(p.j4, a.j4) AS j4,
+                       COALESCE(p.puntos_pareja1, a.puntos_pareja1, 0) AS puntos_pareja1,
+                       COALESCE(p.puntos_pareja2, a.puntos_pareja2, 0) AS puntos_pareja2,
+                       COALESCE(p.activo, 0) AS activo
+                FROM partidos_jugador pj
+                LEFT JOIN partidos p ON p.id = pj.partido_id
+                LEFT JOIN partidos_archivo a ON a.id = pj.partido_id
+                WHERE pj.nombre = ?
+                ORDER BY pj.fecha DESC, pj.partido_id DESC
+                LIMIT ?
+            ''', (nombre, limite))
+            partidos = []
+            for row in cursor.fetchall():
+                partido = dict(row)
+                if partido['pareja'] == 1:
+                    propios, rivales = (partido['j1'], partido['j2']), (partido['j3'], partido['j4'])
+                    favor, contra = partido['puntos_pareja1'], partido['puntos_pareja2']
+                    gana = favor > contra
+                else:
+                    propios, rivales = (partido['j3'], partido['j4']), (partido['j1'], partido['j2'])
+                    favor, contra = partido['puntos_pareja2'], partido['puntos_pareja1']
+                    gana = favor >= contra
+                partido['companero'] = propios[1] if propios[0] == nombre else propios[0]
+                partido['rivales'] = f"{rivales[0]} y {rivales[1]}"
+                partido['puntos_favor'] = favor
+                partido['puntos_contra'] = contra
+                partido['gana'] = gana
+                partidos.append(partido)
+            conn.close()
+            return partidos
+        except Exception as e:
+            if es_error_bloqueo(e):
+                conn.close()
+                raise
+            st.error(f"Error cargando partidos del jugador: {e}")
+            conn.close()
+            return []
+    
+    return ejecutar_con_retry(_cargar)
+
+def calcular_racha(partidos):
+    """Racha actual a partir de partidos finalizados ordenados del más reciente al más antiguo.
+    
+    Devuelve (victorias_seguidas, derrotas_seguidas); una de las dos es 0.
+    """
+    finalizados = [p for p in partidos if not p['activo']]
+    if not finalizados:
+        return 0, 0
+    ganando = finalizados[0]['gana']
+    racha = 0
+    for p in finalizados:
+        if p['gana'] != ganando:
+            break
+        racha += 1
+    return (racha, 0) if ganando else (0, racha)
+
+# ============================================
+# FUNCIONES PARA PUNTUACIÓN
+# ============================================
+
+def convertir_puntos_tenis(puntos):
+    if puntos == 0:
+        return "0"
+    elif puntos == 1:
+        return "15"
+    elif puntos == 2:
+        return "30"
+    elif puntos == 3:
+        return "40"
+    else:
+        return "Ventaja"
+
+def procesar_punto(puntos1, puntos2, ganador, modo_muerte=False):
+    """Procesa un punto según las reglas del pádel"""
+    
+    if ganador == 1:
+        puntos1 += 1
+    else:
+        puntos2 += 1
+    
+    if modo_muerte and (puntos1 >= 3 or puntos2 >= 3):
+        if puntos1 > puntos2:
+            return 0, 0, True, 1
+        elif puntos2 > puntos1:
+            return 0, 0, True, 2
+    
+    if puntos1 >= 4 and puntos1 - puntos2 >= 2:
+        return 0, 0, True, 1
+    elif puntos2 >= 4 and puntos2 - puntos1 >= 2:
+        return 0, 0, True, 2
+    
+    if puntos1 >= 4 and puntos2 >= 4 and puntos1 == puntos2:
+        return 3, 3, False, 0
+    
+    return puntos1, puntos2, False, 0
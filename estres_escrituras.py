@@ -0,0 +1,232 @@
+"""Prueba de estrés de escritores concurrentes sobre la capa de datos.
+
+Lanza varios procesos (como varias réplicas del servidor sobre el mismo
+padel.db) que anotan puntos sin parar en unos pocos partidos compartidos y,
+de vez en cuando, crean partidos nuevos. Se trabaja en un directorio
+temporal con su propio padel.db:
+
+    python estres_escrituras.py --escritores 8 --segundos 10
+    python estres_escrituras.py --partidos 1 --agrupado
+    python estres_escrituras.py --memoria
+
+Con --memoria la liga vive en el almacén en memoria (sin E/S de disco). Esa
+base solo existe dentro de un proceso, así que los escritores pasan a ser
+hilos del mismo proceso en lugar de procesos.
+
+Muestra escrituras por segundo, latencias p50/p95/p99, conflictos de
+versión resueltos con un reintento (compare-and-swap en modificar_partido),
+reintentos y fallos por bloqueo y el histograma de esperas por bloqueo.
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def sembrar(jugadores, partidos):
+    import datos
+    datos.usar_liga(datos.LIGA_POR_DEFECTO)
+    datos.preparar_liga()
+    nombres = [f"Jugadora {i:03d}" for i in range(jugadores)]
+    for i, nombre in enumerate(nombres):
+        datos.guardar_jugador(nombre, datos.NIVELES[i % len(datos.NIVELES)])
+    ids = []
+    for _ in range(partidos):
+        j = random.sample(nombres, 4)
+        ids.append(datos.crear_partido(*j, f"{j[0]} y {j[1]}", f"{j[2]} y {j[3]}"))
+    return nombres, ids
+
+
+def instrumentar(datos):
+    """Cuenta los intentos de anotar_punto y los errores que la capa de datos mostraría en pantalla"""
+    contadores = Counter()
+    errores = Counter()
+    lock = threading.Lock()
+    procesar_punto = datos.procesar_punto
+
+    # Cada llamada a procesar_punto es un intento de anotar_punto: los que sobran son conflictos
+    def _contar(*args, **kwargs):
+        with lock:
+            contadores['puntos'] += 1
+        return procesar_punto(*args, **kwargs)
+
+    def _error(mensaje, *args, **kwargs):
+        with lock:
+            errores.update([str(mensaje)[:80]])
+
+    datos.procesar_punto = _contar
+    datos.st.error = _error
+    return contadores, errores
+
+
+def metricas_bloqueo(datos):
+    """Reintentos, fallos e histograma de esperas por bloqueo de este proceso"""
+    bloqueo = Counter()
+    histograma = [0] * (len(datos.MetricasBloqueo.LIMITES) + 1)
+    for entrada in datos.obtener_metricas_bloqueo(datos.LIGA_POR_DEFECTO).funciones.values():
+        bloqueo['reintentos'] += entrada['reintentos']
+        bloqueo['fallos'] += entrada['fallos']
+        histograma = [a + b for a, b in zip(histograma, entrada['histograma'])]
+    return dict(bloqueo), histograma
+
+
+def escribir(datos, numero, segundos, nombres, partidos, proporcion_crear):
+    """Anota puntos (y crea partidos) hasta que se acaba el tiempo; devuelve latencias y operaciones"""
+    azar = random.Random(numero)
+    latencias = []
+    operaciones = Counter()
+    fin = time.perf_counter() + segundos
+    while time.perf_counter() < fin:
+        inicio = time.perf_counter()
+        if azar.random() < proporcion_crear:
+            j = azar.sample(nombres, 4)
+            ok = datos.crear_partido(*j, f"{j[0]} y {j[1]}", f"{j[2]} y {j[3]}") is not None
+            operaciones['crear_partido' if ok else 'fallos'] += 1
+        else:
+            ok = datos.anotar_punto(azar.choice(partidos), azar.choice((1, 2))) is not None
+            operaciones['anotar_punto' if ok else 'fallos'] += 1
+        latencias.append(time.perf_counter() - inicio)
+    return latencias, operaciones
+
+
+def _escritor(numero, segundos, nombres, partidos, proporcion_crear, barrera, resultados):
+    """Proceso escritor"""
+    import datos
+    datos.usar_liga(datos.LIGA_POR_DEFECTO)
+    datos.preparar_liga()
+    contadores, errores = instrumentar(datos)
+    barrera.wait()
+    latencias, operaciones = escribir(datos, numero, segundos, nombres, partidos, proporcion_crear)
+    bloqueo, histograma = metricas_bloqueo(datos)
+    conflictos = contadores['puntos'] - operaciones['anotar_punto']
+    resultados.put((latencias, dict(operaciones), conflictos, bloqueo, histograma, dict(errores)))
+
+
+def ejecutar(escritores, segundos, nombres, partidos, proporcion_crear):
+    contexto = multiprocessing.get_context('spawn')
+    barrera = contexto.Barrier(escritores + 1)
+    resultados = contexto.Queue()
+    procesos = [contexto.Process(target=_escritor,
+                                 args=(n, segundos, nombres, partidos, proporcion_crear, barrera, resultados))
+                for n in range(escritores)]
+    for proceso in procesos:
+        proceso.start()
+    barrera.wait()
+    inicio = time.perf_counter()
+    recibidos = [resultados.get() for _ in procesos]
+    duracion = time.perf_counter() - inicio
+    for proceso in procesos:
+        proceso.join()
+    return resumir(recibidos, duracion)
+
+
+def ejecutar_en_hilos(escritores, segundos, nombres, partidos, proporcion_crear):
+    """Como ejecutar, pero con hilos de este proceso (el almacén en memoria no se comparte entre procesos)"""
+    import datos
+    contadores, errores = instrumentar(datos)
+    barrera = threading.Barrier(escritores + 1)
+    resultados = queue.Queue()
+
+    def _hilo(numero):
+        datos.usar_liga(datos.LIGA_POR_DEFECTO)
+        barrera.wait()
+        resultados.put(escribir(datos, numero, segundos, nombres, partidos, proporcion_crear))
+
+    hilos = [threading.Thread(target=_hilo, args=(n,)) for n in range(escritores)]
+    for hilo in hilos:
+        hilo.start()
+    barrera.wait()
+    inicio = time.perf_counter()
+    recibidos = [resultados.get() for _ in hilos]
+    duracion = time.perf_counter() - inicio
+    for hilo in hilos:
+        hilo.join()
+
+    # Intentos, métricas y errores son de todo el proceso: un solo resultado con lo de todos los hilos
+    latencias = [t for r in recibidos for t in r[0]]
+    operaciones = sum((r[1] for r in recibidos), Counter())
+    bloqueo, histograma = metricas_bloqueo(datos)
+    conflictos = contadores['puntos'] - operaciones['anotar_punto']
+    return resumir([(latencias, dict(operaciones), conflictos, bloqueo, histograma, dict(errores))], duracion)
+
+
+def resumir(recibidos, duracion):
+    latencias = [t for r in recibidos for t in r[0]]
+    operaciones = sum((Counter(r[1]) for r in recibidos), Counter())
+    bloqueo = sum((Counter(r[3]) for r in recibidos), Counter())
+    histograma = [sum(columna) for columna in zip(*(r[4] for r in recibidos))]
+    errores = sum((Counter(r[5]) for r in recibidos), Counter())
+    return {
+        'duracion': duracion,
+        'latencias': latencias,
+        'operaciones': operaciones,
+        'conflictos': sum(r[2] for r in recibidos),
+        'reintentos': bloqueo['reintentos'],
+        'fallos_bloqueo': bloqueo['fallos'],
+        'histograma': histograma,
+        'errores': errores,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Estrés de escritores concurrentes de la app de pádel")
+    parser.add_argument('--escritores', type=int, default=8, help="procesos escribiendo a la vez")
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--partidos', type=int, default=4, help="partidos activos que se disputan los escritores")
+    parser.add_argument('--jugadores', type=int, default=40)
+    parser.add_argument('--crear', type=float, default=0.1, help="proporción de escrituras que crean partido")
+    parser.add_argument('--agrupado', action='store_true', help="usar el escritor agrupado en cada proceso")
+    parser.add_argument('--memoria', action='store_true', help="almacén en memoria, con hilos en vez de procesos")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('PADEL_COPIAS_CADA_HORAS', '0')
+    os.environ['PADEL_ESCRITOR_AGRUPADO'] = '1' if args.agrupado else '0'
+    if args.memoria:
+        os.environ['PADEL_ALMACEN'] = 'memoria'
+    sys.path.insert(0, DIRECTORIO_APP)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        os.chdir(directorio)
+        nombres, partidos = sembrar(args.jugadores, args.partidos)
+        r = (ejecutar_en_hilos if args.memoria else ejecutar)(args.escritores, args.segundos, nombres, partidos,
+                                                               args.crear)
+        os.chdir(DIRECTORIO_APP)
+
+    import datos
+    escrituras = r['operaciones']['anotar_punto'] + r['operaciones']['crear_partido']
+    latencias = r['latencias']
+    print(f"{args.escritores} {'hilos' if args.memoria else 'escritores'} x {args.segundos:g} s sobre "
+          f"{args.partidos} partidos{' (escritor agrupado)' if args.agrupado else ''}"
+          f"{' en memoria' if args.memoria else ''}")
+    print(f"escrituras:             {escrituras} ({escrituras / r['duracion']:.1f}/s)"
+          f"  anotar_punto {r['operaciones']['anotar_punto']} · crear_partido {r['operaciones']['crear_partido']}")
+    print(f"latencia p50/p95/p99:   {percentil(latencias, 50) * 1000:.1f} / {percentil(latencias, 95) * 1000:.1f}"
+          f" / {percentil(latencias, 99) * 1000:.1f} ms")
+    print(f"conflictos de versión:  {r['conflictos']} (resueltos releyendo el partido)")
+    print(f"reintentos por bloqueo: {r['reintentos']} · fallos: {r['fallos_bloqueo']}"
+          f" · operaciones fallidas: {r['operaciones']['fallos']}")
+    etiquetas = [f"≤{limite * 1000:g}ms" for limite in datos.MetricasBloqueo.LIMITES]
+    etiquetas.append(f">{datos.MetricasBloqueo.LIMITES[-1] * 1000:g}ms")
+    print("esperas por bloqueo:    " + " ".join(f"{e} {n}" for e, n in zip(etiquetas, r['histograma']) if n))
+    for error, veces in r['errores'].most_common(5):
+        print(f"  {veces} x {error}")
+    return 1 if r['operaciones']['fallos'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""Mide el arranque en frío y el coste de cada rerun de app.py.
+
+Cada medida se hace en un proceso nuevo y en un directorio temporal (con
+su propio padel.db), como un arranque en Streamlit Cloud:
+
+    python medir_arranque.py --reruns 20 --jugadores 200
+    python medir_arranque.py --pestana "📊 Clasificación"
+    python medir_arranque.py --pestana "📜 Historial" --finalizados 1000
+    python medir_arranque.py --memoria
+
+Muestra el tiempo de importar la capa de datos, la primera ejecución del
+script (lo que ve el primer usuario), la media y el p95 de los reruns
+siguientes y si pandas llegó a importarse.
+
+Con --memoria la liga vive en el almacén en memoria (sin E/S de disco); como
+esa base no sobrevive al proceso, la siembra y la app se ejecutan en el
+mismo proceso.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+
+# Partimos de streamlit ya importado: el servidor lo carga antes de ejecutar el script
+IMPORTAR_DATOS = '''
+import json, sys, time
+import streamlit
+inicio = time.perf_counter()
+import datos
+print(json.dumps({"importar_datos": time.perf_counter() - inicio, "pandas": "pandas" in sys.modules}))
+'''
+
+SEMBRAR = '''
+import json
+import datos
+datos.usar_liga(datos.LIGA_POR_DEFECTO)
+datos.init_database()
+for i in range({jugadores}):
+    datos.guardar_jugador(f"Jugadora {{i:04d}}", datos.NIVELES[i % len(datos.NIVELES)])
+for i in range(0, {jugadores} - 3, 4):
+    nombres = [f"Jugadora {{n:04d}}" for n in range(i, i + 4)]
+    datos.crear_partido(*nombres, f"{{nombres[0]}} / {{nombres[1]}}", f"{{nombres[2]}} / {{nombres[3]}}")
+for i in range({finalizados}):
+    nombres = [f"Jugadora {{(i * 4 + n) % max({jugadores}, 4):04d}}" for n in range(4)]
+    partido_id = datos.crear_partido(*nombres, f"{{nombres[0]}} / {{nombres[1]}}", f"{{nombres[2]}} / {{nombres[3]}}")
+    datos.finalizar_partido(partido_id, 6, i % 6, f"{{nombres[0]}} / {{nombres[1]}}")
+print(json.dumps({{"jugadores": {jugadores}}}))
+'''
+
+EJECUTAR_APP = '''
+import json, sys, time
+import streamlit
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({ruta!r}, default_timeout=120)
+if {pestana!r}:
+    app.session_state["pestana"] = {pestana!r}
+inicio = time.perf_counter()
+app.run()
+primera = time.perf_counter() - inicio
+reruns = []
+for _ in range({reruns}):
+    inicio = time.perf_counter()
+    app.run()
+    reruns.append(time.perf_counter() - inicio)
+print(json.dumps({{"primera": primera, "reruns": reruns, "pandas": "pandas" in sys.modules,
+                  "excepcion": bool(app.exception)}}))
+'''
+
+
+def ejecutar(codigo, directorio):
+    entorno = dict(os.environ, PYTHONPATH=DIRECTORIO_APP, PADEL_COPIAS_CADA_HORAS='0')
+    salida = subprocess.run([sys.executable, '-c', codigo], cwd=directorio, env=entorno,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(salida.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de arranque de la app de pádel")
+    parser.add_argument('--reruns', type=int, default=20)
+    parser.add_argument('--jugadores', type=int, default=200)
+    parser.add_argument('--finalizados', type=int, default=0, help="partidos finalizados para el historial")
+    parser.add_argument('--pestana', help="pestaña abierta durante la medida (por defecto, la primera)")
+    parser.add_argument('--memoria', action='store_true', help="usar el almacén en memoria (sin disco)")
+    args = parser.parse_args(argv)
+
+    if args.memoria:
+        os.environ['PADEL_ALMACEN'] = 'memoria'
+    with tempfile.TemporaryDirectory() as directorio:
+        importar = ejecutar(IMPORTAR_DATOS, directorio)
+        sembrar = ""
+        if args.jugadores or args.finalizados:
+            sembrar = SEMBRAR.format(jugadores=args.jugadores, finalizados=args.finalizados)
+            if not args.memoria:
+                ejecutar(sembrar, directorio)
+                sembrar = ""
+        app = ejecutar(sembrar + EJECUTAR_APP.format(ruta=os.path.join(DIRECTORIO_APP, 'app.py'),
+                                                     reruns=args.reruns, pestana=args.pestana),
+                       directorio)
+
+    reruns = sorted(app['reruns'])
+    media = sum(reruns) / len(reruns) if reruns else 0
+    p95 = reruns[min(len(reruns) - 1, int(len(reruns) * 0.95))] if reruns else 0
+    if args.memoria:
+        print("almacén en memoria (siembra y app en el mismo proceso)")
+    print(f"importar datos:         {importar['importar_datos'] * 1000:8.1f} ms"
+          f"  (pandas importado: {'sí' if importar['pandas'] else 'no'})")
+    print(f"primera ejecución:      {app['primera'] * 1000:8.1f} ms")
+    print(f"rerun (media / p95):    {media * 1000:8.1f} / {p95 * 1000:.1f} ms  ({len(reruns)} reruns)")
+    print(f"pandas tras los reruns: {'sí' if app['pandas'] else 'no'}")
+    if app['excepcion']:
+        print("⚠️ la app lanzó una excepción durante la medida")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Comprueba que las estadísticas de los jugadores cuadran con sus partidos.
+
+Pensado para lanzarse desde cron (o el programador de tareas que haya)
+en el directorio de la app, junto a padel.db:
+
+    python verificar.py                    todas las ligas, solo comprobar
+    python verificar.py --reparar          corrige los jugadores desviados
+    python verificar.py --liga principal
+
+Sale con código 1 si encuentra desviaciones sin reparar (o no puede
+comprobar una liga), así el programador puede avisar.
+"""
+import argparse
+import sys
+
+import datos
+
+
+def verificar_liga(liga, reparar=False):
+    """Comprueba (y opcionalmente repara) una liga; devuelve True si queda consistente"""
+    datos.usar_liga(liga)
+    datos.preparar_liga()
+    desviaciones = datos.verificar_estadisticas()
+    if desviaciones is None:
+        print(f"{liga}: no se pudo comprobar")
+        return False
+    if not desviaciones:
+        print(f"{liga}: OK")
+        return True
+
+    print(f"{liga}: {len(desviaciones)} jugadores desviados")
+    for fila in desviaciones:
+        cambios = ", ".join(f"{c} {fila[c]} -> {fila['esperado_' + c]}"
+                            for c in datos.CAMPOS_ESTADISTICAS if fila[c] != fila['esperado_' + c])
+        print(f"  {fila['nombre']}: {cambios}")
+    if not reparar:
+        return False
+
+    reparados = datos.reparar_estadisticas()
+    if reparados is None:
+        print(f"{liga}: la reparación falló")
+        return False
+    print(f"{liga}: {len(reparados)} jugadores reparados")
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verificación de estadísticas de la app de pádel")
+    parser.add_argument('--liga', help="solo esta liga (por defecto, todas)")
+    parser.add_argument('--reparar', action='store_true', help="corregir los jugadores desviados")
+    args = parser.parse_args(argv)
+
+    if args.liga and args.liga not in datos.listar_ligas():
+        print(f"{args.liga}: la liga no existe")
+        return 1
+    ligas = [args.liga] if args.liga else datos.listar_ligas()
+    correctas = [verificar_liga(liga, args.reparar) for liga in ligas]
+    return 0 if all(correctas) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())